@@ -0,0 +1,51 @@
+"""
+Compares the serial, thread and process executors
+As the dataset size and the tree size vary
+
+Usage: python benchmarks/bench_executors.py
+"""
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from symbolic_regression import build_node_sets
+from executors import make_executor
+from fitness import evaluate
+from tree import generate_tree
+import numpy as np
+import random
+import time
+
+# Number of workers for the thread and process executors
+PROCESSES = max(2, (os.cpu_count() or 2) - 2)
+
+# Number of trees evaluated per measurement
+POP_SIZE = 200
+
+if __name__ == '__main__':
+    random.seed(101)
+    primitive_set, terminal_set = build_node_sets()
+
+    # Process workers import build_node_sets by name to register the primitives before any tree is unpickled
+    executors = {name: make_executor(name, PROCESSES, initializer=build_node_sets) for name in ["serial", "thread", "process"]}
+
+    print("{:>10} {:>6} {:>10} {:>10} {:>10}  {}".format("samples", "depth", "serial", "thread", "process", "fastest"))
+    for depth in [2, 4, 6]:
+        population = [(generate_tree(primitive_set, terminal_set, depth=depth), None) for i in range(POP_SIZE)]
+        for samples in [20, 1000, 100000]:
+            x = np.random.uniform(-5, 5, samples)
+            y = np.square(x)
+            # Workers use their registered primitives since the function pointers are not sent
+            args = [(None, individual, x, y) for individual in population]
+
+            # Time one full population evaluation with each executor
+            times = {}
+            for name, executor in executors.items():
+                start = time.perf_counter()
+                executor.starmap(evaluate, args)
+                times[name] = time.perf_counter() - start
+
+            print("{:>10} {:>6} {:>10.4f} {:>10.4f} {:>10.4f}  {}".format(samples, depth, times["serial"], times["thread"], times["process"], min(times, key=times.get)))
+
+    for executor in executors.values():
+        executor.close()
@@ -0,0 +1,61 @@
+"""
+Measures the per-task payload of an evaluation task
+Compares name reference pickling against dill serialization of the full node state
+
+Usage: python benchmarks/bench_pickle.py
+"""
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from symbolic_regression import build_node_sets
+from tree import generate_tree
+import numpy as np
+import random
+import pickle
+import time
+
+# Number of tasks pickled per measurement
+TASKS = 200
+
+def full_state(node):
+    """
+    Recursively copies every attribute of a tree into plain dictionaries
+    This is what dill serialized per task before trees pickled by name
+    """
+    state = dict(node.__dict__)
+    state["args"] = [full_state(i) for i in node.args]
+    return state
+
+def measure(dumps, tasks):
+    start = time.perf_counter()
+    size = sum(len(dumps(task)) for task in tasks)
+    return size / len(tasks), (time.perf_counter() - start) / len(tasks)
+
+if __name__ == '__main__':
+    random.seed(101)
+    primitive_set, terminal_set = build_node_sets()
+    function_pointers = primitive_set.function_pointers
+    function_pointers.update(terminal_set.function_pointers)
+
+    x = np.random.uniform(-5, 5, 20)
+    y = np.square(x)
+
+    try:
+        import dill
+    except ImportError:
+        dill = None
+
+    print("{:>6} {:>14} {:>14} {:>14} {:>14}".format("depth", "dill bytes", "dill us", "pickle bytes", "pickle us"))
+    for depth in [2, 4, 6, 8]:
+        population = [(generate_tree(primitive_set, terminal_set, depth=depth), None) for i in range(TASKS)]
+
+        # Name references: no function_pointers and trees as LISP strings
+        size, seconds = measure(pickle.dumps, [(None, individual, x, y) for individual in population])
+
+        # Full state with closures
+        dill_size, dill_seconds = (float("nan"), float("nan"))
+        if dill is not None:
+            dill_size, dill_seconds = measure(dill.dumps, [(function_pointers, (full_state(individual[0]), None), x, y) for individual in population])
+
+        print("{:>6} {:>14.0f} {:>14.1f} {:>14.0f} {:>14.1f}".format(depth, dill_size, dill_seconds * 1e6, size, seconds * 1e6))
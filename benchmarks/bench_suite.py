@@ -0,0 +1,232 @@
+"""
+Benchmark suite of the tree operations, the evaluation and the full evolution loop
+Every result is written as JSON so runs can be compared before and after an upgrade
+
+Usage: python benchmarks/bench_suite.py --output results.json
+       python benchmarks/bench_suite.py --quick --output results.json
+       python benchmarks/bench_suite.py --compare before.json after.json
+"""
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from symbolic_regression import build_node_sets
+from node_set import PRIMITIVE_REGISTRY, TERMINAL_REGISTRY, registered_function_pointers
+from tree import generate_tree, parse_tree, COMPILED_TREES
+from mutation import mutate, mutate_replace, mutate_insert, mutate_insert_bank, mutate_shrink
+from subtree_bank import SubtreeBank
+from crossover import one_point_crossover
+from variation import vary
+from fitness import evaluate
+from functools import partial
+from copy import deepcopy
+import numpy as np
+import subprocess
+import platform
+import argparse
+import datetime
+import random
+import json
+import time
+
+# Parameters of the full and the quick suite
+# Tree generation is also timed on deeper trees since it switches from recursion to an explicit stack
+FULL = {"depths": [2, 4, 6, 8], "generate_depths": [2, 4, 6, 8, 10], "pop_sizes": [100, 1000], "samples": [20, 1000, 100000], "trees": 200, "repeat": 5, "generations": 10}
+QUICK = {"depths": [2, 4], "generate_depths": [2, 4, 6], "pop_sizes": [100], "samples": [20, 1000], "trees": 50, "repeat": 3, "generations": 3}
+
+# Path of the evolution loop timed end to end
+SYMBOLIC_REGRESSION = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "symbolic_regression.py")
+
+def best_time(func, setup=None, repeat=5):
+    """
+    Times func several times and keeps the fastest run
+
+    Args:
+        func: callable which receives the result of setup
+        setup: optional callable run before every timed call and excluded from the time
+        repeat: number of timed calls
+
+    Returns:
+        Seconds of the fastest call
+    """
+    best = float("inf")
+    for i in range(repeat):
+        data = setup() if setup is not None else None
+        start = time.perf_counter()
+        func(data)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def clear_strings(trees):
+    # Forget every memoized string so rendering is timed from scratch
+    for tree in trees:
+        for node in tree.preorder():
+            node.cached_string = None
+    return trees
+
+def tree_benchmarks(primitive_set, terminal_set, function_pointers, params):
+    """
+    Times every tree operation on populations of each depth
+
+    Returns:
+        List of results where each result is a dictionary
+    """
+    results = []
+    count = params["trees"]
+    repeat = params["repeat"]
+
+    def add(name, depth, seconds):
+        results.append({"benchmark": name, "params": {"depth": depth}, "seconds": seconds / count, "unit": "seconds per tree"})
+
+    for depth in params["generate_depths"]:
+        add("generate_tree", depth, best_time(lambda data: [generate_tree(primitive_set, terminal_set, depth=depth) for i in range(count)], repeat=repeat))
+
+    for depth in params["depths"]:
+        trees = [generate_tree(primitive_set, terminal_set, depth=depth) for i in range(count)]
+        lines = [str(tree) for tree in trees]
+
+        add("parse_tree", depth, best_time(lambda data: [parse_tree(line, PRIMITIVE_REGISTRY, TERMINAL_REGISTRY) for line in lines], repeat=repeat))
+        add("str", depth, best_time(lambda data: [str(tree) for tree in data], lambda: clear_strings(trees), repeat=repeat))
+        add("str cached", depth, best_time(lambda data: [str(tree) for tree in trees], repeat=repeat))
+        add("get_func", depth, best_time(lambda data: [tree.get_func(function_pointers) for tree in trees], COMPILED_TREES.clear, repeat=repeat))
+        add("get_func cached", depth, best_time(lambda data: [tree.get_func(function_pointers) for tree in trees], repeat=repeat))
+
+        # Operators modify their tree so each timed call gets fresh copies
+        copies = lambda: [deepcopy(tree) for tree in trees]
+        add("mutate replace", depth, best_time(lambda data: [mutate(mutate_replace, primitive_set, terminal_set, tree) for tree in data], copies, repeat=repeat))
+        add("mutate insert", depth, best_time(lambda data: [mutate(mutate_insert, primitive_set, terminal_set, tree, use_input_ids=True) for tree in data], copies, repeat=repeat))
+        # The bank holds enough subtrees that no refill happens while timing
+        bank = SubtreeBank(primitive_set, terminal_set, capacity=count * repeat, output_types=["x"])
+        bank.refill()
+        add("mutate insert bank", depth, best_time(lambda data: [mutate(partial(mutate_insert_bank, bank), primitive_set, terminal_set, tree, use_input_ids=True) for tree in data], copies, repeat=repeat))
+        add("mutate shrink", depth, best_time(lambda data: [mutate(mutate_shrink, primitive_set, terminal_set, tree) for tree in data], copies, repeat=repeat))
+        add("one_point_crossover", depth, best_time(lambda data: [one_point_crossover(primitive_set, terminal_set, data[i], data[i - 1]) for i in range(0, count, 2)], copies, repeat=repeat))
+
+    return results
+
+def evaluation_benchmarks(primitive_set, terminal_set, params):
+    """
+    Times evaluate for each depth and dataset length
+    And a whole generation of variation and evaluation for each population size
+
+    Returns:
+        List of results where each result is a dictionary
+    """
+    results = []
+    count = params["trees"]
+    repeat = params["repeat"]
+
+    for depth in params["depths"]:
+        population = [(generate_tree(primitive_set, terminal_set, depth=depth), None) for i in range(count)]
+        for samples in params["samples"]:
+            x = np.random.uniform(-5, 5, samples)
+            y = np.square(x)
+            with np.errstate(all="ignore"):
+                seconds = best_time(lambda data: [evaluate(None, individual, x, y) for individual in population], repeat=repeat)
+            results.append({"benchmark": "evaluate", "params": {"depth": depth, "samples": samples}, "seconds": seconds / count, "unit": "seconds per tree"})
+
+    x = np.random.uniform(-5, 5, 20)
+    y = np.square(x)
+    for pop_size in params["pop_sizes"]:
+        population = [(generate_tree(primitive_set, terminal_set, depth=random.randint(2, 4)), None) for i in range(pop_size)]
+        with np.errstate(all="ignore"):
+            seconds = best_time(lambda data: [evaluate(None, individual, x, y) for individual in vary(population, primitive_set, terminal_set, 0.25, 0.6)], repeat=repeat)
+        results.append({"benchmark": "vary and evaluate", "params": {"pop_size": pop_size, "samples": 20}, "seconds": seconds, "unit": "seconds per generation"})
+
+    return results
+
+def loop_benchmark(generations):
+    """
+    Runs symbolic_regression.py with its own settings and times its first generations
+    The process is stopped once enough generations have started
+
+    Args:
+        generations: number of timed generations
+
+    Returns:
+        List with one result
+    """
+    process = subprocess.Popen([sys.executable, "-u", SYMBOLIC_REGRESSION], cwd=os.path.dirname(SYMBOLIC_REGRESSION),
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+
+    # Time of every "Starting Gen" line
+    starts = []
+    for line in process.stdout:
+        if line.startswith("Starting Gen"):
+            starts.append(time.perf_counter())
+            if len(starts) > generations:
+                break
+    process.terminate()
+    process.wait()
+
+    if len(starts) <= generations:
+        raise RuntimeError("symbolic_regression.py stopped after {} generations".format(len(starts)))
+
+    seconds = starts[-1] - starts[0]
+    return [{"benchmark": "symbolic_regression generations", "params": {"generations": generations}, "seconds": seconds / generations, "unit": "seconds per generation", "generations_per_second": generations / seconds}]
+
+def metadata():
+    """
+    Returns:
+        Dictionary describing the machine and the code which was benchmarked
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = None
+
+    return {"time": datetime.datetime.now().isoformat(), "commit": commit, "python": platform.python_version(), "numpy": np.__version__,
+            "platform": platform.platform(), "cpu_count": os.cpu_count()}
+
+def compare(before, after):
+    """
+    Prints the speedup of every benchmark found in both result files
+
+    Args:
+        before: path of the older JSON results
+        after: path of the newer JSON results
+    """
+    def load(path):
+        with open(path) as f:
+            return {(i["benchmark"], json.dumps(i["params"], sort_keys=True)): i["seconds"] for i in json.load(f)["results"]}
+
+    before = load(before)
+    after = load(after)
+
+    print("{:<34} {:<34} {:>12} {:>12} {:>8}".format("benchmark", "params", "before", "after", "speedup"))
+    for key in before:
+        if key in after:
+            print("{:<34} {:<34} {:>12.3e} {:>12.3e} {:>7.2f}x".format(key[0], key[1], before[key], after[key], before[key] / after[key]))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="point-gp benchmark suite")
+    parser.add_argument("--output", default=None, help="path of the JSON results, printed when not given")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes for a fast check")
+    parser.add_argument("--skip-loop", action="store_true", help="do not run symbolic_regression.py")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two JSON result files")
+    args = parser.parse_args()
+
+    if args.compare is not None:
+        compare(*args.compare)
+        sys.exit()
+
+    params = QUICK if args.quick else FULL
+
+    random.seed(101)
+    np.random.seed(101)
+    primitive_set, terminal_set = build_node_sets()
+    function_pointers = registered_function_pointers()
+
+    with np.errstate(all="ignore"):
+        results = tree_benchmarks(primitive_set, terminal_set, function_pointers, params)
+    results += evaluation_benchmarks(primitive_set, terminal_set, params)
+    if not args.skip_loop:
+        results += loop_benchmark(params["generations"])
+
+    report = {"meta": metadata(), "params": params, "results": results}
+    if args.output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print("Wrote {} results to {}".format(len(results), args.output))
@@ -0,0 +1,77 @@
+"""
+Measures the tree traversals used by the evolutionary operators
+On grown trees of depth 10 to 20 and on a single chain deeper than the recursion limit
+
+Usage: python benchmarks/bench_tree.py
+"""
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from symbolic_regression import build_node_sets
+from tree import generate, generate_tree, find_subtree, apply_at_node, parse_tree
+from node_set import PRIMITIVE_REGISTRY, TERMINAL_REGISTRY
+from mutation import mutate, mutate_insert
+from copy import deepcopy
+import numpy as np
+import random
+import pickle
+import timeit
+
+# Number of trees timed per operation
+TREES = 50
+
+# Depth of the chain which used to hit the recursion limit
+DEEP = 2000
+
+def grow_trees(primitive_set, terminal_set, count, min_depth=10, max_depth=20):
+    """
+    Grows irregular trees by repeated insert mutations
+
+    Returns:
+        List of trees with a depth between min_depth and max_depth
+    """
+    trees = []
+    while len(trees) < count:
+        tree = generate_tree(primitive_set, terminal_set, depth=2)
+        for i in range(random.randint(40, 120)):
+            tree = mutate(mutate_insert, primitive_set, terminal_set, tree, use_input_ids=True)
+        if min_depth <= tree.depth() <= max_depth:
+            trees.append(tree)
+    return trees
+
+def measure(func, repeat=7, number=10):
+    # Best time per tree in microseconds
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / number / TREES * 1e6
+
+if __name__ == '__main__':
+    random.seed(101)
+    primitive_set, terminal_set = build_node_sets()
+
+    trees = grow_trees(primitive_set, terminal_set, TREES)
+    deepest = [max(tree.get_tree_ids(), key=len)[1:] for tree in trees]
+    print("Mean size: {:.1f} Mean depth: {:.1f}".format(np.mean([tree.size() for tree in trees]), np.mean([tree.depth() for tree in trees])))
+
+    operations = {
+        "str": lambda: [str(tree) for tree in trees],
+        "str after edit": lambda: [str(apply_at_node(lambda p, t, node: node, primitive_set, terminal_set, tree, node_id)) for tree, node_id in zip(trees, deepest)],
+        "size": lambda: [tree.size() for tree in trees],
+        "deepcopy": lambda: [deepcopy(tree) for tree in trees],
+        "regenerate_node_ids": lambda: [tree.regenerate_node_ids("", "0") for tree in trees],
+        "find_subtree": lambda: [find_subtree(tree, node_id) for tree, node_id in zip(trees, deepest)],
+        "apply_at_node": lambda: [apply_at_node(lambda p, t, node: node, primitive_set, terminal_set, tree, node_id) for tree, node_id in zip(trees, deepest)],
+        "generate depth 1": lambda: [generate(primitive_set, terminal_set, 1, ["x"], "0") for i in range(TREES)],
+        "generate depth 6": lambda: [generate_tree(primitive_set, terminal_set, depth=6) for i in range(TREES)],
+    }
+
+    print("{:>22} {:>12}".format("operation", "us per tree"))
+    for name, func in operations.items():
+        print("{:>22} {:>12.1f}".format(name, measure(func)))
+
+    # Every traversal must work far beyond the recursion limit
+    line = "sin_x(" * DEEP + "pass_x(x)" + ")" * DEEP
+    tree = parse_tree(line, PRIMITIVE_REGISTRY, TERMINAL_REGISTRY)
+    assert str(deepcopy(tree)) == line
+    assert str(pickle.loads(pickle.dumps(tree))) == line
+    assert find_subtree(tree, "0" * DEEP).name == "pass_x"
+    print("Depth {} tree: size {} depth {}".format(DEEP, tree.size(), tree.depth()))
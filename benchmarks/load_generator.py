@@ -0,0 +1,138 @@
+"""
+Load generator for the inference server in serve.py
+
+Opens several connections which each keep a number of requests in flight
+And reports the client side p50/p99 latency and throughput next to the server statistics
+
+Without --host/--port/--unix a server is started on a temporary Unix socket
+Serving SEED from symbolic_regression.py exported with export.py
+
+Usage: python benchmarks/load_generator.py --connections 16 --in-flight 8 --requests 20000 --rows 4
+       python benchmarks/load_generator.py --port 8765 --model best
+"""
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import numpy as np
+import subprocess
+import argparse
+import tempfile
+import asyncio
+import json
+import time
+
+# Path of the server started when no address is given
+SERVE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "serve.py")
+
+async def connection(open_connection, model, requests, rows, in_flight, latencies, seed):
+    """
+    Sends requests on one connection with up to in_flight requests waiting for a response
+
+    Args:
+        open_connection: coroutine function returning (reader, writer)
+        model: name of the model
+        requests: number of requests sent on this connection
+        rows: number of inputs per request
+        in_flight: maximum number of requests waiting for a response
+        latencies: list receiving the latency of every request in seconds
+        seed: seed of the random inputs
+    """
+    reader, writer = await open_connection()
+    rng = np.random.RandomState(seed)
+    slots = asyncio.Semaphore(in_flight)
+    sent = {}
+
+    async def receive():
+        for i in range(requests):
+            response = json.loads(await reader.readline())
+            if "error" in response:
+                raise RuntimeError(response["error"])
+            latencies.append(time.perf_counter() - sent.pop(response["id"]))
+            slots.release()
+
+    receiver = asyncio.get_running_loop().create_task(receive())
+    for i in range(requests):
+        await slots.acquire()
+        sent[i] = time.perf_counter()
+        writer.write((json.dumps({"id": i, "model": model, "x": rng.uniform(-5, 5, rows).tolist()}) + "\n").encode())
+        await writer.drain()
+    await receiver
+
+    # Ask the server for its own statistics
+    writer.write((json.dumps({"id": "stats", "stats": True}) + "\n").encode())
+    await writer.drain()
+    stats = json.loads(await reader.readline())["stats"]
+    writer.close()
+    return stats
+
+async def generate_load(open_connection, model, connections, requests, rows, in_flight):
+    """
+    Returns:
+        Dictionary with the client side statistics and the statistics of the server
+    """
+    latencies = []
+    per_connection = requests // connections
+    start = time.perf_counter()
+    stats = await asyncio.gather(*[connection(open_connection, model, per_connection, rows, in_flight, latencies, i) for i in range(connections)])
+    seconds = time.perf_counter() - start
+
+    latencies = np.array(latencies) * 1000
+    return {"client": {"requests": len(latencies), "p50_ms": float(np.percentile(latencies, 50)), "p99_ms": float(np.percentile(latencies, 99)),
+                       "requests_per_second": len(latencies) / seconds, "rows_per_second": len(latencies) * rows / seconds},
+            "server": stats[-1]}
+
+def start_server(directory, max_delay):
+    """
+    Exports SEED and serves it on a Unix socket in directory
+
+    Returns:
+        Server process, socket path and model name
+    """
+    from symbolic_regression import build_node_sets, SEED
+    from node_set import PRIMITIVE_REGISTRY, TERMINAL_REGISTRY
+    from tree import parse_tree
+    from export import export_tree
+
+    build_node_sets()
+    export_tree(parse_tree(SEED, PRIMITIVE_REGISTRY, TERMINAL_REGISTRY), os.path.join(directory, "seed.py"))
+
+    path = os.path.join(directory, "serve.sock")
+    process = subprocess.Popen([sys.executable, "-u", SERVE, os.path.join(directory, "seed.py"), "--unix", path, "--max-delay", str(max_delay)], stdout=subprocess.PIPE, text=True)
+
+    # Wait for the server to listen
+    line = process.stdout.readline()
+    if not line.startswith("Serving"):
+        process.kill()
+        raise RuntimeError("Server did not start: {}".format(line))
+    return process, path, "seed"
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load generator for serve.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--unix", default=None)
+    parser.add_argument("--model", default=None, help="name of the model, required with --port or --unix")
+    parser.add_argument("--connections", type=int, default=16)
+    parser.add_argument("--in-flight", type=int, default=8, help="requests waiting for a response per connection")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--rows", type=int, default=4, help="inputs per request")
+    parser.add_argument("--max-delay", type=float, default=0.002, help="batch window of the started server")
+    args = parser.parse_args()
+
+    process = None
+    with tempfile.TemporaryDirectory() as directory:
+        if args.port is None and args.unix is None:
+            process, args.unix, args.model = start_server(directory, args.max_delay)
+
+        if args.unix is not None:
+            open_connection = lambda: asyncio.open_unix_connection(args.unix)
+        else:
+            open_connection = lambda: asyncio.open_connection(args.host, args.port)
+
+        try:
+            print(json.dumps(asyncio.run(generate_load(open_connection, args.model, args.connections, args.requests, args.rows, args.in_flight)), indent=2))
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
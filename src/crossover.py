@@ -1,7 +1,7 @@
 """
 This file contains crossover functions
 """
-from tree import apply_at_node, find_subtree, check_tree_ids
+from tree import apply_at_node, find_subtree, within_limits, check_tree_ids
 from functools import partial
 from copy import deepcopy
 import random
@@ -72,23 +72,40 @@ def find_valid_nodes(node_ids, tree_1, tree_2):
 
     return subtree_1, valid_node_id, subtree_2, node_id
 
-def one_point_crossover(primitive_set, terminal_set, tree_1, tree_2):
+def one_point_crossover(primitive_set, terminal_set, tree_1, tree_2, max_size=None, max_depth=None, retries=3):
     """
     Picks a random node with the same output type in each tree 
     and swaps the corresponding subtrees
 
+    With limits, the swap points are picked again until both children are within the limits
+    A child which is still over the limits after every retry is returned unchanged
+
     Args:
         primitive_set: dictionary where (key, value) is (output_type, [{"name", "input_types", "group"}, ...])
         terminal_set:  dictionary where (key, value) is (output_type, [{"name", "generator", "static"}, ...])
         tree_1: Node containing full tree
         tree_2: Node containing full tree
+        max_size: maximum number of nodes of each child or None for no limit
+        max_depth: maximum number of levels of each child or None for no limit
+        retries: number of swap points tried
 
     Returns:
         Node containing full tree
     """
-    # Find a random subtree of the first tree AND a valid node id of the second tree
-    subtree_1, node_id_1, subtree_2, node_id_2 = find_valid_nodes(tree_1.get_tree_ids(), tree_1, tree_2)
+    for i in range(retries):
+        # Find a random subtree of the first tree AND a valid node id of the second tree
+        subtree_1, node_id_1, subtree_2, node_id_2 = find_valid_nodes(tree_1.get_tree_ids(), tree_1, tree_2)
+
+        # Cached sizes and depths are enough to check both children before copying anything
+        fits_2 = within_limits(tree_2, node_id_1, subtree_2, subtree_1, max_size, max_depth)
+        fits_1 = within_limits(tree_1, node_id_2, subtree_1, subtree_2, max_size, max_depth)
+        if fits_1 and fits_2:
+            break
 
     # Recurse through the tree until the node is found
     # Then apply the crossover
-    return apply_at_node(partial(swap_subtree, deepcopy(subtree_1)), primitive_set, terminal_set, tree_2, node_id_1), apply_at_node(partial(swap_subtree, deepcopy(subtree_2)), primitive_set, terminal_set, tree_1, node_id_2)
\ No newline at end of file
+    if fits_2:
+        tree_2 = apply_at_node(partial(swap_subtree, deepcopy(subtree_1)), primitive_set, terminal_set, tree_2, node_id_1)
+    if fits_1:
+        tree_1 = apply_at_node(partial(swap_subtree, deepcopy(subtree_2)), primitive_set, terminal_set, tree_1, node_id_2)
+    return tree_2, tree_1
\ No newline at end of file
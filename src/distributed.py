@@ -0,0 +1,487 @@
+"""
+This file contains a socket based evaluation worker and the executor which uses it
+
+Messages are length prefixed pickles sent over TCP
+Tasks are sent in batches and several batches are kept in flight per worker
+NumPy arrays are sent once per connection and referenced by key afterwards
+
+Trust model:
+    Unpickling a message can run arbitrary code, so only holders of the shared key are trusted
+    Every message carries an HMAC-SHA256 of its pickle under the key
+    And is checked before anything is unpickled, a connection with a bad HMAC is dropped
+    Messages are not encrypted and a captured message can be replayed on the same worker
+    So workers listen on localhost by default and should only be exposed on trusted networks
+    The key is read from the POINT_GP_AUTHKEY environment variable, local workers get a random key
+
+Usage: POINT_GP_AUTHKEY=secret python distributed.py --port 5000 --setup symbolic_regression:build_node_sets
+"""
+from collections import namedtuple
+import multiprocessing
+import socketserver
+import numpy as np
+import importlib
+import itertools
+import threading
+import argparse
+import weakref
+import socket
+import pickle
+import struct
+import queue
+import hmac
+import sys
+import os
+
+# Start method of local worker processes
+START_METHOD = "spawn" if sys.platform == 'win32' else "forkserver"
+
+# Header holding the length of every message
+HEADER = struct.Struct("!Q")
+
+# Environment variable holding the shared key of the workers and the executor
+AUTHKEY_VARIABLE = "POINT_GP_AUTHKEY"
+
+# Size of the HMAC-SHA256 which follows the header
+DIGEST_SIZE = 32
+
+# Reference to an array the worker already cached for this connection
+CachedArray = namedtuple("CachedArray", ["key"])
+
+def authkey_from_environment():
+    """
+    Returns:
+        Shared key as bytes
+
+    Raises:
+        ValueError if the environment variable is not set
+    """
+    key = os.environ.get(AUTHKEY_VARIABLE)
+    if not key:
+        raise ValueError("Remote workers need a shared key in the {} environment variable".format(AUTHKEY_VARIABLE))
+    return key.encode()
+
+def send_message(sock, message, authkey):
+    """
+    Pickles a message and sends it with its length and HMAC
+
+    Args:
+        sock: connected socket
+        message: picklable object
+        authkey: shared key as bytes
+    """
+    data = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+    sock.sendall(HEADER.pack(len(data)) + hmac.new(authkey, data, "sha256").digest() + data)
+
+def recv_exact(sock, size):
+    """
+    Reads exactly size bytes from the socket
+
+    Args:
+        sock: connected socket
+        size: number of bytes
+
+    Returns:
+        bytes or None if the connection was closed
+    """
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if len(chunk) == 0:
+            return None
+        data += chunk
+    return bytes(data)
+
+def recv_message(sock, authkey):
+    """
+    Reads one message sent with send_message
+    The HMAC is checked before the message is unpickled
+
+    Args:
+        sock: connected socket
+        authkey: shared key as bytes
+
+    Returns:
+        Unpickled message or None if the connection was closed
+
+    Raises:
+        ConnectionError if the HMAC does not match
+    """
+    header = recv_exact(sock, HEADER.size + DIGEST_SIZE)
+    if header is None:
+        return None
+
+    data = recv_exact(sock, HEADER.unpack(header[:HEADER.size])[0])
+    if data is None:
+        return None
+
+    if not hmac.compare_digest(header[HEADER.size:], hmac.new(authkey, data, "sha256").digest()):
+        raise ConnectionError("Message with an invalid HMAC")
+
+    return pickle.loads(data)
+
+def load_callable(path):
+    """
+    Imports a callable from a "module:function" string
+
+    Args:
+        path: string such as "symbolic_regression:build_node_sets"
+
+    Returns:
+        Callable function
+    """
+    module, name = path.split(":")
+    return getattr(importlib.import_module(module), name)
+
+class WorkerHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        # Arrays cached for this session
+        arrays = {}
+        authkey = self.server.authkey
+
+        while True:
+            try:
+                message = recv_message(self.request, authkey)
+            except ConnectionError:
+                # Unauthenticated client
+                return
+
+            # Client closed the connection
+            if message is None or message[0] == "close":
+                return
+
+            if message[0] == "array":
+                key, array = message[1:]
+                arrays[key] = array
+                continue
+
+            # Arrays the executor no longer uses
+            if message[0] == "drop":
+                for key in message[1]:
+                    arrays.pop(key, None)
+                continue
+
+            # ("evaluate", batch_id, [(func, args), ...])
+            # Every task gets ("ok", result) or ("error", repr of the exception) so one failure does not fail its batch
+            batch_id, tasks = message[1:]
+            results = []
+            for func, args in tasks:
+                try:
+                    args = [arrays[i.key] if isinstance(i, CachedArray) else i for i in args]
+                    results.append(("ok", func(*args)))
+                except Exception as e:
+                    results.append(("error", repr(e)))
+            send_message(self.request, ("results", batch_id, results), authkey)
+
+def serve(host, port, authkey, setup=None, ready=None):
+    """
+    Runs an evaluation worker until the process is stopped
+
+    Args:
+        host: host name to bind
+        port: port to bind, 0 picks a free port
+        authkey: shared key as bytes which every message must be signed with
+        setup: callable which registers the primitives and terminals
+        ready: optional queue which receives the bound (host, port)
+    """
+    if setup is not None:
+        setup()
+
+    socketserver.ThreadingTCPServer.allow_reuse_address = True
+    with socketserver.ThreadingTCPServer((host, port), WorkerHandler) as server:
+        server.authkey = authkey
+        if ready is not None:
+            ready.put(server.server_address)
+        server.serve_forever()
+
+def start_local_workers(processes, authkey, setup=None, start_method=START_METHOD):
+    """
+    Starts evaluation workers on localhost
+
+    Args:
+        processes: number of worker processes
+        authkey: shared key as bytes
+        setup: callable which registers the primitives and terminals
+        start_method: multiprocessing start method
+
+    Returns:
+        List of worker processes and list of their (host, port) addresses
+    """
+    context = multiprocessing.get_context(start_method)
+    ready = context.Queue()
+
+    workers = [context.Process(target=serve, args=("127.0.0.1", 0, authkey, setup, ready), daemon=True) for i in range(processes)]
+    for worker in workers:
+        worker.start()
+
+    return workers, [ready.get() for worker in workers]
+
+class RemoteExecutor():
+    def __init__(self, processes, initializer=None, initargs=(), addresses=None, batch_size=16, window=4, authkey=None):
+        """
+        Connects to evaluation workers
+
+        Args:
+            processes: number of local workers started when addresses is None
+            initializer: setup callable of the local workers
+            initargs: unused, workers call initializer without arguments
+            addresses: list of (host, port) of running workers
+            batch_size: maximum number of tasks per message
+            window: number of batches in flight per worker
+            authkey: shared key as bytes, None reads POINT_GP_AUTHKEY for remote workers
+                     And uses a random key for local workers
+        """
+        self.local_workers = []
+        if addresses is None:
+            self.authkey = authkey if authkey is not None else os.urandom(32)
+            self.local_workers, addresses = start_local_workers(processes, self.authkey, initializer)
+        else:
+            self.authkey = authkey if authkey is not None else authkey_from_environment()
+
+        self.processes = len(addresses)
+        self.batch_size = batch_size
+        self.window = window
+
+        # Tasks waiting to be sent where each task is (func, args, callback, error_callback)
+        self.tasks = queue.Queue()
+
+        # Key of every array sent to the workers by id, where (key, value) is (id, (weak reference, key))
+        # Keys are never reused so a new array with the id of a freed one always gets a new key
+        self.arrays = {}
+        self.array_keys = itertools.count()
+        self.arrays_lock = threading.Lock()
+
+        # State of every worker connection shared by its sending and receiving thread
+        self.links = []
+        self.threads = []
+        for address in addresses:
+            link = {"socket": socket.create_connection(address), "in_flight": {}, "slots": threading.Semaphore(window),
+                    "lock": threading.Lock(), "dead": False, "sent_arrays": set(), "dropped": []}
+            self.links.append(link)
+            self.threads.append(threading.Thread(target=self._send, args=(link,), daemon=True))
+            self.threads.append(threading.Thread(target=self._receive, args=(link,), daemon=True))
+        for thread in self.threads:
+            thread.start()
+
+    def _array_key(self, array):
+        """
+        Returns:
+            Integer key of the array, a new key the first time the array is seen
+        """
+        with self.arrays_lock:
+            entry = self.arrays.get(id(array))
+            if entry is not None and entry[0]() is array:
+                return entry[1]
+
+            key = next(self.array_keys)
+            self.arrays[id(array)] = (weakref.ref(array), key)
+            weakref.finalize(array, self._forget, id(array), key)
+            return key
+
+    def _forget(self, array_id, key):
+        # Called when an array is freed so the workers drop their copy
+        with self.arrays_lock:
+            if self.arrays.get(array_id, (None, None))[1] == key:
+                del self.arrays[array_id]
+        for link in self.links:
+            link["dropped"].append(key)
+
+    def _fail(self, batch, error):
+        for func, args, callback, error_callback in batch:
+            error_callback(error)
+
+    def _send(self, link):
+        """
+        Groups waiting tasks into batches and sends them to one worker
+        """
+        connection = link["socket"]
+        batch_id = 0
+        while True:
+            # Wait for a free slot and at least one task
+            link["slots"].acquire()
+            task = self.tasks.get()
+            if task is None:
+                if not link["dead"]:
+                    try:
+                        send_message(connection, ("close",), self.authkey)
+                    except OSError:
+                        pass
+                return
+
+            if link["dead"]:
+                # Leave the task to the other workers or fail it when every worker is gone
+                if any(not other["dead"] for other in self.links):
+                    self.tasks.put(task)
+                    return
+                self._fail([task], ConnectionError("Every remote worker closed its connection"))
+                link["slots"].release()
+                continue
+
+            # Add tasks which are already waiting
+            # Small task lists are spread out so every worker gets a share
+            limit = min(self.batch_size, max(1, (self.tasks.qsize() + 1) // self.processes))
+            batch = [task]
+            while len(batch) < limit:
+                try:
+                    task = self.tasks.get_nowait()
+                except queue.Empty:
+                    break
+                if task is None:
+                    # Leave the stop signal for after this batch
+                    self.tasks.put(None)
+                    break
+                batch.append(task)
+
+            with link["lock"]:
+                if link["dead"]:
+                    # The receiving thread already failed the batches in flight
+                    for task in batch:
+                        self.tasks.put(task)
+                    link["slots"].release()
+                    continue
+                in_flight_batch = batch_id
+                link["in_flight"][batch_id] = batch
+            batch_id += 1
+
+            try:
+                # Workers drop the arrays which were freed
+                dropped = [key for key in [link["dropped"].pop(0) for i in range(len(link["dropped"]))] if key in link["sent_arrays"]]
+                link["sent_arrays"].difference_update(dropped)
+                if len(dropped) > 0:
+                    send_message(connection, ("drop", dropped), self.authkey)
+
+                # Send new arrays once and replace every array by its key
+                message = []
+                for func, args, callback, error_callback in batch:
+                    new_args = []
+                    for arg in args:
+                        if isinstance(arg, np.ndarray):
+                            key = self._array_key(arg)
+                            if key not in link["sent_arrays"]:
+                                send_message(connection, ("array", key, arg), self.authkey)
+                                link["sent_arrays"].add(key)
+                            arg = CachedArray(key)
+                        new_args.append(arg)
+                    message.append((func, new_args))
+
+                send_message(connection, ("evaluate", in_flight_batch, message), self.authkey)
+            except OSError:
+                # The receiving thread fails every batch in flight when it sees the closed socket
+                self._close_link(link)
+
+    def _close_link(self, link):
+        """
+        Marks a connection as dead and fails every batch it had in flight
+        """
+        with link["lock"]:
+            link["dead"] = True
+            batches = list(link["in_flight"].values())
+            link["in_flight"].clear()
+
+        try:
+            link["socket"].shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+        for batch in batches:
+            self._fail(batch, ConnectionError("Remote worker closed its connection"))
+            link["slots"].release()
+
+        # Wake the sending thread if every slot was taken
+        link["slots"].release()
+
+    def _receive(self, link):
+        """
+        Reads results from one worker and runs the callbacks
+        """
+        while True:
+            try:
+                message = recv_message(link["socket"], self.authkey)
+            except (OSError, ConnectionError):
+                message = None
+
+            if message is None:
+                self._close_link(link)
+                return
+
+            batch_id, results = message[1:]
+            with link["lock"]:
+                batch = link["in_flight"].pop(batch_id, None)
+            if batch is None:
+                # Already failed after a send error
+                continue
+            link["slots"].release()
+
+            for (func, args, callback, error_callback), (status, result) in zip(batch, results):
+                if status == "error":
+                    error_callback(RuntimeError("Remote worker failed: {}".format(result)))
+                else:
+                    callback(result)
+
+    def submit(self, func, args, callback, error_callback):
+        """
+        Queues func to run on a worker without waiting for the result
+
+        Args:
+            func: callable which can be imported by name on the worker
+            args: tuple of arguments
+            callback: callable which receives the result
+            error_callback: callable which receives the exception if func raises
+        """
+        self.tasks.put((func, args, callback, error_callback))
+
+    def starmap(self, func, iterable):
+        """
+        Runs func on every tuple of arguments across every worker
+
+        Args:
+            func: callable which can be imported by name on the worker
+            iterable: list of argument tuples
+
+        Returns:
+            List of results in the same order as iterable
+        """
+        iterable = list(iterable)
+        results = [None] * len(iterable)
+        errors = []
+        done = threading.Semaphore(0)
+
+        def on_result(i):
+            def callback(result):
+                results[i] = result
+                done.release()
+            return callback
+
+        def on_error(e):
+            errors.append(e)
+            done.release()
+
+        for i, args in enumerate(iterable):
+            self.submit(func, args, on_result(i), on_error)
+
+        for i in range(len(iterable)):
+            done.acquire()
+
+        if len(errors) > 0:
+            raise errors[0]
+
+        return results
+
+    def close(self):
+        # One stop signal per sending thread
+        for link in self.links:
+            self.tasks.put(None)
+        for thread in self.threads:
+            thread.join()
+        for link in self.links:
+            link["socket"].close()
+        for worker in self.local_workers:
+            worker.terminate()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Evaluation worker")
+    parser.add_argument("--host", default="127.0.0.1", help="host name to bind, only use a public address on a trusted network")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--setup", default=None, help="module:function which registers the primitives and terminals")
+    args = parser.parse_args()
+
+    serve(args.host, args.port, authkey_from_environment(), load_callable(args.setup) if args.setup is not None else None)
@@ -0,0 +1,178 @@
+"""
+This file contains population diversity statistics computed from MinHash sketches
+
+Every tree is summarized by the set of hashes of its subtrees
+A MinHash sketch of that set estimates the Jaccard similarity between two trees
+Population statistics use the sketches only, so they grow linearly with the population:
+    diversity: mean pairwise Jaccard distance, computed from how often sketch values repeat per position
+    duplicates: individuals whose sketch equals the sketch of an earlier individual
+    near_duplicates: individuals which share a locality-sensitive hashing bucket with another individual
+    clusters: connected groups of individuals linked by shared buckets
+"""
+import numpy as np
+import hashlib
+
+# Modulus of the subtree hashes
+PRIME = (1 << 61) - 1
+
+# Multiplier combining the hash of a node with the hashes of its children
+BASE = 1000003
+
+# 64 bit hash of every node name and terminal seen so far
+TOKEN_HASHES = {}
+
+def token_hash(token):
+    """
+    Args:
+        token: string such as a primitive name or a terminal with its value
+
+    Returns:
+        Deterministic hash of the string which does not depend on PYTHONHASHSEED
+    """
+    value = TOKEN_HASHES.get(token)
+    if value is None:
+        value = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little") % PRIME
+        TOKEN_HASHES[token] = value
+    return value
+
+def subtree_hashes(tree):
+    """
+    Hashes every subtree of a tree bottom up
+    Equal subtrees get equal hashes wherever they are in any tree
+
+    Args:
+        tree: Node containing full tree
+
+    Returns:
+        Numpy array of the unique subtree hashes
+    """
+    hashes = {}
+    for node in reversed(tree.preorder()):
+        if node.args:
+            value = TOKEN_HASHES.get(node.name) or token_hash(node.name)
+            for child in node.args:
+                value = (value * BASE + hashes[id(child)]) % PRIME
+        else:
+            # Terminals include their value so different constants are different subtrees
+            token = str(node)
+            value = TOKEN_HASHES.get(token) or token_hash(token)
+        hashes[id(node)] = value
+    return np.unique(np.fromiter(hashes.values(), dtype=np.uint64, count=len(hashes)))
+
+class MinHasher():
+    def __init__(self, sketch_size=64, bands=16, seed=0):
+        """
+        Args:
+            sketch_size: number of hash functions of every sketch
+            bands: number of locality-sensitive hashing bands, must divide sketch_size
+                   Individuals with a Jaccard similarity above about (1 / bands) ** (bands / sketch_size) likely share a bucket
+            seed: seed of the hash functions so sketches are comparable across generations
+        """
+        if sketch_size % bands != 0:
+            raise ValueError("Bands: {} Does not divide sketch size: {}".format(bands, sketch_size))
+
+        self.sketch_size = sketch_size
+        self.bands = bands
+
+        # Multiply-shift hash functions ((a * h + b) mod 2^64) >> 32 with odd a
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(0, 1 << 62, size=sketch_size, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.b = rng.randint(0, 1 << 62, size=sketch_size, dtype=np.uint64)
+
+    def sketch(self, tree):
+        """
+        Args:
+            tree: Node containing full tree
+
+        Returns:
+            Numpy array with the minimum of every hash function over the subtree hashes
+        """
+        hashes = subtree_hashes(tree)
+        return np.min((self.a[:, None] * hashes[None, :] + self.b[:, None]) >> np.uint64(32), axis=1)
+
+    def sketches(self, trees):
+        """
+        Returns:
+            Numpy array with shape (trees, sketch_size)
+        """
+        return np.array([self.sketch(tree) for tree in trees], dtype=np.uint64).reshape(len(trees), self.sketch_size)
+
+def approximate_diversity(sketches):
+    """
+    Mean pairwise Jaccard distance estimated from the sketches without comparing pairs
+    For each position the number of equal pairs follows from how often each value occurs
+
+    Args:
+        sketches: numpy array with shape (individuals, sketch_size)
+
+    Returns:
+        Float between 0 (every tree is the same) and 1
+    """
+    individuals = len(sketches)
+    if individuals < 2:
+        return 0.0
+
+    equal_pairs = 0
+    for column in sketches.T:
+        counts = np.unique(column, return_counts=True)[1]
+        equal_pairs += np.sum(counts * (counts - 1))
+    return 1.0 - equal_pairs / (individuals * (individuals - 1) * sketches.shape[1])
+
+def band_buckets(sketches, bands):
+    """
+    Args:
+        sketches: numpy array with shape (individuals, sketch_size)
+        bands: number of bands
+
+    Returns:
+        Numpy array with shape (bands, individuals) of the bucket of every individual in every band
+    """
+    rows = sketches.shape[1] // bands
+    return np.array([np.unique(sketches[:, band * rows:(band + 1) * rows], axis=0, return_inverse=True)[1].reshape(-1) for band in range(bands)])
+
+def cluster_labels(buckets):
+    """
+    Connected components of individuals linked by a shared bucket in any band
+    Each individual repeatedly takes the lowest label in its buckets until nothing changes
+
+    Args:
+        buckets: numpy array returned by band_buckets
+
+    Returns:
+        Numpy array with the label of the cluster of every individual
+    """
+    labels = np.arange(buckets.shape[1])
+    while True:
+        new_labels = labels.copy()
+        for bucket in buckets:
+            lowest = np.full(bucket.max() + 1, len(labels))
+            np.minimum.at(lowest, bucket, new_labels)
+            new_labels = np.minimum(new_labels, lowest[bucket])
+        if np.array_equal(new_labels, labels):
+            return labels
+        labels = new_labels
+
+def diversity_stats(trees, hasher):
+    """
+    Args:
+        trees: list of Nodes
+        hasher: MinHasher
+
+    Returns:
+        Dictionary with the diversity, duplicates, near_duplicates and clusters of the trees
+    """
+    if len(trees) == 0:
+        return {"diversity": None, "duplicates": 0, "near_duplicates": 0, "clusters": 0}
+
+    sketches = hasher.sketches(trees)
+    buckets = band_buckets(sketches, hasher.bands)
+
+    # Individuals in a bucket with at least one other individual
+    shared = np.zeros(len(trees), dtype=bool)
+    for bucket in buckets:
+        shared |= np.bincount(bucket)[bucket] > 1
+
+    return {"diversity": float(approximate_diversity(sketches)),
+            "duplicates": int(len(trees) - len(np.unique(sketches, axis=0))),
+            "near_duplicates": int(np.count_nonzero(shared)),
+            "clusters": int(len(np.unique(cluster_labels(buckets))))}
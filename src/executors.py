@@ -0,0 +1,222 @@
+"""
+This file contains the executors used to run fitness evaluations
+
+Every executor exposes the same starmap(func, iterable), submit(...) and close() methods
+So the evolution loop can switch between them per run
+"""
+from multiprocessing.pool import ThreadPool
+from distributed import RemoteExecutor
+import multiprocessing
+import numpy as np
+import threading
+import heapq
+import time
+import sys
+
+# Start method of worker processes
+# Workers do not inherit the parent's memory so primitives are rebuilt with an initializer
+START_METHOD = "spawn" if sys.platform == 'win32' else "forkserver"
+
+class SerialExecutor():
+    def __init__(self, processes=1, initializer=None, initargs=()):
+        # Everything runs in the calling thread
+        self.processes = 1
+
+    def starmap(self, func, iterable):
+        """
+        Calls func on every tuple of arguments in order
+
+        Args:
+            func: callable function
+            iterable: list of argument tuples
+
+        Returns:
+            List of results in the same order as iterable
+        """
+        return [func(*args) for args in iterable]
+
+    def submit(self, func, args, callback, error_callback):
+        """
+        Runs func without waiting for the result
+        callback receives the result when it is ready
+
+        Args:
+            func: callable function
+            args: tuple of arguments
+            callback: callable which receives the result
+            error_callback: callable which receives the exception if func raises
+        """
+        try:
+            result = func(*args)
+        except Exception as e:
+            error_callback(e)
+        else:
+            callback(result)
+
+    def close(self):
+        pass
+
+class ThreadExecutor(SerialExecutor):
+    def __init__(self, processes, initializer=None, initargs=()):
+        # Threads share memory with the caller so nothing gets serialized
+        # NumPy ufuncs release the GIL which lets large arrays run in parallel
+        self.processes = processes
+        self.pool = ThreadPool(processes=processes)
+
+    def starmap(self, func, iterable):
+        return self.pool.starmap(func, iterable)
+
+    def submit(self, func, args, callback, error_callback):
+        self.pool.apply_async(func, args, callback=callback, error_callback=error_callback)
+
+    def close(self):
+        self.pool.terminate()
+
+class ProcessExecutor(ThreadExecutor):
+    def __init__(self, processes, initializer=None, initargs=(), start_method=START_METHOD):
+        # Every task and its arguments are pickled to cross the process boundary
+        # Trees and node sets pickle as name references (see node_set.py)
+        # So initializer must register the same primitives and terminals in every worker
+        self.processes = processes
+        self.pool = multiprocessing.get_context(start_method).Pool(processes=processes, initializer=initializer, initargs=initargs)
+
+# Name of each executor which can be chosen per run
+EXECUTORS = {"serial": SerialExecutor, "thread": ThreadExecutor, "process": ProcessExecutor, "remote": RemoteExecutor}
+
+def make_executor(name, processes, initializer=None, initargs=(), **options):
+    """
+    Creates an executor by name
+
+    Args:
+        name: "serial", "thread", "process" or "remote"
+        processes: number of workers
+        initializer: callable run once in every worker process
+        initargs: arguments of initializer
+        options: extra keyword arguments of the executor, such as addresses for "remote"
+
+    Returns:
+        Executor object
+    """
+    if name not in EXECUTORS:
+        raise ValueError("Executor: {} Is not one of {}".format(name, list(EXECUTORS.keys())))
+
+    return EXECUTORS[name](processes, initializer=initializer, initargs=initargs, **options)
+
+def estimate_cost(tree, primitive_costs=None):
+    """
+    Estimates how expensive a tree is to evaluate
+
+    Args:
+        tree: Node containing full tree
+        primitive_costs: optional dictionary where (key, value) is (name, seconds per call)
+
+    Returns:
+        Tree size if primitive_costs is None, otherwise the sum of the primitive costs
+    """
+    if primitive_costs is None:
+        return tree.size()
+
+    # Every node adds the cost of its primitive, terminals cost nothing
+    return sum(primitive_costs.get(node.name, 0.0) for node in tree.preorder())
+
+def measure_primitive_costs(primitive_set, x, repeats=20):
+    """
+    Times every primitive on an input the size of the dataset
+
+    Args:
+        primitive_set: PrimitiveSet
+        x: numpy array of the dataset inputs
+        repeats: number of calls averaged per primitive
+
+    Returns:
+        Dictionary where (key, value) is (name, seconds per call)
+    """
+    primitive_costs = {}
+    by_name = primitive_set.struct_by_name()
+    for name in by_name:
+        # "x" inputs get the dataset and every other input gets a scalar
+        args = [x if input_type == "x" else 1.0 for input_type in by_name[name]["input_types"]]
+
+        func = primitive_set.function_pointers[name]
+        with np.errstate(all="ignore"):
+            start = time.perf_counter()
+            for i in range(repeats):
+                func(*args)
+        primitive_costs[name] = (time.perf_counter() - start) / repeats
+
+    return primitive_costs
+
+def longest_processing_time(costs, bins):
+    """
+    Splits tasks into balanced bins with longest-processing-time-first scheduling
+    Each task goes to the bin with the lowest total cost so far
+
+    Args:
+        costs: list of estimated task costs
+        bins: number of bins
+
+    Returns:
+        List of bins where each bin is a list of task indices
+    """
+    # Heap of (total cost, bin index)
+    heap = [(0.0, i) for i in range(bins)]
+    chunks = [[] for i in range(bins)]
+    for index in sorted(range(len(costs)), key=lambda i: costs[i], reverse=True):
+        total, i = heapq.heappop(heap)
+        chunks[i].append(index)
+        heapq.heappush(heap, (total + costs[index], i))
+
+    return [chunk for chunk in chunks if len(chunk) > 0]
+
+def run_chunk(func, chunk):
+    """
+    Runs a chunk of tasks inside one worker
+
+    Args:
+        func: callable function
+        chunk: list of argument tuples
+
+    Returns:
+        List of results, name of the worker and seconds spent working
+    """
+    start = time.perf_counter()
+    results = [func(*args) for args in chunk]
+
+    # Process pools name their processes and thread pools name their threads
+    worker = multiprocessing.current_process().name
+    if worker == "MainProcess":
+        worker = threading.current_thread().name
+
+    return results, worker, time.perf_counter() - start
+
+def balanced_starmap(executor, func, iterable, costs):
+    """
+    Runs func on every tuple of arguments in chunks balanced by estimated cost
+
+    Args:
+        executor: SerialExecutor, ThreadExecutor or ProcessExecutor
+        func: callable function
+        iterable: list of argument tuples
+        costs: list of estimated costs (one per argument tuple)
+
+    Returns:
+        List of results in the same order as iterable
+        Dictionary with the wall time, the busy and idle time of every worker and the number of unused workers
+    """
+    iterable = list(iterable)
+    chunks = longest_processing_time(costs, executor.processes)
+
+    start = time.perf_counter()
+    chunk_results = executor.starmap(run_chunk, [(func, [iterable[i] for i in chunk]) for chunk in chunks])
+    wall = time.perf_counter() - start
+
+    # Put results back in their original order and add up the time of each worker
+    results = [None] * len(iterable)
+    busy = {}
+    for chunk, (chunk_result, worker, seconds) in zip(chunks, chunk_results):
+        for i, result in zip(chunk, chunk_result):
+            results[i] = result
+        busy[worker] = busy.get(worker, 0.0) + seconds
+
+    # Workers which never received a chunk were idle for the whole call
+    return results, {"wall": wall, "busy": busy, "idle": {worker: max(0.0, wall - busy[worker]) for worker in busy}, "unused": max(0, executor.processes - len(busy))}
@@ -0,0 +1,191 @@
+"""
+This file exports a tree as a standalone Python module which only needs NumPy
+
+Subtrees without an "x" terminal are folded into float literals
+Repeated subtrees are computed once and shared
+Every remaining primitive becomes one assignment so deep trees do not nest
+
+The module has a batch predict(x) which reads .npy inputs as memory-mapped files
+And evaluates them in chunks so inputs larger than memory can be scored
+
+Usage: python export.py "<tree string>" model.py
+       python model.py input.npy output.npy
+"""
+from node_set import PRIMITIVE_REGISTRY, TERMINAL_REGISTRY, registered_function_pointers
+from tree import TerminalNode, parse_tree, is_constant
+from distributed import load_callable
+import numpy as np
+import argparse
+
+# Primitives whose arguments can be swapped without changing the result
+COMMUTATIVE = {"np.add", "np.multiply"}
+
+# Code of the exported module after the generated tree_func
+MODULE_TEMPLATE = '''"""
+Standalone prediction function exported from point-gp
+
+Tree: {tree}
+
+Usage: python model.py input.npy output.npy
+"""
+import numpy as np
+
+# Tree the module was exported from
+TREE = {tree!r}
+
+# Number of rows evaluated at once by predict
+CHUNK_SIZE = 1000000
+
+{function}
+
+def predict(x, out=None, chunk_size=CHUNK_SIZE):
+    """
+    Evaluates the model on a batch of inputs in chunks
+
+    Args:
+        x: numpy array of inputs or path of a .npy file which is memory mapped
+        out: optional numpy array or path of a .npy file receiving the predictions
+        chunk_size: number of rows evaluated at once
+
+    Returns:
+        Numpy array of predictions (memory mapped when out is a path)
+    """
+    if isinstance(x, str):
+        x = np.load(x, mmap_mode="r")
+
+    if out is None:
+        out = np.empty(np.shape(x), dtype=np.float64)
+    elif isinstance(out, str):
+        out = np.lib.format.open_memmap(out, mode="w+", dtype=np.float64, shape=np.shape(x))
+
+    with np.errstate(all="ignore"):
+        for start in range(0, len(x), chunk_size):
+            out[start:start + chunk_size] = tree_func(np.asarray(x[start:start + chunk_size], dtype=np.float64))
+
+    if isinstance(out, np.memmap):
+        out.flush()
+    return out
+
+if __name__ == '__main__':
+    import sys
+    predict(sys.argv[1], sys.argv[2])
+'''
+
+def numpy_name(func, name):
+    """
+    Args:
+        func: function of a primitive
+        name: name of the primitive
+
+    Returns:
+        Source code referring to the same NumPy function such as "np.add"
+    """
+    if isinstance(func, np.ufunc) and getattr(np, func.__name__, None) is func:
+        return "np." + func.__name__
+
+    raise ValueError("Primitive: {} Can not be exported, only NumPy ufuncs are supported".format(name))
+
+def literal(value):
+    """
+    Args:
+        value: float
+
+    Returns:
+        Source code of the float which evaluates to exactly the same value
+    """
+    if np.isnan(value):
+        return "np.nan"
+    if np.isinf(value):
+        return "np.inf" if value > 0 else "-np.inf"
+    return repr(float(value))
+
+def export_function(tree, function_pointers=None):
+    """
+    Converts a tree into the source of tree_func(x) with constants folded and subtrees shared
+
+    Args:
+        tree: Node containing full tree
+        function_pointers: dictionary where (key, value) is (string, function) or None to use the registry
+
+    Returns:
+        String of the source code of tree_func(x)
+    """
+    if function_pointers is None:
+        function_pointers = registered_function_pointers()
+
+    # Value of every node: ("constant", float) or ("expression", source)
+    values = {}
+
+    # Variable holding each distinct subtree where the key is the canonical source of the subtree
+    variables = {}
+    lines = []
+
+    # Children come before their parents
+    with np.errstate(all="ignore"):
+        for node in reversed(tree.preorder()):
+            if is_constant(node):
+                values[id(node)] = ("constant", np.float64(node.value))
+                continue
+            if isinstance(node, TerminalNode):
+                values[id(node)] = ("expression", str(node.value))
+                continue
+
+            func = function_pointers[node.name]
+            args = [values.pop(id(i)) for i in node.args]
+
+            # Every argument is known so the subtree is computed now
+            if all(kind == "constant" for kind, value in args):
+                values[id(node)] = ("constant", np.float64(func(*[value for kind, value in args])))
+                continue
+
+            name = numpy_name(func, node.name)
+            sources = [literal(value) if kind == "constant" else value for kind, value in args]
+            key = "{}({})".format(name, ", ".join(sorted(sources) if name in COMMUTATIVE else sources))
+            if key not in variables:
+                variables[key] = "v{}".format(len(variables))
+                lines.append("    {} = {}({})".format(variables[key], name, ", ".join(sources)))
+            values[id(node)] = ("expression", variables[key])
+
+    kind, value = values[id(tree)]
+    if kind == "constant":
+        # Trees without x predict the same value for every row
+        lines.append("    return np.full(np.shape(x), {})".format(literal(value)))
+    elif value == "x":
+        lines.append("    return np.array(x, dtype=np.float64)")
+    else:
+        lines.append("    return np.broadcast_to({}, np.shape(x))".format(value))
+
+    return "\n".join(["def tree_func(x):"] + lines)
+
+def export_module(tree, function_pointers=None):
+    """
+    Args:
+        tree: Node containing full tree
+        function_pointers: dictionary where (key, value) is (string, function) or None to use the registry
+
+    Returns:
+        String of the source code of a module with tree_func(x) and predict(x, out, chunk_size)
+    """
+    return MODULE_TEMPLATE.format(tree=str(tree), function=export_function(tree, function_pointers))
+
+def export_tree(tree, path, function_pointers=None):
+    """
+    Writes the module of a tree to a file
+
+    Args:
+        tree: Node containing full tree
+        path: path of the Python module
+        function_pointers: dictionary where (key, value) is (string, function) or None to use the registry
+    """
+    with open(path, "w") as f:
+        f.write(export_module(tree, function_pointers))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export a tree as a standalone NumPy module")
+    parser.add_argument("tree", help="string of the tree")
+    parser.add_argument("output", help="path of the Python module")
+    parser.add_argument("--setup", default="symbolic_regression:build_node_sets", help="module:function which registers the primitives and terminals")
+    args = parser.parse_args()
+
+    load_callable(args.setup)()
+    export_tree(parse_tree(args.tree, PRIMITIVE_REGISTRY, TERMINAL_REGISTRY), args.output)
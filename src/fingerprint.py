@@ -0,0 +1,131 @@
+"""
+This file contains semantic fingerprinting of trees
+
+A fingerprint is a hash of the quantized outputs of a tree on a small fixed probe set
+Trees with the same fingerprint are treated as computing the same function
+"""
+from collections import OrderedDict
+import numpy as np
+import hashlib
+
+# Maximum number of fingerprints whose score is kept in memory by a FitnessMemo
+MEMO_SIZE = 200000
+
+def probe_points(x_min, x_max, n=32, seed=0):
+    """
+    Creates a fixed set of probe inputs inside the range of the dataset
+
+    Args:
+        x_min: minimum value of x
+        x_max: maximum value of x
+        n: number of probe points
+        seed: seed of the generator so the probe set is the same for every generation
+
+    Returns:
+        Numpy array of probe inputs
+    """
+    return np.random.RandomState(seed).uniform(x_min, x_max, n)
+
+def semantic_fingerprint(tree, function_pointers, probe, decimals=8):
+    """
+    Hashes the quantized outputs of a tree on the probe set
+
+    Args:
+        tree: Node containing full tree
+        function_pointers: dictionary where (key, value) is (string, function)
+        probe: numpy array of probe inputs
+        decimals: number of significant digits kept when quantizing
+
+    Returns:
+        String fingerprint of the tree
+    """
+    with np.errstate(all="ignore"):
+        output = np.broadcast_to(np.asarray(tree.get_func(function_pointers)(probe), dtype=np.float64), probe.shape)
+
+        # Quantize to significant digits so floating point noise does not change the hash
+        # NaN and inf are kept as they are so invalid trees hash together
+        magnitude = np.where(np.isfinite(output) & (output != 0), np.floor(np.log10(np.abs(output))), 0)
+        scale = np.power(10.0, decimals - 1 - magnitude)
+        quantized = np.where(np.isfinite(output), np.round(output * scale) / scale, output)
+
+    return hashlib.blake2b(quantized.tobytes(), digest_size=16).hexdigest()
+
+class FitnessMemo():
+    def __init__(self, function_pointers, probe, disk=None, max_entries=MEMO_SIZE):
+        # Scores of the fingerprints evaluated so far, least recently used first
+        # Fingerprints seen by deduplicate are the most recently used so their scores are kept until fill_scores
+        self.scores = OrderedDict()
+        self.max_entries = max_entries
+
+        # Optional DiskFitnessCache holding scores of earlier runs
+        self.disk = disk
+
+        self.function_pointers = function_pointers
+        self.probe = probe
+
+        # Number of evaluations avoided in the current generation
+        self.avoided = 0
+
+    def deduplicate(self, population):
+        """
+        Groups the population by fingerprint
+
+        Individuals with a known fingerprint reuse the known score
+        Only the first individual of each new fingerprint needs to be evaluated
+
+        Args:
+            population: list of individuals where each individual is a tuple (tree, score)
+
+        Returns:
+            List of fingerprints (one per individual)
+            List of indices of individuals which need to be evaluated
+        """
+        fingerprints = []
+        to_evaluate = []
+        seen = set()
+        for i, individual in enumerate(population):
+            fingerprint = semantic_fingerprint(individual[0], self.function_pointers, self.probe)
+            fingerprints.append(fingerprint)
+
+            if fingerprint in self.scores:
+                self.scores.move_to_end(fingerprint)
+            elif fingerprint not in seen:
+                seen.add(fingerprint)
+                to_evaluate.append(i)
+
+        # Reuse scores which earlier runs stored on disk
+        if self.disk is not None and len(to_evaluate) > 0:
+            found = self.disk.get_many([fingerprints[i] for i in to_evaluate])
+            self.scores.update(found)
+            to_evaluate = [i for i in to_evaluate if fingerprints[i] not in found]
+
+        # Every individual which is not evaluated is an evaluation avoided
+        self.avoided = len(population) - len(to_evaluate)
+
+        return fingerprints, to_evaluate
+
+    def fill_scores(self, fingerprints, to_evaluate, scores):
+        """
+        Stores the new scores and returns the score of every individual
+
+        Args:
+            fingerprints: list of fingerprints returned by deduplicate
+            to_evaluate: list of indices returned by deduplicate
+            scores: list of scores for the individuals in to_evaluate
+
+        Returns:
+            List of scores (one per individual)
+        """
+        for i, score in zip(to_evaluate, scores):
+            self.scores[fingerprints[i]] = score
+
+        if self.disk is not None:
+            self.disk.put_many([(fingerprints[i], score) for i, score in zip(to_evaluate, scores)])
+
+        scores = [self.scores[fingerprint] for fingerprint in fingerprints]
+
+        # Forget the least recently used fingerprints
+        while len(self.scores) > self.max_entries:
+            self.scores.popitem(last=False)
+
+        return scores
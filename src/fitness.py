@@ -0,0 +1,75 @@
+"""
+This file contains fitness functions
+
+They live in their own module so worker processes and remote workers
+can import them by name when tasks are unpickled
+"""
+from node_set import registered_function_pointers
+import numpy as np
+
+def evaluate(function_pointers, individual, x, y):
+    # Use the registered primitives when function_pointers are not sent with the task
+    if function_pointers is None:
+        function_pointers = registered_function_pointers()
+
+    # Generate function pointer for the tree
+    func = individual[0].get_func(function_pointers)
+
+    # Get output of tree
+    output = func(x)
+
+    # Calculate Mean Squared Error
+    try:
+        error = np.mean(np.square(output - y))
+    except:
+        print(x, output, y)
+        raise
+
+    return error
+
+def evaluate_cases(function_pointers, individual, x, y):
+    """
+    Calculates the squared error of every case instead of the mean
+    Used by selection methods which look at each case separately
+
+    Args:
+        function_pointers: dictionary where (key, value) is (string, function) or None to use the registry
+        individual: tuple (tree, score)
+        x: numpy array of inputs
+        y: numpy array of targets
+
+    Returns:
+        Numpy array of squared errors (one per case)
+    """
+    if function_pointers is None:
+        function_pointers = registered_function_pointers()
+
+    output = individual[0].get_func(function_pointers)(x)
+
+    # Trees which ignore x output a single value for every case
+    # With a target matrix every column is compared with the same output
+    output = np.reshape(np.broadcast_to(output, np.shape(x)), np.shape(x) + (1,) * (np.ndim(y) - 1))
+    return np.broadcast_to(np.square(output - y), np.shape(y)).astype(np.float64)
+
+def evaluate_targets(function_pointers, individual, x, y):
+    """
+    Calculates the mean squared error against several targets at once
+    The tree is run once and its output is compared with every column of y
+
+    Args:
+        function_pointers: dictionary where (key, value) is (string, function) or None to use the registry
+        individual: tuple (tree, score)
+        x: numpy array of inputs
+        y: numpy array with shape (samples, targets)
+
+    Returns:
+        Numpy array of mean squared errors (one per target)
+    """
+    if function_pointers is None:
+        function_pointers = registered_function_pointers()
+
+    output = individual[0].get_func(function_pointers)(x)
+
+    # One column of outputs broadcast against every target column
+    output = np.broadcast_to(output, np.shape(x)).astype(np.float64)
+    return np.mean(np.square(output[:, None] - y), axis=0)
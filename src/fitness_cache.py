@@ -0,0 +1,165 @@
+"""
+This file contains a fitness cache stored in SQLite so scores are reused across runs
+
+Scores are keyed by the semantic fingerprint of a tree within a namespace
+The namespace is a hash of the dataset and the fitness function so runs on other data never share scores
+The database uses write-ahead logging so several runs and worker processes can read and write it at once
+The least recently used scores are evicted once the cache holds more than max_entries
+Eviction goes down to EVICT_TO of max_entries so the rows only have to be counted again after many writes
+"""
+import numpy as np
+import threading
+import hashlib
+import sqlite3
+import pickle
+import time
+
+# Fraction of max_entries kept after an eviction
+EVICT_TO = 0.9
+
+def dataset_fingerprint(*arrays, salt=""):
+    """
+    Hashes the dataset a fitness function is evaluated on
+
+    Args:
+        arrays: numpy arrays such as x and y
+        salt: string such as the name of the fitness function
+
+    Returns:
+        String fingerprint of the dataset
+    """
+    digest = hashlib.blake2b(salt.encode(), digest_size=16)
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(str((array.dtype.str, array.shape)).encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+class DiskFitnessCache():
+    def __init__(self, path, namespace, max_entries=1000000, flush_size=256, timeout=30.0):
+        """
+        Opens or creates the cache database
+
+        Args:
+            path: path of the SQLite database file
+            namespace: dataset fingerprint which is part of every key
+            max_entries: maximum number of scores kept in the database across every namespace
+            flush_size: number of buffered scores which triggers a write
+            timeout: seconds to wait for another process holding the write lock
+        """
+        self.path = path
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.flush_size = flush_size
+        self.timeout = timeout
+
+        # Scores waiting to be written where each item is (key, score)
+        self.pending = []
+
+        # Number of scores found in the database
+        self.hits = 0
+
+        # One connection per thread because SQLite connections can not be shared between threads
+        self.local = threading.local()
+
+        with self.connection() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS scores (key TEXT PRIMARY KEY, score BLOB NOT NULL, last_used REAL NOT NULL)")
+            connection.execute("CREATE INDEX IF NOT EXISTS scores_last_used ON scores (last_used)")
+
+            # Upper bound of the number of rows, replaced keys and evictions by other processes are not tracked
+            self.rows = connection.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+
+    def __getstate__(self):
+        # Connections and buffered scores stay in the process which opened them
+        state = self.__dict__.copy()
+        state["local"] = None
+        state["pending"] = []
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.local = threading.local()
+
+    def connection(self):
+        """
+        Returns:
+            SQLite connection of the calling thread
+        """
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+        return connection
+
+    def get_many(self, fingerprints):
+        """
+        Looks up the scores of several fingerprints with one query per batch
+
+        Args:
+            fingerprints: list of fingerprints
+
+        Returns:
+            Dictionary where (key, value) is (fingerprint, score) for every fingerprint found
+        """
+        keys = {self.namespace + ":" + fingerprint: fingerprint for fingerprint in fingerprints}
+        found = {}
+
+        connection = self.connection()
+        key_list = list(keys)
+        # SQLite limits the number of parameters of a query
+        for start in range(0, len(key_list), 500):
+            batch = key_list[start:start + 500]
+            rows = connection.execute("SELECT key, score FROM scores WHERE key IN ({})".format(",".join("?" * len(batch))), batch).fetchall()
+            for key, score in rows:
+                found[keys[key]] = pickle.loads(score)
+
+        # Mark the scores as recently used
+        if len(found) > 0:
+            now = time.time()
+            with connection:
+                connection.executemany("UPDATE scores SET last_used = ? WHERE key = ?", [(now, self.namespace + ":" + fingerprint) for fingerprint in found])
+
+        self.hits += len(found)
+        return found
+
+    def put_many(self, items):
+        """
+        Buffers new scores and writes them once flush_size scores are waiting
+
+        Args:
+            items: list of (fingerprint, score)
+        """
+        self.pending.extend((self.namespace + ":" + fingerprint, score) for fingerprint, score in items)
+        if len(self.pending) >= self.flush_size:
+            self.flush()
+
+    def flush(self):
+        # Write every buffered score in one transaction and evict the least recently used scores
+        if len(self.pending) == 0:
+            return
+
+        connection = self.connection()
+        now = time.time()
+        with connection:
+            connection.executemany("INSERT OR REPLACE INTO scores (key, score, last_used) VALUES (?, ?, ?)",
+                                   [(key, pickle.dumps(score, protocol=pickle.HIGHEST_PROTOCOL), now) for key, score in self.pending])
+
+            # Only count the rows when the bound says the cache may be over its limit
+            self.rows += len(self.pending)
+            if self.rows > self.max_entries:
+                self.rows = connection.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+                if self.rows > self.max_entries:
+                    excess = self.rows - int(self.max_entries * EVICT_TO)
+                    connection.execute("DELETE FROM scores WHERE key IN (SELECT key FROM scores ORDER BY last_used LIMIT ?)", (excess,))
+                    self.rows -= excess
+        self.pending = []
+
+    def close(self):
+        # Write the remaining scores and close the connection of this thread
+        self.flush()
+        connection = getattr(self.local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self.local.connection = None
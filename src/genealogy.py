@@ -0,0 +1,334 @@
+"""
+This file contains an append-only log of every individual and its parents
+
+Each child is stored as the operator which created it, the ids of its parents
+And only the subtree which differs from its first parent with the node id of the edit site
+A subtree copied from another parent, such as by crossover, is stored as the node id where that parent has it
+Records are grouped into zlib compressed blocks appended to the log file
+Ids are consecutive so a fixed size index entry per block with its first id is enough to find any record
+
+Any individual is reconstructed on demand by following first parents back to a full tree
+And applying the edits forward, so the history is never kept in memory
+Chains are cut with a full tree every keyframe_interval edits to bound the reconstruction time
+
+Usage: python genealogy.py genealogy.log 1234
+"""
+from tree import TerminalNode, apply_at_node, find_subtree, rebuild_tree
+from distributed import load_callable
+from collections import OrderedDict
+import argparse
+import bisect
+import struct
+import json
+import zlib
+
+# Index entry of one block: id of its first record, offset in the log and compressed length
+INDEX_ENTRY = struct.Struct("<QQI")
+
+# Fields of every record, records are stored as lists in this order
+# The subtree is a string or a list [index in parents, node id] of a subtree copied from that parent
+FIELDS = ["generation", "operator", "parents", "site", "subtree"]
+
+def tree_delta(parent, child):
+    """
+    Finds the smallest subtree of the child which contains every difference from the parent
+    Descends while exactly one child subtree differs, comparing memoized strings
+
+    Args:
+        parent: Node containing the full tree of the parent
+        child: Node containing the full tree of the child
+
+    Returns:
+        Tuple (node id of the edit site, Node of the child subtree there) or None if the trees are equal
+    """
+    if str(parent) == str(child):
+        return None
+
+    site = "0"
+    while not isinstance(child, TerminalNode) and parent.name == child.name and len(parent.args) == len(child.args):
+        changed = [i for i in range(len(child.args)) if str(parent.args[i]) != str(child.args[i])]
+        if len(changed) != 1:
+            break
+        parent, child = parent.args[changed[0]], child.args[changed[0]]
+        site += str(changed[0])
+
+    return site, child
+
+def find_copy(subtree, tree):
+    """
+    Args:
+        subtree: Node
+        tree: Node containing full tree
+
+    Returns:
+        Node id of a subtree of tree equal to subtree or None
+    """
+    # Sizes are cached so most nodes are skipped without rendering their string
+    stack = [(tree, "0")]
+    while stack:
+        node, node_id = stack.pop()
+        if node.size() == subtree.size() and str(node) == str(subtree):
+            return node_id
+        stack += [(child, node_id + str(i)) for i, child in enumerate(node.args)]
+    return None
+
+class GenealogyWriter():
+    def __init__(self, path, block_records=1024, keyframe_interval=50):
+        """
+        Args:
+            path: path of the log, the index is written to path + ".index"
+            block_records: number of records compressed together
+            keyframe_interval: maximum number of edits between two full trees on a chain of first parents
+        """
+        self.block_records = block_records
+        self.keyframe_interval = keyframe_interval
+
+        self.data = open(path, "wb")
+        self.index = open(path + ".index", "wb")
+
+        # Records which are not written yet
+        self.buffer = []
+        self.next_id = 0
+
+        # Number of edits since the last full tree for the individuals which can still become parents
+        self.chain_lengths = {}
+
+    def add_root(self, tree, generation):
+        """
+        Logs an individual without parents as a full tree
+
+        Returns:
+            Integer id of the individual
+        """
+        return self._add([generation, "init", [], "0", str(tree)], 0)
+
+    def add_child(self, tree, generation, operator, parents, parent_trees):
+        """
+        Logs an offspring as its difference from its first parent
+
+        Args:
+            tree: Node containing the full tree of the offspring
+            generation: integer generation of the offspring
+            operator: string name of the operator which created the offspring
+            parents: list of the ids of the parents, the first is the one the offspring was copied from
+            parent_trees: list of the Nodes containing the full trees of the parents
+
+        Returns:
+            Integer id of the individual
+        """
+        length = self.chain_lengths[parents[0]] + 1
+        if length > self.keyframe_interval:
+            return self._add([generation, operator, parents, "0", str(tree)], 0)
+
+        delta = tree_delta(parent_trees[0], tree)
+        if delta is None:
+            return self._add([generation, operator, parents, None, None], length)
+
+        site, subtree = delta
+        for i in range(1, len(parents)):
+            node_id = find_copy(subtree, parent_trees[i])
+            if node_id is not None:
+                return self._add([generation, operator, parents, site, [i, node_id]], length)
+
+        # An edit at the root is already a full tree
+        return self._add([generation, operator, parents, site, str(subtree)], 0 if site == "0" else length)
+
+    def _add(self, record, chain_length):
+        self.buffer.append(record)
+        self.chain_lengths[self.next_id] = chain_length
+        self.next_id += 1
+
+        if len(self.buffer) >= self.block_records:
+            self.flush()
+        return self.next_id - 1
+
+    def retain(self, ids):
+        """
+        Forgets the chain lengths of every individual which is not in ids
+        Only individuals which can still become parents are needed
+
+        Args:
+            ids: list of the ids of the current elite pool
+        """
+        self.chain_lengths = {i: self.chain_lengths[i] for i in ids}
+
+    def flush(self):
+        # The block is written before its index entry so the index never points past the log
+        if len(self.buffer) == 0:
+            return
+
+        block = zlib.compress("\n".join(json.dumps(record, separators=(",", ":")) for record in self.buffer).encode())
+        offset = self.data.tell()
+        self.data.write(block)
+        self.data.flush()
+
+        self.index.write(INDEX_ENTRY.pack(self.next_id - len(self.buffer), offset, len(block)))
+        self.index.flush()
+        self.buffer = []
+
+    def close(self):
+        self.flush()
+        self.data.close()
+        self.index.close()
+
+class GenealogyReader():
+    def __init__(self, path, cache_blocks=64, cache_trees=4096):
+        """
+        Args:
+            path: path of a log written by GenealogyWriter
+            cache_blocks: number of decompressed blocks kept in memory
+            cache_trees: number of reconstructed tree strings kept in memory
+        """
+        self.data = open(path, "rb")
+        self.index = open(path + ".index", "rb")
+        self.cache_blocks = cache_blocks
+        self.cache_trees = cache_trees
+
+        # Decompressed blocks by offset and tree strings by id, least recently used first
+        self.blocks = OrderedDict()
+        self.strings = OrderedDict()
+
+        # First id, offset and length of every block read from the index so far
+        self.first_ids = []
+        self.entries = []
+        self.size = 0
+        self._read_index()
+
+    def _read_index(self):
+        # Blocks written since the last read, the log may still be growing
+        self.index.seek(len(self.entries) * INDEX_ENTRY.size)
+        for entry in INDEX_ENTRY.iter_unpack(self.index.read()):
+            self.first_ids.append(entry[0])
+            self.entries.append(entry)
+
+        # The number of records of the last block is only known once it is decompressed
+        if len(self.entries) > 0:
+            self.size = self.first_ids[-1] + len(self._block(len(self.entries) - 1))
+
+    def _block(self, block):
+        # Decompressed records of a block
+        first_id, offset, length = self.entries[block]
+        if offset in self.blocks:
+            self.blocks.move_to_end(offset)
+        else:
+            self.data.seek(offset)
+            self.blocks[offset] = zlib.decompress(self.data.read(length)).decode().split("\n")
+            if len(self.blocks) > self.cache_blocks:
+                self.blocks.popitem(last=False)
+        return self.blocks[offset]
+
+    def __len__(self):
+        self._read_index()
+        return self.size
+
+    def record(self, individual):
+        """
+        Args:
+            individual: integer id
+
+        Returns:
+            Dictionary with the id, generation, operator, parents, site and subtree of the individual
+        """
+        if individual < 0 or (individual >= self.size and individual >= len(self)):
+            raise KeyError("Individual: {} Is not in the log of {} individuals".format(individual, self.size))
+
+        block = bisect.bisect_right(self.first_ids, individual) - 1
+        record = dict(zip(FIELDS, json.loads(self._block(block)[individual - self.first_ids[block]])))
+        record["id"] = individual
+        return record
+
+    def tree(self, individual):
+        """
+        Reconstructs an individual, the primitives and terminals must be registered
+
+        Args:
+            individual: integer id
+
+        Returns:
+            Node containing full tree
+        """
+        return rebuild_tree(self.tree_string(individual), "0")
+
+    def tree_string(self, individual):
+        """
+        Reconstructs the string of an individual without recursion
+        Parents which a subtree was copied from are reconstructed first
+
+        Args:
+            individual: integer id
+
+        Returns:
+            String of the tree
+        """
+        # Strings of the individuals reconstructed by this call which the cache may evict
+        pinned = {}
+
+        stack = [individual]
+        while stack:
+            if stack[-1] in pinned:
+                stack.pop()
+                continue
+            if stack[-1] in self.strings:
+                cached = stack.pop()
+                self.strings.move_to_end(cached)
+                pinned[cached] = self.strings[cached]
+                continue
+
+            # Follow first parents back to a full tree or a known string
+            chain = [self.record(stack[-1])]
+            while chain[-1]["site"] != "0" and chain[-1]["parents"][0] not in pinned and chain[-1]["parents"][0] not in self.strings:
+                chain.append(self.record(chain[-1]["parents"][0]))
+
+            # Copied subtrees need the string of their parent
+            needed = [record["parents"][record["subtree"][0]] for record in chain if isinstance(record["subtree"], list)]
+            if chain[-1]["site"] != "0":
+                needed.append(chain[-1]["parents"][0])
+            missing = [i for i in needed if i not in pinned and i not in self.strings]
+            if len(missing) > 0:
+                stack += missing
+                continue
+            known = {i: pinned[i] if i in pinned else self.strings[i] for i in needed}
+
+            # Apply the edits from the oldest to the newest and cache every string on the way
+            tree = None
+            for record in reversed(chain):
+                subtree = record["subtree"]
+                if isinstance(subtree, list):
+                    parent = rebuild_tree(known[record["parents"][subtree[0]]], "0")
+                    subtree = str(find_subtree(parent, subtree[1][1:]))
+
+                if record["site"] == "0":
+                    tree = rebuild_tree(subtree, "0")
+                else:
+                    if tree is None:
+                        tree = rebuild_tree(known[record["parents"][0]], "0")
+                    if record["site"] is not None:
+                        new_subtree = rebuild_tree(subtree, record["site"])
+                        tree = apply_at_node(lambda primitive_set, terminal_set, node: new_subtree, None, None, tree, record["site"][1:])
+                self._cache(record["id"], str(tree))
+            pinned[chain[0]["id"]] = str(tree)
+            stack.pop()
+
+        return pinned[individual]
+
+    def _cache(self, individual, string):
+        self.strings[individual] = string
+        if len(self.strings) > self.cache_trees:
+            self.strings.popitem(last=False)
+
+    def close(self):
+        self.data.close()
+        self.index.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Reconstruct an individual from a genealogy log")
+    parser.add_argument("log", help="path of the log")
+    parser.add_argument("individual", type=int, help="id of the individual")
+    parser.add_argument("--setup", default="symbolic_regression:build_node_sets", help="module:function which registers the primitives and terminals")
+    args = parser.parse_args()
+
+    load_callable(args.setup)()
+    reader = GenealogyReader(args.log)
+    print(json.dumps(reader.record(args.individual)))
+    print(reader.tree(args.individual))
+    reader.close()
@@ -0,0 +1,231 @@
+"""
+This file contains interval arithmetic rules used to pre-screen trees
+
+An interval is a tuple (low, high) of floats bounding every value a node can output
+Bounds can be -inf or inf since an infinite value inside a tree can still give a finite output, such as x / inf
+None is used to mark a node whose output is guaranteed to be NaN
+A tree is invalid when any node is None or when the output of the root is guaranteed to be -inf or inf
+
+Rules are attached to primitives through PrimitiveSet.add_primitive(..., interval=rule)
+Each rule takes one interval per input and returns the output interval
+"""
+import numpy as np
+import math
+
+# Interval used when nothing is known about a value
+UNBOUNDED = (-np.inf, np.inf)
+
+def _bounds(values):
+    """
+    Builds an interval from a list of candidate end points
+
+    NaN end points come from 0 * inf and are treated as 0
+
+    Args:
+        values: list of floats
+
+    Returns:
+        Interval covering every value
+    """
+    values = [0.0 if math.isnan(v) else v for v in values]
+    return (min(values), max(values))
+
+def _sum_bounds(low, high):
+    """
+    Builds an interval from end points of a sum or a difference
+
+    A NaN end point comes from inf - inf so the other values are not known
+    Both end points are NaN only if every output is NaN
+
+    Args:
+        low: float
+        high: float
+
+    Returns:
+        Interval or None
+    """
+    if math.isnan(low) and math.isnan(high):
+        return None
+
+    return (-np.inf if math.isnan(low) else low, np.inf if math.isnan(high) else high)
+
+def interval_add(a, b):
+    return _sum_bounds(a[0] + b[0], a[1] + b[1])
+
+def interval_sub(a, b):
+    return _sum_bounds(a[0] - b[1], a[1] - b[0])
+
+def interval_mult(a, b):
+    return _bounds([a[0] * b[0], a[0] * b[1], a[1] * b[0], a[1] * b[1]])
+
+def interval_div(a, b):
+    # Dividing by exactly zero gives inf with the sign of the dividend and NaN for 0 / 0
+    if b[0] == 0 and b[1] == 0:
+        if a[0] == 0 and a[1] == 0:
+            return None
+        return (-np.inf if a[0] < 0 else np.inf, np.inf if a[1] > 0 else -np.inf)
+
+    # The divisor can reach zero so the output is unbounded
+    if b[0] <= 0 <= b[1]:
+        return UNBOUNDED
+
+    return interval_mult(a, (1.0 / b[1], 1.0 / b[0]))
+
+def _periodic(func, a, extrema):
+    """
+    Bounds a periodic function with a maximum of 1 and a minimum of -1
+
+    Args:
+        func: periodic function such as math.sin
+        a: input interval
+        extrema: (offset of the maximum, offset of the minimum) within one 2 * pi period
+
+    Returns:
+        Output interval
+    """
+    # Periodic functions of -inf or inf are NaN
+    if a[0] == a[1] and np.isinf(a[0]):
+        return None
+
+    # Wide or unbounded inputs cover a full period
+    if not (np.isfinite(a[0]) and np.isfinite(a[1])) or a[1] - a[0] >= 2 * math.pi:
+        return (-1.0, 1.0)
+
+    low = min(func(a[0]), func(a[1]))
+    high = max(func(a[0]), func(a[1]))
+
+    # Check whether a maximum or a minimum falls inside the interval
+    max_offset, min_offset = extrema
+    if math.ceil((a[0] - max_offset) / (2 * math.pi)) <= math.floor((a[1] - max_offset) / (2 * math.pi)):
+        high = 1.0
+    if math.ceil((a[0] - min_offset) / (2 * math.pi)) <= math.floor((a[1] - min_offset) / (2 * math.pi)):
+        low = -1.0
+
+    return (low, high)
+
+def interval_sin(a):
+    return _periodic(math.sin, a, (math.pi / 2, -math.pi / 2))
+
+def interval_cos(a):
+    return _periodic(math.cos, a, (0.0, math.pi))
+
+def interval_tan(a):
+    if a[0] == a[1] and np.isinf(a[0]):
+        return None
+
+    if not (np.isfinite(a[0]) and np.isfinite(a[1])):
+        return UNBOUNDED
+
+    # The output is unbounded if an asymptote falls inside the interval
+    if math.ceil((a[0] - math.pi / 2) / math.pi) <= math.floor((a[1] - math.pi / 2) / math.pi):
+        return UNBOUNDED
+
+    return (math.tan(a[0]), math.tan(a[1]))
+
+def interval_log(a):
+    # log is NaN over the whole interval
+    if a[1] < 0:
+        return None
+
+    # log of zero is -inf and log of negative values is NaN
+    if a[1] == 0:
+        return (-np.inf, -np.inf)
+
+    if a[0] <= 0:
+        return (-np.inf, math.log(a[1]))
+
+    return (math.log(a[0]), math.log(a[1]))
+
+def interval_sqrt(a):
+    # sqrt is NaN over the whole interval
+    if a[1] < 0:
+        return None
+
+    return (math.sqrt(max(a[0], 0.0)), math.sqrt(a[1]))
+
+def interval_exp(a):
+    with np.errstate(over="ignore"):
+        return (float(np.exp(a[0])), float(np.exp(a[1])))
+
+def propagate_interval(tree, primitive_set, x_interval):
+    """
+    Propagates the input interval through the tree from the leaves up without recursion
+    Without evaluating the tree on any data
+
+    Primitives without an interval rule are treated as unbounded
+
+    Args:
+        tree: Node containing full tree
+        primitive_set: dictionary where (key, value) is (name, {"output_type", "input_types", "group", "interval"})
+        x_interval: tuple (min, max) of the input x
+
+    Returns:
+        Output interval of the tree or None if the output is guaranteed to be NaN, -inf or inf
+    """
+    # Interval of every node whose parent is not done yet
+    intervals = {}
+
+    # Children come before their parents
+    for node in reversed(tree.preorder()):
+        interval = node_interval(node, [intervals.pop(id(i)) for i in node.args], primitive_set, x_interval)
+
+        # A guaranteed NaN input makes every ancestor NaN too
+        if interval is None:
+            return None
+
+        intervals[id(node)] = interval
+
+    # Infinite values inside the tree can still give a finite output, only the output of the root must be finite
+    interval = intervals[id(tree)]
+    if interval[0] == interval[1] and np.isinf(interval[0]):
+        return None
+
+    return interval
+
+def node_interval(node, intervals, primitive_set, x_interval):
+    """
+    Args:
+        node: Node
+        intervals: list of the output intervals of the children of the node
+        primitive_set: dictionary where (key, value) is (name, {"output_type", "input_types", "group", "interval"})
+        x_interval: tuple (min, max) of the input x
+
+    Returns:
+        Output interval of the node or None if the output is guaranteed to be NaN
+    """
+    # Terminal node
+    if len(node.args) == 0:
+        if node.output_type == "x":
+            return x_interval
+
+        # Constant terminals are a single point
+        try:
+            value = float(node.value)
+        except (TypeError, ValueError):
+            return UNBOUNDED
+
+        if math.isnan(value):
+            return None
+
+        return (value, value)
+
+    rule = primitive_set[node.name].get("interval")
+    if rule is None:
+        return UNBOUNDED
+
+    with np.errstate(all="ignore"):
+        return rule(*intervals)
+
+def screen_population(population, primitive_set, x_interval):
+    """
+    Flags every individual that is guaranteed to produce NaN or inf
+
+    Args:
+        population: list of individuals where each individual is a tuple (tree, score)
+        primitive_set: dictionary where (key, value) is (name, {"output_type", "input_types", "group", "interval"})
+        x_interval: tuple (min, max) of the input x
+
+    Returns:
+        List of booleans which are True for invalid individuals
+    """
+    return [propagate_interval(individual[0], primitive_set, x_interval) is None for individual in population]
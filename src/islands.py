@@ -0,0 +1,214 @@
+"""
+This file contains the island model
+
+Each island is a worker process which owns its own subpopulation
+and runs the full variation, evaluation and selection loop locally
+
+Only the top migrants are sent between islands every few generations
+"""
+from node_set import PRIMITIVE_REGISTRY, TERMINAL_REGISTRY, registered_function_pointers
+from tree import parse_tree
+import multiprocessing
+import numpy as np
+import traceback
+import random
+import queue
+import sys
+
+# Start method of island processes
+START_METHOD = "spawn" if sys.platform == 'win32' else "forkserver"
+
+# Seconds between checks that every island process is still alive while waiting for results
+POLL_INTERVAL = 1.0
+
+def ring(island, islands, epoch):
+    # Send migrants to the next island
+    return [(island + 1) % islands]
+
+def complete(island, islands, epoch):
+    # Send migrants to every other island
+    return [i for i in range(islands) if i != island]
+
+def random_ring(island, islands, epoch):
+    # Ring over a random order of the islands which changes every migration
+    # Every island uses the same seed so they agree on the order
+    order = random.Random(epoch).sample(range(islands), islands)
+    return [order[(order.index(island) + 1) % islands]]
+
+# Name of each topology which can be chosen per run
+TOPOLOGIES = {"ring": ring, "complete": complete, "random_ring": random_ring}
+
+def select(population, scores, size):
+    """
+    Sorts by score and keeps the best individuals
+
+    Args:
+        population: list of individuals where each individual is a tuple (tree, score)
+        scores: list of scores (one per individual)
+        size: number of individuals to keep
+
+    Returns:
+        List of the best individuals with their scores
+    """
+    sorted_scores = np.argsort(scores)[:size]
+    return [(population[i][0], scores[i]) for i in sorted_scores]
+
+def migrate(island, islands, epoch, topology, population, migrants, inboxes, pending):
+    """
+    Sends the best individuals to the neighbours of the island
+    And replaces the worst individuals with the migrants received
+
+    Args:
+        island: index of this island
+        islands: number of islands
+        epoch: index of this migration
+        topology: callable returning the destination islands
+        population: sorted list of individuals where each individual is a tuple (tree, score)
+        migrants: number of individuals sent to each neighbour
+        inboxes: list of queues (one per island)
+        pending: dictionary of messages received early, where (key, value) is (epoch, [migrants, ...])
+
+    Returns:
+        Sorted population including the migrants
+    """
+    for destination in topology(island, islands, epoch):
+        inboxes[destination].put((epoch, population[:migrants]))
+
+    # Every island agrees on the topology so the number of incoming messages is known
+    expected = sum(island in topology(i, islands, epoch) for i in range(islands) if i != island)
+
+    # Faster islands can send the next epoch early so those messages are kept for later
+    received = pending.pop(epoch, [])
+    while len(received) < expected:
+        message_epoch, message = inboxes[island].get()
+        if message_epoch == epoch:
+            received.append(message)
+        else:
+            pending.setdefault(message_epoch, []).append(message)
+
+    # Migrants replace the worst individuals
+    incoming = [individual for message in received for individual in message]
+    population = population[:max(0, len(population) - len(incoming))] + incoming
+
+    return sorted(population, key=lambda i: i[1] if np.isfinite(i[1]) else np.inf)
+
+def run_island(island, islands, population, config, setup, vary, evaluate, x, y, inboxes, results):
+    """
+    Evolves one subpopulation inside a worker process
+
+    Args:
+        island: index of this island
+        islands: number of islands
+        population: evaluated starting subpopulation where each individual is a tuple (tree string, score)
+        config: dictionary with "seed", "elite_size", "ngen", "interval", "migrants" and "topology"
+        setup: callable which creates and registers the PrimitiveSet and TerminalSet
+        vary: callable which creates offspring from (population, primitive_set, terminal_set)
+        evaluate: callable which scores (function_pointers, individual, x, y)
+        x: numpy array of inputs
+        y: numpy array of targets
+        inboxes: list of queues (one per island)
+        results: queue which receives (island, final elite pool, None) or (island, None, traceback) if the island fails
+    """
+    try:
+        population = evolve_island(island, islands, population, config, setup, vary, evaluate, x, y, inboxes)
+    except Exception:
+        # The parent stops every island so neighbours never wait for migrants from this one
+        results.put((island, None, traceback.format_exc()))
+        return
+
+    results.put((island, population, None))
+
+def evolve_island(island, islands, population, config, setup, vary, evaluate, x, y, inboxes):
+    """
+    Runs the generations of one island, see run_island
+
+    Returns:
+        Final elite pool of the island
+    """
+    # Every island gets an independent random stream
+    random.seed(config["seed"] + island)
+    np.random.seed(config["seed"] + island)
+
+    # Register the primitives and terminals before any tree is rebuilt in this process
+    primitive_set, terminal_set = setup()
+    function_pointers = registered_function_pointers()
+    topology = TOPOLOGIES[config["topology"]]
+
+    # The starting trees are sent as strings because the registry is empty until setup runs
+    population = [(parse_tree(line, PRIMITIVE_REGISTRY, TERMINAL_REGISTRY), score) for line, score in population]
+
+    pending = {}
+    for gen in range(1, config["ngen"] + 1):
+        offspring = vary(population, primitive_set, terminal_set)
+
+        # Evaluate locally and combine with the elite pool
+        scores = [evaluate(function_pointers, individual, x, y) for individual in offspring] + [i[1] for i in population]
+        population = select(offspring + population, scores, config["elite_size"])
+
+        # Exchange the best individuals with the neighbours
+        if gen % config["interval"] == 0:
+            population = migrate(island, islands, gen // config["interval"], topology, population, config["migrants"], inboxes, pending)
+
+    return population
+
+def run_islands(population, islands, config, setup, vary, evaluate, x, y, start_method=START_METHOD):
+    """
+    Splits the population into islands, runs one island per process and collects every elite pool
+
+    Args:
+        population: evaluated population where each individual is a tuple (tree, score)
+        islands: number of islands
+        config: dictionary with "seed", "elite_size", "ngen", "interval", "migrants" and "topology"
+        setup: callable which creates and registers the PrimitiveSet and TerminalSet
+        vary: callable which creates offspring from (population, primitive_set, terminal_set)
+        evaluate: callable which scores (function_pointers, individual, x, y)
+        x: numpy array of inputs
+        y: numpy array of targets
+        start_method: multiprocessing start method
+
+    Returns:
+        Combined elite pool of every island sorted by score
+    """
+    if config["topology"] not in TOPOLOGIES:
+        raise ValueError("Topology: {} Is not one of {}".format(config["topology"], list(TOPOLOGIES.keys())))
+
+    context = multiprocessing.get_context(start_method)
+    inboxes = [context.Queue() for i in range(islands)]
+    results = context.Queue()
+
+    # Each island starts from every islands-th individual
+    population = [(str(tree), score) for tree, score in population]
+    processes = [context.Process(target=run_island, args=(i, islands, population[i::islands], config, setup, vary, evaluate, x, y, inboxes, results)) for i in range(islands)]
+    for process in processes:
+        process.start()
+
+    # Read every result before joining so the queues can be flushed
+    population = []
+    finished = set()
+    try:
+        while len(finished) < islands:
+            try:
+                island, island_population, error = results.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                # An island killed before it could report an error never sends a result
+                for i, process in enumerate(processes):
+                    if i not in finished and process.exitcode not in [None, 0]:
+                        raise RuntimeError("Island {} exited with code {}".format(i, process.exitcode))
+                continue
+
+            if error is not None:
+                raise RuntimeError("Island {} failed:\n{}".format(island, error))
+
+            finished.add(island)
+            print("Island {} Best Score: {}".format(island, island_population[0][1]))
+            population += island_population
+    except BaseException:
+        # The other islands would wait forever for migrants from the failed island
+        for process in processes:
+            process.terminate()
+        raise
+    finally:
+        for process in processes:
+            process.join()
+
+    return sorted(population, key=lambda i: i[1] if np.isfinite(i[1]) else np.inf)
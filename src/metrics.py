@@ -0,0 +1,259 @@
+"""
+This file contains per-generation metrics of the evolution loop
+
+A MetricsRecorder collects the wall time of every phase and any other values of a generation
+At the end of each generation the metrics dictionary is passed to every observer
+Observers are plain callables, such as the JSON Lines and CSV sinks below
+
+A Profiler can run cProfile or a sampling profiler on chosen generations
+"""
+from contextlib import contextmanager
+import collections
+import threading
+import cProfile
+import json
+import time
+import csv
+import sys
+import os
+
+# resource is only available on Unix
+try:
+    import resource
+except ImportError:
+    resource = None
+
+def peak_rss_mb():
+    """
+    Returns:
+        Peak resident memory of this process in megabytes or None if it is unknown
+    """
+    if resource is None:
+        return None
+
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+def tree_stats(population):
+    """
+    Args:
+        population: list of individuals where each individual is a tuple (tree, score)
+
+    Returns:
+        Dictionary with the mean and max size and depth of the trees
+    """
+    if len(population) == 0:
+        return {"size_mean": None, "size_max": None, "depth_mean": None, "depth_max": None}
+
+    sizes = [individual[0].size() for individual in population]
+    depths = [individual[0].depth() for individual in population]
+    return {"size_mean": sum(sizes) / len(sizes), "size_max": max(sizes), "depth_mean": sum(depths) / len(depths), "depth_max": max(depths)}
+
+def utilization(load, processes):
+    """
+    Fraction of the evaluation wall time the workers spent working
+
+    Args:
+        load: dictionary returned by balanced_starmap
+        processes: number of workers
+
+    Returns:
+        Float between 0 and 1
+    """
+    if load["wall"] == 0:
+        return None
+    return sum(load["busy"].values()) / (load["wall"] * processes)
+
+class MetricsRecorder():
+    def __init__(self, observers=None):
+        # Callables which receive the metrics dictionary of every generation
+        self.observers = list(observers) if observers is not None else []
+
+        # Metrics of the current generation
+        self.current = {}
+        self.start = None
+
+    def add_observer(self, observer):
+        """
+        Args:
+            observer: callable which receives the metrics dictionary of every generation
+        """
+        self.observers.append(observer)
+
+    def start_generation(self, gen):
+        """
+        Clears the metrics and starts the wall clock of a generation
+
+        Args:
+            gen: index of the generation
+        """
+        self.current = {"generation": gen}
+        self.start = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Adds the wall time of the block to "<name>_seconds"
+
+        Args:
+            name: name of the phase such as "variation" or "evaluation"
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            key = name + "_seconds"
+            self.current[key] = self.current.get(key, 0.0) + time.perf_counter() - start
+
+    def record(self, **values):
+        """
+        Stores values in the metrics of the current generation
+        """
+        self.current.update(values)
+
+    def end_generation(self):
+        """
+        Adds the total wall time and peak memory and sends the metrics to every observer
+
+        Returns:
+            Metrics dictionary of the generation
+        """
+        self.current["wall_seconds"] = time.perf_counter() - self.start
+        self.current["peak_rss_mb"] = peak_rss_mb()
+
+        for observer in self.observers:
+            observer(dict(self.current))
+
+        return self.current
+
+    def close(self):
+        # Close every observer which holds a file
+        for observer in self.observers:
+            if hasattr(observer, "close"):
+                observer.close()
+
+class JsonLinesSink():
+    def __init__(self, path):
+        # One JSON object per generation and per line
+        self.file = open(path, "w")
+
+    def __call__(self, metrics):
+        self.file.write(json.dumps(metrics) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+class CsvSink():
+    def __init__(self, path):
+        # Columns are taken from the first generation
+        # Later values without a column are dropped and missing values are left empty
+        self.file = open(path, "w", newline="")
+        self.writer = None
+
+    def __call__(self, metrics):
+        if self.writer is None:
+            self.writer = csv.DictWriter(self.file, fieldnames=list(metrics.keys()), restval="", extrasaction="ignore")
+            self.writer.writeheader()
+        self.writer.writerow(metrics)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+def make_sink(path):
+    """
+    Creates a CSV sink for ".csv" paths and a JSON Lines sink otherwise
+
+    Args:
+        path: output file path
+
+    Returns:
+        Sink callable
+    """
+    if os.path.splitext(path)[1].lower() == ".csv":
+        return CsvSink(path)
+    return JsonLinesSink(path)
+
+class SamplingProfiler():
+    def __init__(self, interval=0.005):
+        # Seconds between samples of the profiled thread
+        self.interval = interval
+
+        # Count of every collapsed stack "outer;...;inner"
+        self.counts = collections.Counter()
+
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def _sample(self, thread_id):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append("{} ({}:{})".format(code.co_name, os.path.basename(code.co_filename), code.co_firstlineno))
+                frame = frame.f_back
+            if len(stack) > 0:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def enable(self):
+        # Samples the thread which enables the profiler
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self._sample, args=(threading.get_ident(),), daemon=True)
+        self.thread.start()
+
+    def disable(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def dump_stats(self, path):
+        """
+        Writes one collapsed stack and its sample count per line
+        This is the input format of flame graph tools
+        """
+        with open(path, "w") as f:
+            for stack, count in self.counts.most_common():
+                f.write("{} {}\n".format(stack, count))
+
+class Profiler():
+    def __init__(self, mode, generations, directory="."):
+        """
+        Profiles chosen generations
+
+        Args:
+            mode: "cprofile", "sampling" or None to disable profiling
+            generations: list of generation indices to profile
+            directory: directory of the profile files
+        """
+        if mode not in [None, "cprofile", "sampling"]:
+            raise ValueError("Profile mode: {} Is not one of {}".format(mode, [None, "cprofile", "sampling"]))
+
+        self.mode = mode
+        self.generations = set(generations)
+        self.directory = directory
+        self.profile = None
+
+    def start(self, gen):
+        if self.mode is None or gen not in self.generations:
+            return
+
+        self.profile = cProfile.Profile() if self.mode == "cprofile" else SamplingProfiler()
+        self.profile.enable()
+
+    def stop(self, gen):
+        """
+        Writes profile_gen<gen>.prof (cProfile, open with pstats) or profile_gen<gen>.txt (collapsed stacks)
+
+        Returns:
+            Path of the profile or None if the generation was not profiled
+        """
+        if self.profile is None:
+            return None
+
+        self.profile.disable()
+        path = os.path.join(self.directory, "profile_gen{}.{}".format(gen, "prof" if self.mode == "cprofile" else "txt"))
+        self.profile.dump_stats(path)
+        self.profile = None
+        return path
@@ -1,10 +1,11 @@
 """
 This file contains mutation functions
 """
-from tree import apply_at_node, TerminalNode, generate
+from tree import apply_at_node, within_limits, TerminalNode, generate
+from functools import partial
 import random
 
-def mutate(mutation, primitive_set, terminal_set, tree, use_input_ids=False):
+def mutate(mutation, primitive_set, terminal_set, tree, use_input_ids=False, max_size=None, max_depth=None, retries=3):
     """
     TODO: Find a better way to implement use_input_ids
     Applies a mutation to the tree
@@ -14,6 +15,9 @@ def mutate(mutation, primitive_set, terminal_set, tree, use_input_ids=False):
         primitive_set: dictionary where (key, value) is (output_type, [{"name", "input_types", "group"}, ...])
         terminal_set:  dictionary where (key, value) is (output_type, [{"name", "generator", "static"}, ...])
         tree: Node containing full tree
+        max_size: maximum number of nodes of the mutated tree or None for no limit
+        max_depth: maximum number of levels of the mutated tree or None for no limit
+        retries: number of mutations tried before the node is left unchanged
 
     Returns:
         Node containing full tree
@@ -24,10 +28,40 @@ def mutate(mutation, primitive_set, terminal_set, tree, use_input_ids=False):
     # Take off root id
     node_id = node_id[1:]
 
+    # Check every attempt against the limits before it is put in the tree
+    if max_size is not None or max_depth is not None:
+        mutation = partial(limit_mutation, mutation, tree, node_id, max_size, max_depth, retries)
+
     # Recurse through the tree until the node is found
     # Then apply the mutation
     return apply_at_node(mutation, primitive_set, terminal_set, tree, node_id)
 
+def limit_mutation(mutation, root, node_id, max_size, max_depth, retries, primitive_set, terminal_set, tree):
+    """
+    Applies a mutation until the result is within the size and depth limits
+
+    Args:
+        mutation: callable mutation function
+        root: Node containing full tree, its cached size is not updated until the mutation returns
+        node_id: string id of the mutated node without the root id
+        max_size: maximum number of nodes or None for no limit
+        max_depth: maximum number of levels or None for no limit
+        retries: number of attempts
+        primitive_set: dictionary where (key, value) is (output_type, [{"name", "input_types", "group"}, ...])
+        terminal_set:  dictionary where (key, value) is (output_type, [{"name", "generator", "static"}, ...])
+        tree: Node being mutated
+
+    Returns:
+        Mutated Node or the original Node if every attempt was over the limits
+    """
+    for i in range(retries):
+        new_tree = mutation(primitive_set, terminal_set, tree)
+        if within_limits(root, node_id, tree, new_tree, max_size, max_depth):
+            return new_tree
+
+    # Mutations which change the size build a new node so the original is untouched
+    return tree
+
 def mutate_replace(primitive_set, terminal_set, tree):
     """
     Randomly selects a node in the tree
@@ -135,6 +169,22 @@ def mutate_insert(primitive_set, terminal_set, tree):
     """
     return cleanup_mutated_node_ids(generate(primitive_set, terminal_set, 1, ["x"], tree.node_id)[0])
 
+def mutate_insert_bank(bank, primitive_set, terminal_set, tree):
+    """
+    Same as mutate_insert but the new subtree is drawn from a SubtreeBank
+    Used through partial(mutate_insert_bank, bank)
+
+    Args:
+        bank: SubtreeBank of subtrees with the depth of the inserted subtree
+        primitive_set: dictionary where (key, value) is (output_type, [{"name", "input_types", "group"}, ...])
+        terminal_set:  dictionary where (key, value) is (output_type, [{"name", "generator", "static"}, ...])
+        tree: Node containing full tree
+
+    Returns:
+        Node containing full tree
+    """
+    return bank.draw("x", tree.node_id)
+
 def mutate_shrink(primitive_set, terminal_set, tree):
     """
     Randomly selects a node in the tree
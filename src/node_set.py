@@ -4,6 +4,53 @@ Each primitive and terminal is unique
 """
 from copy import deepcopy
 
+# Module level registries of every primitive and terminal by name
+# These use the same structure as NodeSet.struct_by_name()
+# So trees and node sets can be pickled as name references and rebuilt in any process
+PRIMITIVE_REGISTRY = {}
+TERMINAL_REGISTRY = {}
+
+def terminal_value(value):
+    """
+    Function pointer of every terminal
+    Returns the terminal value unchanged
+
+    Args:
+        value: terminal value
+
+    Returns:
+        value
+    """
+    return value
+
+def registered_function_pointers():
+    """
+    Builds function_pointers from the registries
+
+    Returns:
+        Dictionary where (key, value) is (string, function)
+    """
+    function_pointers = {name: PRIMITIVE_REGISTRY[name]["func"] for name in PRIMITIVE_REGISTRY}
+    function_pointers.update({name: terminal_value for name in TERMINAL_REGISTRY})
+    return function_pointers
+
+def rebuild_node_set(cls, names):
+    """
+    Rebuilds a NodeSet from registered names
+    Used when unpickling a NodeSet
+
+    Args:
+        cls: PrimitiveSet or TerminalSet
+        names: list of primitive or terminal names
+
+    Returns:
+        NodeSet containing every named primitive or terminal
+    """
+    new_set = cls()
+    for name in names:
+        new_set.add_registered(name)
+    return new_set
+
 class NodeSet():
     def __init__(self):
         # Stores all of the node set information
@@ -27,6 +74,20 @@ class NodeSet():
 
         return new_dict
 
+    def names(self):
+        """
+        Returns:
+            List of every name in the node set
+        """
+        return [node["name"] for output_type in self.node_set for node in self.node_set[output_type]]
+
+    def __reduce__(self):
+        """
+        Pickles the node set as a list of names
+        The functions and generators are looked up in the registry when unpickled
+        """
+        return (rebuild_node_set, (type(self), self.names()))
+
     def __add__(self, other):
         """
         Addtion operator for adding node_sets
@@ -77,7 +138,7 @@ class PrimitiveSet(NodeSet):
     def __init__(self):
         super().__init__()
 
-    def add_primitive(self, func, output_type, name, input_types, group):
+    def add_primitive(self, func, output_type, name, input_types, group, interval=None):
         """
         Stores relevant primitive information into the primitive set
 
@@ -86,6 +147,7 @@ class PrimitiveSet(NodeSet):
             name: unique string of the primitive
             input_types: list of type strings for each input into the primitive
             group: string used to group primitives together
+            interval: optional interval rule used for static pre-screening (see interval.py)
 
         """
         # Make sure primitive name is unique
@@ -106,13 +168,26 @@ class PrimitiveSet(NodeSet):
         # If a primitive wrapper is implemented, then this code needs to be modified
         self.function_pointers[name] = func
 
+        # Register the primitive by name so it can be found in other processes
+        PRIMITIVE_REGISTRY[name] = {"output_type": output_type, "input_types": input_types, "group": group, "interval": interval, "func": func}
+
         # Check if the output_type is not already in the primitive set
         if output_type not in self.node_set:
             # Create output_type list
             self.node_set[output_type] = []
         
         # Add the primitive information
-        self.node_set[output_type].append({"name": name, "input_types": input_types, "group": group})
+        self.node_set[output_type].append({"name": name, "input_types": input_types, "group": group, "interval": interval})
+
+    def add_registered(self, name):
+        """
+        Adds a primitive which is already in the registry
+
+        Args:
+            name: unique string of the primitive
+        """
+        primitive = PRIMITIVE_REGISTRY[name]
+        self.add_primitive(primitive["func"], primitive["output_type"], name, primitive["input_types"], primitive["group"], primitive["interval"])
 
 class TerminalSet(NodeSet):
     def __init__(self):
@@ -152,9 +227,22 @@ class TerminalSet(NodeSet):
             # Create output_type list
             self.node_set[output_type] = []
 
-        # Set terminal name to point to a lambda function that returns its value
+        # Set terminal name to point to a function that returns its value
         # If a terminal wrapper is implemented, then this code needs to be modified
-        self.function_pointers[name] = lambda value: value
+        self.function_pointers[name] = terminal_value
+
+        # Register the terminal by name so it can be found in other processes
+        TERMINAL_REGISTRY[name] = {"output_type": output_type, "generator": generator, "static": static}
         
         # Add the terminal information
-        self.node_set[output_type].append({"name": name, "generator": generator, "static": static})
\ No newline at end of file
+        self.node_set[output_type].append({"name": name, "generator": generator, "static": static})
+
+    def add_registered(self, name):
+        """
+        Adds a terminal which is already in the registry
+
+        Args:
+            name: unique string of the terminal
+        """
+        terminal = TERMINAL_REGISTRY[name]
+        self.add_terminal(terminal["output_type"], name, terminal["generator"], terminal["static"])
@@ -0,0 +1,299 @@
+"""
+This file contains selection functions
+
+Every function works on an error matrix with one row per individual and one column per case
+A vector of aggregated scores is treated as a matrix with a single case
+Every function returns the indices of the selected individuals
+"""
+import numpy as np
+import warnings
+
+def as_matrix(errors):
+    """
+    Converts errors into a float matrix where NaN is replaced by inf
+
+    Args:
+        errors: list or numpy array of scores or per-case errors
+
+    Returns:
+        Numpy array with shape (individuals, cases)
+    """
+    errors = np.array(errors, dtype=np.float64)
+    errors = errors.reshape(len(errors), -1)
+    errors[np.isnan(errors)] = np.inf
+    return errors
+
+def aggregate(errors):
+    """
+    Args:
+        errors: numpy array with shape (individuals, cases)
+
+    Returns:
+        Mean error of every individual
+    """
+    with np.errstate(invalid="ignore"):
+        return np.mean(errors, axis=1)
+
+def truncation_selection(errors, n, rng=np.random):
+    """
+    Selects the n individuals with the lowest mean error
+    NaN errors are sorted last by numpy so they do not need to be replaced
+    """
+    errors = np.array(errors, dtype=np.float64)
+    return np.argsort(aggregate(errors.reshape(len(errors), -1)))[:n]
+
+def tournament_selection(errors, n, tournament_size=7, rng=np.random):
+    """
+    Runs n tournaments at once
+    Each tournament picks random individuals and keeps the one with the lowest mean error
+
+    Args:
+        errors: per-case errors or scores
+        n: number of individuals to select
+        tournament_size: number of individuals in each tournament
+        rng: numpy random generator
+
+    Returns:
+        Numpy array of selected indices
+    """
+    scores = aggregate(as_matrix(errors))
+
+    # One row of random candidates per tournament
+    candidates = rng.randint(0, len(scores), size=(n, tournament_size))
+    return candidates[np.arange(n), np.argmin(scores[candidates], axis=1)]
+
+def epsilon_lexicase_selection(errors, n, rng=np.random, max_cells=2 ** 22):
+    """
+    Epsilon-lexicase selection
+    Each selection filters the population case by case in a random order
+    Keeping individuals within epsilon of the best error on the case
+
+    Selections are run in batches with a boolean mask of survivors per selection
+    So the only Python loop is over the cases
+
+    Args:
+        errors: per-case errors
+        n: number of individuals to select
+        rng: numpy random generator
+        max_cells: maximum size of the survivor mask of a batch
+
+    Returns:
+        Numpy array of selected indices
+    """
+    errors = as_matrix(errors)
+    individuals, cases = errors.shape
+
+    # Epsilon is the median absolute deviation of each case over finite errors
+    finite = np.where(np.isfinite(errors), errors, np.nan)
+    with warnings.catch_warnings():
+        # Cases where every error is infinite have no median
+        warnings.simplefilter("ignore", RuntimeWarning)
+        median = np.nanmedian(finite, axis=0)
+        epsilon = np.nanmedian(np.abs(finite - median), axis=0)
+    epsilon = np.nan_to_num(epsilon, nan=0.0)
+
+    # Case errors with one row per case make column lookups contiguous
+    case_errors = np.ascontiguousarray(errors.T)
+
+    selected = np.empty(n, dtype=np.int64)
+    batch_size = max(1, max_cells // individuals)
+    for start in range(0, n, batch_size):
+        batch = min(batch_size, n - start)
+
+        # Random case order of every selection
+        orders = np.argsort(rng.random_sample((batch, cases)), axis=1)
+        alive = np.ones((batch, individuals), dtype=bool)
+
+        # Individuals which are still alive in at least one selection of the batch
+        columns = np.arange(individuals)
+        batch_errors = case_errors
+
+        for step in range(cases):
+            case = orders[:, step]
+            case_error = batch_errors[case]
+
+            # Best error among the survivors of each selection
+            best = np.min(np.where(alive, case_error, np.inf), axis=1)
+            alive &= case_error <= (best + epsilon[case])[:, None]
+
+            # Stop when every selection has a single survivor
+            if np.all(np.count_nonzero(alive, axis=1) == 1):
+                break
+
+            # Drop individuals which are dead in every selection once they are the majority
+            keep = np.any(alive, axis=0)
+            if np.count_nonzero(keep) < len(columns) // 2:
+                columns = columns[keep]
+                alive = alive[:, keep]
+                batch_errors = batch_errors[:, keep]
+
+        # Break the remaining ties at random
+        keys = rng.random_sample(alive.shape)
+        keys[~alive] = -1
+        selected[start:start + batch] = columns[np.argmax(keys, axis=1)]
+
+    return selected
+
+def dominated_by_front(front, count, point):
+    """
+    Checks whether any member of a front dominates a point
+
+    Args:
+        front: numpy array buffer holding the objectives of the front members in lexicographic order
+        count: number of members in the buffer
+        point: objectives of the individual
+
+    Returns:
+        True if the point is dominated
+    """
+    # With two objectives the last member has the lowest second objective
+    # So it is the only member which can dominate the point
+    if len(point) == 2:
+        last = front[count - 1]
+        return last[1] < point[1] or (last[1] == point[1] and last[0] < point[0])
+
+    members = front[:count]
+    return bool(np.any(np.all(members <= point, axis=1) & np.any(members < point, axis=1)))
+
+def fast_non_dominated_sort(objectives):
+    """
+    Efficient non-dominated sort with binary search (ENS-BS)
+
+    Individuals are visited in lexicographic order so only earlier individuals can dominate them
+    Each individual goes into the first front which does not dominate it
+    The fronts are searched with binary search
+
+    Args:
+        objectives: numpy array with shape (individuals, objectives), lower is better
+
+    Returns:
+        Numpy array with the front index of every individual (0 is the Pareto front)
+    """
+    objectives = as_matrix(objectives)
+    ranks = np.empty(len(objectives), dtype=np.int64)
+
+    # Each front is a growing buffer of member objectives and its member count
+    fronts = []
+    counts = []
+
+    # Lexicographic order on every objective, first objective first
+    for i in np.lexsort(objectives.T[::-1]):
+        point = objectives[i]
+        low = 0
+        high = len(fronts)
+        while low < high:
+            middle = (low + high) // 2
+            if dominated_by_front(fronts[middle], counts[middle], point):
+                low = middle + 1
+            else:
+                high = middle
+
+        if low == len(fronts):
+            fronts.append(np.empty((16, objectives.shape[1])))
+            counts.append(0)
+
+        # Double the buffer when it is full
+        if counts[low] == len(fronts[low]):
+            fronts[low] = np.concatenate([fronts[low], np.empty_like(fronts[low])])
+        fronts[low][counts[low]] = point
+        counts[low] += 1
+        ranks[i] = low
+
+    return ranks
+
+def crowding_distance(objectives, ranks):
+    """
+    Crowding distance of every individual within its front
+    Computed for every front at once
+
+    Args:
+        objectives: numpy array with shape (individuals, objectives)
+        ranks: front index of every individual
+
+    Returns:
+        Numpy array of crowding distances, boundary individuals get inf
+    """
+    objectives = as_matrix(objectives)
+    distance = np.zeros(len(objectives))
+    if len(objectives) == 0:
+        return distance
+
+    for m in range(objectives.shape[1]):
+        # Sort by front and then by objective so every front is a contiguous sorted block
+        values = np.where(np.isfinite(objectives[:, m]), objectives[:, m], np.finfo(np.float64).max)
+        order = np.lexsort((values, ranks))
+        sorted_values = values[order]
+        sorted_ranks = ranks[order]
+
+        # Boundaries of each front get inf
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = sorted_ranks[1:] != sorted_ranks[:-1]
+        last = np.ones(len(order), dtype=bool)
+        last[:-1] = sorted_ranks[1:] != sorted_ranks[:-1]
+
+        # Range of the objective in each front
+        front_min = np.minimum.reduceat(sorted_values, np.flatnonzero(first))
+        front_max = np.maximum.reduceat(sorted_values, np.flatnonzero(first))
+        span = (front_max - front_min)[np.cumsum(first) - 1]
+        span[span == 0] = 1.0
+
+        gap = np.zeros(len(order))
+        gap[1:-1] = (sorted_values[2:] - sorted_values[:-2]) / span[1:-1]
+        gap[first | last] = np.inf
+
+        distance[order] += gap
+
+    return distance
+
+def nsga2_selection(objectives, n, rng=np.random):
+    """
+    NSGA-II environmental selection
+    Keeps whole fronts in order and breaks the last front by crowding distance
+
+    Args:
+        objectives: numpy array with shape (individuals, objectives), lower is better
+        n: number of individuals to select
+        rng: unused, kept so every selection method has the same arguments
+
+    Returns:
+        Numpy array of selected indices
+    """
+    ranks = fast_non_dominated_sort(objectives)
+    distance = crowding_distance(objectives, ranks)
+    return np.lexsort((-distance, ranks))[:n]
+
+class ParetoArchive():
+    def __init__(self, max_size=100):
+        # Non-dominated individuals where each individual is a tuple (tree, objectives)
+        self.members = []
+        self.max_size = max_size
+
+    def update(self, population, objectives):
+        """
+        Adds the non-dominated individuals of a population to the archive
+
+        Args:
+            population: list of individuals where each individual is a tuple (tree, score)
+            objectives: numpy array with shape (individuals, objectives)
+        """
+        candidates = self.members + [(individual[0], tuple(float(i) for i in row)) for individual, row in zip(population, as_matrix(objectives))]
+
+        # Keep one individual per objective vector
+        unique = {}
+        for tree, row in candidates:
+            unique.setdefault(row, tree)
+        rows = list(unique.keys())
+        matrix = np.array(rows, dtype=np.float64)
+
+        # Only the Pareto front stays in the archive
+        front = np.flatnonzero(fast_non_dominated_sort(matrix) == 0)
+
+        # Drop the most crowded members when the front is too large
+        if len(front) > self.max_size:
+            distance = crowding_distance(matrix[front], np.zeros(len(front), dtype=np.int64))
+            front = front[np.argsort(-distance, kind="stable")[:self.max_size]]
+
+        self.members = sorted([(unique[rows[i]], rows[i]) for i in front], key=lambda i: i[1])
+
+# Name of each selection method which can be chosen per run
+SELECTIONS = {"truncation": truncation_selection, "tournament": tournament_selection, "lexicase": epsilon_lexicase_selection, "nsga2": nsga2_selection}
@@ -0,0 +1,236 @@
+"""
+This file contains a local inference server for trees exported with export.py
+
+Requests are newline-delimited JSON objects sent over a Unix socket or localhost TCP:
+    {"id": 1, "model": "best", "x": [0.5, 1.5]}  ->  {"id": 1, "y": [..., ...]}
+    {"id": 2, "stats": true}                      ->  {"id": 2, "stats": {...}}
+
+Concurrent requests for the same model are coalesced into micro-batches
+A batch is closed max_delay seconds after its first request and holds at most max_batch rows
+Each batch is evaluated with one vectorized call of the exported tree_func
+
+Usage: python serve.py best.py other.py --port 8765
+       python serve.py best.py --unix /tmp/point-gp.sock
+"""
+import importlib.util
+import numpy as np
+import collections
+import argparse
+import asyncio
+import json
+import time
+import os
+
+def load_model(path):
+    """
+    Imports a module written by export.py
+
+    Args:
+        path: path of the exported module
+
+    Returns:
+        Model name (the file name without extension) and the module
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location("exported_" + name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return name, module
+
+class LatencyStats():
+    def __init__(self, window=100000):
+        # Seconds from receiving each request to sending its response, most recent last
+        self.latencies = collections.deque(maxlen=window)
+
+        self.requests = 0
+        self.rows = 0
+        self.batches = 0
+        self.start = time.perf_counter()
+
+    def add_batch(self, latencies, rows):
+        self.latencies.extend(latencies)
+        self.requests += len(latencies)
+        self.rows += rows
+        self.batches += 1
+
+    def report(self):
+        """
+        Returns:
+            Dictionary with the p50 and p99 latency in milliseconds and the throughput since the start
+        """
+        seconds = time.perf_counter() - self.start
+        latencies = np.array(self.latencies) * 1000
+        return {"requests": self.requests, "rows": self.rows, "batches": self.batches,
+                "mean_batch_requests": self.requests / self.batches if self.batches > 0 else None,
+                "p50_ms": float(np.percentile(latencies, 50)) if len(latencies) > 0 else None,
+                "p99_ms": float(np.percentile(latencies, 99)) if len(latencies) > 0 else None,
+                "requests_per_second": self.requests / seconds, "rows_per_second": self.rows / seconds}
+
+class MicroBatcher():
+    def __init__(self, tree_func, stats, max_delay=0.002, max_batch=65536):
+        """
+        Coalesces the requests of one model into batches
+
+        Args:
+            tree_func: vectorized prediction function of the model
+            stats: LatencyStats of the server
+            max_delay: seconds a batch waits for more requests after its first request
+            max_batch: maximum number of rows of a batch
+        """
+        self.tree_func = tree_func
+        self.stats = stats
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+
+        # Pending requests where each request is (x, future, time received)
+        self.queue = asyncio.Queue()
+        self.task = asyncio.get_running_loop().create_task(self._run())
+
+    async def predict(self, x, received):
+        """
+        Args:
+            x: numpy array of inputs
+            received: time.perf_counter() when the request arrived
+
+        Returns:
+            Numpy array of predictions
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((x, future, received))
+        return await future
+
+    async def _run(self):
+        while True:
+            batch = [await self.queue.get()]
+            rows = len(batch[0][0])
+
+            # Let requests arrive during the window with a single timer
+            # A timeout per queue.get() costs more than the evaluation of a small batch
+            if self.max_delay > 0 and rows < self.max_batch:
+                await asyncio.sleep(self.max_delay)
+
+            # Requests beyond max_batch rows wait for the next batch
+            while rows < self.max_batch and not self.queue.empty():
+                request = self.queue.get_nowait()
+                batch.append(request)
+                rows += len(request[0])
+
+            # One vectorized call for every request of the batch
+            try:
+                with np.errstate(all="ignore"):
+                    y = np.broadcast_to(self.tree_func(np.concatenate([x for x, future, received in batch])), (rows,))
+            except Exception as e:
+                for x, future, received in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            offsets = np.cumsum([0] + [len(x) for x, future, received in batch])
+            for i, (x, future, received) in enumerate(batch):
+                if not future.done():
+                    future.set_result(y[offsets[i]:offsets[i + 1]])
+
+            now = time.perf_counter()
+            self.stats.add_batch([now - received for x, future, received in batch], rows)
+
+class InferenceServer():
+    def __init__(self, models, max_delay=0.002, max_batch=65536):
+        """
+        Args:
+            models: dictionary where (key, value) is (name, exported module)
+            max_delay: seconds a batch waits for more requests after its first request
+            max_batch: maximum number of rows of a batch
+        """
+        self.models = models
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self.stats = LatencyStats()
+        self.batchers = {}
+
+    async def handle(self, reader, writer):
+        """
+        Serves one connection, requests on a connection are answered as soon as their batch is done
+        """
+        lock = asyncio.Lock()
+        tasks = set()
+
+        async def respond(request, received):
+            try:
+                if request.get("stats"):
+                    response = {"id": request.get("id"), "stats": self.stats.report()}
+                elif request.get("model") not in self.batchers:
+                    response = {"id": request.get("id"), "error": "Model: {} Is not one of {}".format(request.get("model"), list(self.batchers.keys()))}
+                else:
+                    y = await self.batchers[request["model"]].predict(np.asarray(request["x"], dtype=np.float64).reshape(-1), received)
+                    response = {"id": request.get("id"), "y": y.tolist()}
+            except Exception as e:
+                response = {"id": request.get("id"), "error": repr(e)}
+
+            # Responses of one connection must not interleave
+            async with lock:
+                writer.write((json.dumps(response) + "\n").encode())
+                await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if len(line) == 0:
+                    break
+                received = time.perf_counter()
+                task = asyncio.get_running_loop().create_task(respond(json.loads(line), received))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if len(tasks) > 0:
+                await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8765, unix=None, report_interval=None, ready=None):
+        """
+        Runs the server until it is cancelled
+
+        Args:
+            host: host of the TCP socket
+            port: port of the TCP socket, 0 picks a free port
+            unix: path of a Unix socket used instead of TCP
+            report_interval: seconds between printed latency reports or None
+            ready: optional callable which receives the bound address
+        """
+        self.batchers = {name: MicroBatcher(module.tree_func, self.stats, self.max_delay, self.max_batch) for name, module in self.models.items()}
+
+        if unix is not None:
+            server = await asyncio.start_unix_server(self.handle, path=unix)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+
+        address = unix if unix is not None else server.sockets[0].getsockname()[:2]
+        print("Serving {} on {}".format(list(self.models.keys()), address), flush=True)
+        if ready is not None:
+            ready(address)
+
+        async with server:
+            if report_interval is None:
+                await server.serve_forever()
+            else:
+                server_task = asyncio.get_running_loop().create_task(server.serve_forever())
+                while not server_task.done():
+                    await asyncio.sleep(report_interval)
+                    print(json.dumps(self.stats.report()), flush=True)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Micro-batching inference server for exported trees")
+    parser.add_argument("models", nargs="+", help="paths of modules written by export.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", default=None, help="path of a Unix socket used instead of TCP")
+    parser.add_argument("--max-delay", type=float, default=0.002, help="seconds a batch waits for more requests")
+    parser.add_argument("--max-batch", type=int, default=65536, help="maximum number of rows of a batch")
+    parser.add_argument("--report-interval", type=float, default=None, help="seconds between printed latency reports")
+    args = parser.parse_args()
+
+    models = dict(load_model(path) for path in args.models)
+    server = InferenceServer(models, args.max_delay, args.max_batch)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix, args.report_interval))
+    except KeyboardInterrupt:
+        print(json.dumps(server.stats.report()))
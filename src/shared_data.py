@@ -0,0 +1,83 @@
+"""
+This file contains datasets shared with worker processes through shared memory
+
+The dataset is copied into shared memory once and tasks only carry a small reference to it
+Every worker attaches to the shared memory the first time it sees a reference and keeps the view
+"""
+from multiprocessing import shared_memory
+from collections import namedtuple
+import numpy as np
+
+# Reference to an array in shared memory which pickles as a few strings
+SharedArray = namedtuple("SharedArray", ["name", "shape", "dtype"])
+
+# Arrays attached in this process where (key, value) is (name, (shared memory, numpy array))
+ATTACHED = {}
+
+def share_array(array):
+    """
+    Copies an array into a new block of shared memory
+
+    Args:
+        array: numpy array
+
+    Returns:
+        SharedMemory which must be kept open and unlinked by the caller
+        SharedArray reference which can be sent with tasks
+    """
+    array = np.ascontiguousarray(array)
+    memory = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=memory.buf)[...] = array
+
+    reference = SharedArray(memory.name, array.shape, array.dtype.str)
+
+    # The creating process can resolve its own references without attaching again
+    ATTACHED[memory.name] = (memory, np.ndarray(array.shape, dtype=array.dtype, buffer=memory.buf))
+    return memory, reference
+
+def attach(reference):
+    """
+    Args:
+        reference: SharedArray or a plain numpy array
+
+    Returns:
+        Read-only numpy array backed by the shared memory
+    """
+    if not isinstance(reference, SharedArray):
+        return reference
+
+    if reference.name not in ATTACHED:
+        # Workers share the resource tracker of the creating process
+        # So the memory is only unlinked once by release or when the creating process exits
+        memory = shared_memory.SharedMemory(name=reference.name)
+        array = np.ndarray(reference.shape, dtype=np.dtype(reference.dtype), buffer=memory.buf)
+        array.flags.writeable = False
+        ATTACHED[reference.name] = (memory, array)
+
+    return ATTACHED[reference.name][1]
+
+def release(memory):
+    """
+    Closes and unlinks shared memory created by share_array
+
+    Args:
+        memory: SharedMemory returned by share_array
+    """
+    ATTACHED.pop(memory.name, None)
+    memory.close()
+    memory.unlink()
+
+def evaluate_shared(fitness, individual, x, y):
+    """
+    Runs a fitness function on a dataset held in shared memory
+
+    Args:
+        fitness: fitness function such as evaluate
+        individual: tuple (tree, score)
+        x: SharedArray or numpy array of inputs
+        y: SharedArray or numpy array of targets
+
+    Returns:
+        Result of fitness
+    """
+    return fitness(None, individual, attach(x), attach(y))
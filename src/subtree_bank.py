@@ -0,0 +1,134 @@
+"""
+This file contains a bank of pregenerated subtrees used by mutations
+
+Subtrees are generated ahead of time for every output type and drawn in O(1)
+Drawing only renames the node ids of the subtree for its new position
+
+With a dataset every subtree is evaluated once on its own when it is banked
+Subtrees which produce NaN or inf on the dataset or which only return x are dropped
+So an inserted subtree is finite by itself and never computes the same values as the x terminal it replaces
+The offspring can still be invalid or unchanged once the subtree is under other primitives
+Such as log of a negative value or a product with zero, which screening and evaluation still catch
+"""
+from tree import generate
+from collections import deque
+import numpy as np
+import threading
+
+class SubtreeBank():
+    def __init__(self, primitive_set, terminal_set, depth=1, capacity=512, x=None, function_pointers=None, output_types=None, background=False):
+        """
+        Args:
+            primitive_set: PrimitiveSet
+            terminal_set: TerminalSet
+            depth: depth of the banked subtrees
+            capacity: number of subtrees kept per output type
+            x: optional numpy array of inputs on which the subtrees are checked when they are banked
+            function_pointers: dictionary where (key, value) is (string, function), required with x
+            output_types: list of output types to bank or None for every type of primitive_set
+            background: refill in a thread whenever a bank falls below half its capacity
+                        The thread shares the random module so runs are no longer reproducible
+        """
+        self.primitive_set = primitive_set
+        self.terminal_set = terminal_set
+        self.depth = depth
+        self.capacity = capacity
+        self.x = x
+        self.function_pointers = function_pointers
+
+        # Subtrees of each output type
+        self.banks = {output_type: deque() for output_type in (output_types if output_types is not None else primitive_set.node_set)}
+
+        # Number of subtrees drawn, generated and dropped
+        self.draws = 0
+        self.generated = 0
+        self.rejected = 0
+
+        self.low = threading.Event()
+        self.stopped = False
+        self.thread = None
+        if background:
+            self.thread = threading.Thread(target=self._refill_loop, daemon=True)
+            self.thread.start()
+
+    def _make(self, output_type):
+        """
+        Generates one subtree and checks its output on the dataset
+
+        Returns:
+            Node or None if the subtree was dropped
+        """
+        subtree = generate(self.primitive_set, self.terminal_set, self.depth, [output_type], "0")[0]
+        subtree.regenerate_node_ids("", "0")
+        self.generated += 1
+
+        if self.x is None:
+            return subtree
+
+        with np.errstate(all="ignore"):
+            output = np.broadcast_to(subtree.get_func(self.function_pointers)(self.x), np.shape(self.x))
+        if not np.all(np.isfinite(output)) or np.array_equal(output, self.x):
+            self.rejected += 1
+            return None
+
+        return subtree
+
+    def refill(self, output_type=None):
+        """
+        Fills the banks up to capacity
+
+        Args:
+            output_type: output type to fill or None for every type
+        """
+        for output_type in [output_type] if output_type is not None else list(self.banks):
+            bank = self.banks[output_type]
+
+            # Give up after many rejections so a bank which can not be filled does not loop forever
+            attempts = 0
+            while len(bank) < self.capacity and attempts < 10 * self.capacity:
+                attempts += 1
+                subtree = self._make(output_type)
+                if subtree is not None:
+                    bank.append(subtree)
+
+    def _refill_loop(self):
+        while not self.stopped:
+            self.low.wait()
+            self.low.clear()
+            if not self.stopped:
+                self.refill()
+
+    def draw(self, output_type, node_id):
+        """
+        Takes a subtree out of the bank
+
+        Args:
+            output_type: output type of the subtree
+            node_id: string id the subtree gets in its new tree
+
+        Returns:
+            Node with the given node_id
+        """
+        bank = self.banks[output_type]
+        if len(bank) == 0:
+            self.refill(output_type)
+
+        if len(bank) > 0:
+            subtree = bank.popleft()
+        else:
+            # Every attempt was dropped so the subtree is used without the check
+            subtree = generate(self.primitive_set, self.terminal_set, self.depth, [output_type], "0")[0]
+        self.draws += 1
+
+        if self.thread is not None and len(bank) < self.capacity // 2:
+            self.low.set()
+
+        subtree.regenerate_node_ids(node_id[:-1], node_id[-1])
+        return subtree
+
+    def close(self):
+        # Stop the refill thread
+        if self.thread is not None:
+            self.stopped = True
+            self.low.set()
+            self.thread.join()
@@ -0,0 +1,300 @@
+"""
+This file contains a sweep runner for many independent generational runs on one machine
+
+Every run gets its configuration from a grid instead of the constants of symbolic_regression.py
+All runs share one worker pool, one dataset in shared memory and one fitness memo per fitness function
+Runs are interleaved: while the workers evaluate the offspring of one run, the next run creates its offspring
+
+Each run keeps its own random state which is restored whenever the run continues
+So the result of a run does not depend on how it was interleaved with the others
+
+Usage: python sweep.py --grid '{"seed": [1, 2, 3], "mutpb": [0.25, 0.5]}' --output-dir sweep
+"""
+from symbolic_regression import build_node_sets, polynomial2, POOL_SIZE, POP_SIZE, NGEN, MUTPB, CXPB, SELECTION, TOURNAMENT_SIZE, MAX_SIZE, MAX_DEPTH
+from tree import generate_tree
+from fitness import evaluate, evaluate_cases
+from selection import SELECTIONS, nsga2_selection, aggregate, as_matrix
+from variation import vary
+from executors import make_executor, estimate_cost, measure_primitive_costs, longest_processing_time, run_chunk
+from fingerprint import FitnessMemo, probe_points
+from interval import screen_population
+from metrics import MetricsRecorder, JsonLinesSink, tree_stats
+from shared_data import share_array, release, evaluate_shared
+import numpy as np
+import itertools
+import threading
+import argparse
+import random
+import queue
+import json
+import os
+
+# Configuration of a run, every key can be swept
+DEFAULTS = {"seed": 101, "pop_size": POP_SIZE, "ngen": NGEN, "mutpb": MUTPB, "cxpb": CXPB, "elite_size": 100,
+            "selection": SELECTION, "max_size": MAX_SIZE, "max_depth": MAX_DEPTH}
+
+def expand_grid(grid):
+    """
+    Creates one configuration per combination of the grid values
+
+    Args:
+        grid: dictionary where (key, value) is (configuration key, list of values)
+
+    Returns:
+        List of configuration dictionaries with every missing key set to its default
+    """
+    for key in grid:
+        if key not in DEFAULTS:
+            raise ValueError("Sweep key: {} Is not one of {}".format(key, list(DEFAULTS.keys())))
+
+    keys = sorted(grid)
+    return [dict(DEFAULTS, **dict(zip(keys, values))) for values in itertools.product(*[grid[key] for key in keys])]
+
+class Batch():
+    def __init__(self, executor, func, iterable, costs, on_done):
+        """
+        Submits tasks in chunks balanced by estimated cost without waiting for them
+
+        Args:
+            executor: executor with a submit method
+            func: callable function
+            iterable: list of argument tuples
+            costs: list of estimated costs (one per argument tuple)
+            on_done: callable run once every chunk has finished or one has failed
+        """
+        self.results = [None] * len(iterable)
+        self.error = None
+
+        # Seconds the workers spent on the chunks of this batch
+        self.busy = 0.0
+
+        self.on_done = on_done
+        self.lock = threading.Lock()
+
+        chunks = longest_processing_time(costs, executor.processes)
+        self.remaining = len(chunks)
+        if self.remaining == 0:
+            on_done()
+            return
+
+        for chunk in chunks:
+            executor.submit(run_chunk, (func, [iterable[i] for i in chunk]), self._callback(chunk), self._error_callback)
+
+    def _callback(self, chunk):
+        def callback(result):
+            chunk_results, worker, seconds = result
+            for i, value in zip(chunk, chunk_results):
+                self.results[i] = value
+            self._finish(seconds)
+        return callback
+
+    def _error_callback(self, e):
+        self.error = e
+        self._finish(0.0)
+
+    def _finish(self, seconds):
+        # Callbacks run in the result thread of the pool
+        with self.lock:
+            self.busy += seconds
+            self.remaining -= 1
+            done = self.remaining == 0
+        if done:
+            self.on_done()
+
+def select_elite(population, scores, size, selection):
+    """
+    Selects the elite pool of a run
+
+    Args:
+        population: list of individuals where each individual is a tuple (tree, score)
+        scores: list of scores or per-case errors (one per individual)
+        size: number of individuals to select
+        selection: name of a method in SELECTIONS
+
+    Returns:
+        List of selected indices sorted by mean error
+    """
+    if selection == "nsga2":
+        indices = nsga2_selection(np.column_stack([aggregate(as_matrix(scores)), [individual[0].size() for individual in population]]), size)
+    else:
+        options = {"tournament_size": TOURNAMENT_SIZE} if selection == "tournament" else {}
+        indices = SELECTIONS[selection](scores, size, **options)
+
+    mean = aggregate(as_matrix(scores))
+    return sorted(indices, key=lambda i: mean[i])
+
+def run(config, shared, submit, primitive_set, terminal_set, memos, primitive_costs, metrics):
+    """
+    Generational run which yields every time it waits for its evaluations
+    The caller resumes it once the yielded Batch has finished
+
+    Args:
+        config: configuration dictionary
+        shared: dictionary with the x interval and the number of samples of the dataset
+        submit: callable (fitness, individuals, costs) which returns a Batch
+        primitive_set: PrimitiveSet
+        terminal_set: TerminalSet
+        memos: dictionary where (key, value) is (fitness function, FitnessMemo shared by every run with that fitness)
+        primitive_costs: per-primitive timings used to balance the chunks
+        metrics: MetricsRecorder of the run
+
+    Returns:
+        Dictionary with the best score, the best individual and the best score of every generation
+    """
+    random.seed(config["seed"])
+    np.random.seed(config["seed"])
+
+    case_errors = config["selection"] in ["tournament", "lexicase"]
+    fitness = evaluate_cases if case_errors else evaluate
+    # Scores and per-case errors of the same tree must not be mixed
+    memo = memos[fitness]
+    invalid_score = np.full(shared["samples"], np.inf) if case_errors else np.inf
+    pset_by_name = primitive_set.struct_by_name()
+
+    def evaluate_population(individuals):
+        # Invalid individuals are never sent to the workers
+        invalid = screen_population(individuals, pset_by_name, shared["x_interval"])
+        valid = [individual for individual, flag in zip(individuals, invalid) if not flag]
+        fingerprints, to_evaluate = memo.deduplicate(valid)
+        hit_rate = memo.avoided / len(valid) if len(valid) > 0 else None
+
+        batch = submit(fitness, [valid[i] for i in to_evaluate], [estimate_cost(valid[i][0], primitive_costs) for i in to_evaluate])
+        yield batch
+        if batch.error is not None:
+            raise batch.error
+
+        metrics.record(evaluations=len(to_evaluate), invalid=sum(invalid), fingerprint_hit_rate=hit_rate, busy_seconds=batch.busy)
+        valid_scores = iter(memo.fill_scores(fingerprints, to_evaluate, batch.results))
+        return [invalid_score if flag else next(valid_scores) for flag in invalid]
+
+    population = [(generate_tree(primitive_set, terminal_set, depth=4), None) for i in range(config["pop_size"])]
+    scores = yield from evaluate_population(population)
+    sorted_scores = select_elite(population, scores, config["elite_size"], config["selection"])
+    population = [(population[i][0], scores[i]) for i in sorted_scores]
+
+    history = []
+    for gen in range(1, config["ngen"] + 1):
+        metrics.start_generation(gen)
+
+        with metrics.phase("variation"):
+            offspring = vary(population, primitive_set, terminal_set, config["mutpb"], config["cxpb"], config["max_size"], config["max_depth"])
+
+        # Includes the time other runs used the main process while this run waited
+        with metrics.phase("evaluation"):
+            scores = yield from evaluate_population(offspring)
+        metrics.record(evaluations_per_second=metrics.current["evaluations"] / metrics.current["evaluation_seconds"])
+
+        scores = scores + [i[1] for i in population]
+        population = offspring + population
+        with metrics.phase("selection"):
+            sorted_scores = select_elite(population, scores, config["elite_size"], config["selection"])
+        population = [(population[i][0], scores[i]) for i in sorted_scores]
+
+        history.append(float(np.mean(population[0][1])))
+        metrics.record(best_score=history[-1], offspring=len(offspring), **tree_stats(offspring))
+        metrics.end_generation()
+
+    return {"best_score": history[-1] if len(history) > 0 else float(np.mean(population[0][1])), "best_individual": str(population[0][0]), "history": history}
+
+def sweep(configs, output_dir, processes=POOL_SIZE, executor_name="process", max_active=None, data_seed=101, samples=20):
+    """
+    Runs every configuration on a shared pool and a shared dataset
+
+    Args:
+        configs: list of configuration dictionaries
+        output_dir: directory receiving run_<i>.json and run_<i>_metrics.jsonl of every run
+        processes: number of workers
+        executor_name: "serial", "thread" or "process"
+        max_active: number of runs interleaved at once, defaults to one more than the number of workers
+        data_seed: seed of the dataset
+        samples: number of points of the dataset
+
+    Returns:
+        List of result dictionaries in the order of configs
+    """
+    if executor_name not in ["serial", "thread", "process"]:
+        raise ValueError("Executor: {} Is not supported by sweep, shared memory needs a local executor".format(executor_name))
+    os.makedirs(output_dir, exist_ok=True)
+
+    primitive_set, terminal_set = build_node_sets()
+    function_pointers = primitive_set.function_pointers
+    function_pointers.update(terminal_set.function_pointers)
+
+    # One dataset for every run
+    rng = random.Random(data_seed)
+    x = np.array([rng.uniform(-5, 5) for i in range(samples)])
+    y = polynomial2(x)
+    x_memory, x_reference = share_array(x)
+    y_memory, y_reference = share_array(y)
+    shared = {"x_interval": (float(np.min(x)), float(np.max(x))), "samples": len(y)}
+
+    primitive_costs = measure_primitive_costs(primitive_set, x)
+    memos = {fitness: FitnessMemo(function_pointers, probe_points(*shared["x_interval"])) for fitness in [evaluate, evaluate_cases]}
+    executor = make_executor(executor_name, processes, initializer=build_node_sets)
+
+    # Index of every run whose batch has finished
+    completed = queue.Queue()
+
+    def submitter(index):
+        def submit(fitness, individuals, costs):
+            return Batch(executor, evaluate_shared, [(fitness, individual, x_reference, y_reference) for individual in individuals], costs, lambda: completed.put(index))
+        return submit
+
+    results = [None] * len(configs)
+    active = {}
+    waiting = list(range(len(configs)))
+    max_active = max_active if max_active is not None else executor.processes + 1
+
+    def resume(index):
+        # Continue a run with its own random state until it waits again or finishes
+        state = active[index]
+        if state["random"] is not None:
+            random.setstate(state["random"])
+            np.random.set_state(state["numpy"])
+        try:
+            next(state["run"])
+        except StopIteration as stop:
+            state["metrics"].close()
+            results[index] = dict(stop.value, config=configs[index])
+            with open(os.path.join(output_dir, "run_{}.json".format(index)), "w") as f:
+                json.dump(results[index], f, indent=2)
+            print("Finished run {}: {} Best Score: {}".format(index, configs[index], results[index]["best_score"]))
+            del active[index]
+            return
+        state["random"] = random.getstate()
+        state["numpy"] = np.random.get_state()
+
+    def start(index):
+        metrics = MetricsRecorder([JsonLinesSink(os.path.join(output_dir, "run_{}_metrics.jsonl".format(index)))])
+        active[index] = {"run": run(configs[index], shared, submitter(index), primitive_set, terminal_set, memos, primitive_costs, metrics),
+                         "metrics": metrics, "random": None, "numpy": None}
+        resume(index)
+
+    try:
+        while len(waiting) > 0 or len(active) > 0:
+            while len(waiting) > 0 and len(active) < max_active:
+                start(waiting.pop(0))
+            if len(active) > 0:
+                resume(completed.get())
+    finally:
+        executor.close()
+        release(x_memory)
+        release(y_memory)
+
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Sweep of symbolic regression runs")
+    parser.add_argument("--grid", default="{}", help="JSON dictionary of configuration key to list of values")
+    parser.add_argument("--output-dir", default="sweep")
+    parser.add_argument("--processes", type=int, default=POOL_SIZE)
+    parser.add_argument("--executor", default="process", help="serial, thread or process")
+    parser.add_argument("--max-active", type=int, default=None, help="number of runs interleaved at once")
+    parser.add_argument("--data-seed", type=int, default=101)
+    args = parser.parse_args()
+
+    configs = expand_grid(json.loads(args.grid))
+    results = sweep(configs, args.output_dir, args.processes, args.executor, args.max_active, args.data_seed)
+
+    best = min(range(len(results)), key=lambda i: results[i]["best_score"])
+    print("Best run {}: {} Best Score: {}".format(best, results[best]["config"], results[best]["best_score"]))
@@ -1,13 +1,24 @@
 
-from mutation import mutate, mutate_replace, mutate_insert, mutate_shrink
 from node_set import PrimitiveSet, TerminalSet
-from tree import generate_tree, parse_tree
-from crossover import one_point_crossover
+from tree import generate_tree, parse_tree, COMPILE_STATS
+from fitness import evaluate, evaluate_cases, evaluate_targets
+from selection import SELECTIONS, ParetoArchive, nsga2_selection, aggregate, as_matrix
+from variation import mutate_pop, crossover_pop, vary, vary_and_evaluate
+from executors import make_executor, balanced_starmap, estimate_cost, measure_primitive_costs
+from fingerprint import FitnessMemo, probe_points
+from fitness_cache import DiskFitnessCache, dataset_fingerprint
+from islands import run_islands
+from export import export_tree
+from subtree_bank import SubtreeBank
+from diversity import MinHasher, diversity_stats
+from genealogy import GenealogyWriter
+from metrics import MetricsRecorder, Profiler, make_sink, tree_stats, utilization
+from interval import interval_add, interval_sub, interval_mult, interval_div, interval_sin, interval_cos, interval_tan, interval_log, interval_sqrt, interval_exp, screen_population
 from functools import partial
-from copy import deepcopy
-import multiprocess
 import numpy as np
 import random
+import queue
+import time
 import sys
 import os
 
@@ -23,6 +34,103 @@ else:
 POOL_SIZE = max(2, num_proc - 2)
 # print("Using {} processes".format(POOL_SIZE))
 
+# Executor used for evaluation: "serial", "thread", "process" or "remote"
+EXECUTOR = "process"
+
+# List of (host, port) of running distributed.py workers used by the "remote" executor
+# None starts POOL_SIZE workers on localhost, remote workers need the same POINT_GP_AUTHKEY as this process
+REMOTE_WORKERS = None
+
+# Split evaluations into chunks balanced by estimated tree cost
+BALANCE = True
+
+# Estimate tree cost from measured primitive timings instead of tree size
+MEASURE_COSTS = True
+
+# Evolution mode: "generational", "steady_state" or "islands"
+MODE = "generational"
+
+# Number of evaluations in steady_state mode
+# Screened and behaviorally duplicate offspring are not evaluated so they do not count
+STEADY_STATE_EVALS = 25000
+
+# Maximum number of offspring produced in steady_state mode as a multiple of STEADY_STATE_EVALS
+# Stops the run when almost every offspring is screened or a duplicate
+STEADY_STATE_MAX_OFFSPRING = 10
+
+# Replacement in steady_state mode: "worst" or "tournament"
+REPLACEMENT = "tournament"
+
+# Tournament size used in steady_state mode and tournament selection
+TOURNAMENT_SIZE = 7
+
+# Generations between migrations in islands mode
+MIGRATION_INTERVAL = 5
+
+# Number of individuals sent to each neighbouring island
+MIGRANTS = 5
+
+# Migration topology in islands mode: "ring", "complete" or "random_ring"
+TOPOLOGY = "ring"
+
+# Create and evaluate offspring inside the workers in generational mode
+# Workers keep their offspring with the lowest error so only truncation selection is supported
+PARALLEL_VARIATION = False
+
+# Selection of the elite pool in generational mode: "truncation", "tournament", "lexicase" or "nsga2"
+# "tournament" and "lexicase" keep the squared error of every case
+SELECTION = "truncation"
+
+# Number of individuals with the lowest mean error which always survive "tournament" and "lexicase" selection
+# Both methods sample with replacement so the best individual could otherwise be lost
+ELITES = 1
+
+# Objectives minimized by nsga2 selection and the Pareto archive: "error", "size" and "cost"
+OBJECTIVES = ["error", "size"]
+
+# Maximum number of nodes and levels of an offspring, None for no limit
+# Operators retry or keep the parent unchanged instead of going over the limits
+MAX_SIZE = 200
+MAX_DEPTH = 17
+
+# File receiving the metrics of every generation in generational mode, ".csv" for CSV and JSON Lines otherwise
+# None keeps the metrics in memory only
+METRICS_PATH = None
+
+# Profiler run on PROFILE_GENERATIONS: None, "cprofile" or "sampling"
+PROFILE = None
+PROFILE_GENERATIONS = []
+
+# SQLite file of scores shared by every run on the same dataset, None disables the disk cache
+DISK_CACHE_PATH = None
+
+# Maximum number of scores kept in the disk cache
+DISK_CACHE_SIZE = 1000000
+
+# Path of a standalone NumPy module exported from the best individual, None disables the export
+EXPORT_PATH = None
+
+# Draw inserted subtrees from a bank of pregenerated subtrees checked on the dataset
+# Changes which subtrees are inserted so runs differ from runs without the bank
+SUBTREE_BANK = False
+
+# Number of subtrees kept per output type in the bank
+SUBTREE_BANK_SIZE = 512
+
+# Record the diversity, near duplicates and clusters of offspring and elite pool every generation in generational mode
+# Estimated from MinHash sketches of the subtrees of each tree in time linear in the population
+# Only useful with METRICS_PATH since the statistics are not printed
+DIVERSITY = False
+
+# Path of a log of every individual with its parents and its edit, None disables the log
+# Only in generational mode without PARALLEL_VARIATION, read it back with genealogy.py
+GENEALOGY_PATH = None
+
+# Names of the target functions fitted by one population at once, None fits polynomial2 only
+# Each target is a column of y and every tree is run once for all of them
+# Tournament and lexicase selection treat each target as a case, other methods use the mean error
+TARGETS = None
+
 # Population size
 POP_SIZE = 600
 
@@ -46,89 +154,221 @@ def polynomial(x):
 def polynomial2(x):
     return np.exp(-1.0 * (np.sin(3 * x) + (2 * x)))
 
-def evaluate(function_pointers, individual, x, y):
-    # Generate function pointer for the tree
-    func = individual[0].get_func(function_pointers)
-
-    # Get output of tree
-    output = func(x)
-
-    # Calculate Mean Squared Error
-    try:
-        error = np.mean(np.square(output - y))
-    except:
-        print(x, output, y)
-        raise
-
-    return error
-
-def mutate_pop(individual, mutpb, primitive_set, terminal_set):
-    offspring = []
-
-    # Replace
-    if random.random() < mutpb:
-        offspring.append((mutate(mutate_replace, primitive_set, terminal_set, deepcopy(individual[0])), None))
-
-    # Insert
-    if random.random() < mutpb:
-        offspring.append(( mutate(mutate_insert, primitive_set, terminal_set, deepcopy(individual[0]), use_input_ids=True), None))
-
-    # Shrink
-    if random.random() < mutpb:
-        offspring.append((mutate(mutate_shrink, primitive_set, terminal_set, deepcopy(individual[0])), None))
-
-    return offspring
-
-def crossover_pop(individual_1, individual_2, cxpb):
-    offspring = []
-
-    # One-point crossover
-    new_tree, new_tree_2 = one_point_crossover(primitive_set, terminal_set, deepcopy(individual_1[0]), deepcopy(individual_2[0]))
-
-    # Add both trees to the offspring
-    offspring += [(new_tree, None), (new_tree_2, None)]
-
-    return offspring
-
-if __name__ == '__main__':
+def tournament(population, size):
+    """
+    Picks the best of size random individuals
+
+    Args:
+        population: list of individuals where each individual is a tuple (tree, score)
+        size: number of individuals in the tournament
+
+    Returns:
+        Index of the winner
+    """
+    candidates = random.sample(range(len(population)), min(size, len(population)))
+    return min(candidates, key=lambda i: population[i][1])
+
+def steady_state(population, executor, primitive_set, terminal_set, memo, pset_by_name, x_interval, x, y, bank=None):
+    """
+    Evolves the elite pool without generation barriers
+
+    Offspring are submitted as soon as a worker is free
+    And each result is inserted into the elite pool as soon as it completes
+
+    Args:
+        population: evaluated elite pool where each individual is a tuple (tree, score)
+        executor: SerialExecutor, ThreadExecutor or ProcessExecutor
+        primitive_set: PrimitiveSet
+        terminal_set: TerminalSet
+        memo: FitnessMemo used to skip behaviorally duplicate offspring
+        pset_by_name: primitive set structured by name used for interval pre-screening
+        x_interval: tuple (min, max) of the input x
+        x: numpy array of inputs
+        y: numpy array of targets
+        bank: optional SubtreeBank used by insert mutations
+
+    Returns:
+        Elite pool sorted by score
+    """
+    # Results are put here by executor callbacks
+    completed = queue.Queue()
+
+    def make_offspring():
+        # Pick parents by tournament and vary them with the same operators as the generational loop
+        individual_1 = population[tournament(population, TOURNAMENT_SIZE)]
+        if random.random() < CXPB:
+            individual_2 = population[tournament(population, TOURNAMENT_SIZE)]
+            return crossover_pop(individual_1, individual_2, CXPB, primitive_set, terminal_set, MAX_SIZE, MAX_DEPTH)
+        return mutate_pop(individual_1, 1.0 / 3, primitive_set, terminal_set, MAX_SIZE, MAX_DEPTH, bank)
+
+    def insert(tree, score):
+        # NaN and inf scores never enter the elite pool
+        if not np.isfinite(score):
+            return
+
+        if REPLACEMENT == "worst":
+            loser = max(range(len(population)), key=lambda i: population[i][1])
+        else:
+            # Inverse tournament: the worst of a random sample is replaced
+            candidates = random.sample(range(len(population)), min(TOURNAMENT_SIZE, len(population)))
+            loser = max(candidates, key=lambda i: population[i][1])
+
+        if score < population[loser][1]:
+            population[loser] = (tree, score)
+
+    def on_result(tree, fingerprint):
+        # Callback run by the executor when the evaluation completes
+        return lambda score: completed.put((tree, fingerprint, score))
+
+    # NaN scores are treated as the worst possible score
+    population = [(tree, score if np.isfinite(score) else np.inf) for tree, score in population]
+
+    def budget_left():
+        # Offspring which are never evaluated still count against the offspring limit
+        return submitted < STEADY_STATE_EVALS and produced < STEADY_STATE_MAX_OFFSPRING * STEADY_STATE_EVALS
+
+    start = time.perf_counter()
+    produced = 0
+    submitted = 0
+    evaluations = 0
+    in_flight = 0
+    while budget_left() or in_flight > 0:
+        # Keep every worker busy
+        while in_flight < 2 * executor.processes and budget_left():
+            for individual in make_offspring():
+                # The second child of a crossover is dropped once the budget is used
+                if not budget_left():
+                    break
+                produced += 1
+
+                # Drop offspring which are guaranteed to produce NaN or inf
+                if screen_population([individual], pset_by_name, x_interval)[0]:
+                    continue
+
+                # Reuse the score of a behaviorally identical tree
+                fingerprints, to_evaluate = memo.deduplicate([individual])
+                if len(to_evaluate) == 0:
+                    insert(individual[0], memo.scores[fingerprints[0]])
+                    continue
+
+                executor.submit(evaluate, (None, individual, x, y), on_result(individual[0], fingerprints[0]), lambda e: completed.put((None, None, e)))
+                submitted += 1
+                in_flight += 1
+
+        if in_flight == 0:
+            continue
+
+        # Consume one result as soon as it completes
+        tree, fingerprint, score = completed.get()
+        in_flight -= 1
+        if isinstance(score, Exception):
+            raise score
+
+        memo.fill_scores([fingerprint], [0], [score])
+        insert(tree, score)
+        evaluations += 1
+
+        if evaluations % 1000 == 0:
+            print("Evaluations: {} Evaluations per second: {:.1f} Best Score: {}".format(evaluations, evaluations / (time.perf_counter() - start), min(i[1] for i in population)))
+
+    if submitted < STEADY_STATE_EVALS:
+        print("Offspring limit reached after {} evaluations".format(evaluations))
+    print("Evaluations avoided:", produced - evaluations)
+    print("Evaluations per second:", evaluations / (time.perf_counter() - start))
+
+    return sorted(population, key=lambda i: i[1])
+
+def objectives(population, scores, primitive_costs=None):
+    """
+    Builds the objective matrix used by nsga2 selection and the Pareto archive
+
+    Args:
+        population: list of individuals where each individual is a tuple (tree, score)
+        scores: list of scores or per-case errors (one per individual)
+        primitive_costs: optional per-primitive timings used by the "cost" objective
+
+    Returns:
+        Numpy array with one column per name in OBJECTIVES
+    """
+    columns = {"error": lambda: aggregate(as_matrix(scores)),
+               "size": lambda: [individual[0].size() for individual in population],
+               "cost": lambda: [estimate_cost(individual[0], primitive_costs) for individual in population]}
+    return np.column_stack([columns[name]() for name in OBJECTIVES]).astype(np.float64)
+
+def select(population, scores, size, primitive_costs=None):
+    """
+    Selects the elite pool with the SELECTION method
+
+    Args:
+        population: list of individuals where each individual is a tuple (tree, score)
+        scores: list of scores or per-case errors (one per individual)
+        size: number of individuals to select
+        primitive_costs: optional per-primitive timings used by the "cost" objective
+
+    Returns:
+        List of selected indices sorted by mean error
+    """
+    if SELECTION == "nsga2":
+        indices = nsga2_selection(objectives(population, scores, primitive_costs), size)
+    elif SELECTION in ["tournament", "lexicase"]:
+        # The rest of the elite pool is chosen by the selection method
+        mean = aggregate(as_matrix(scores))
+        elites = list(np.argsort(mean)[:min(ELITES, size)])
+        options = {"tournament_size": TOURNAMENT_SIZE} if SELECTION == "tournament" else {}
+        indices = elites + list(SELECTIONS[SELECTION](scores, size - len(elites), **options))
+    else:
+        indices = SELECTIONS[SELECTION](scores, size)
+
+    # Sort so the best individual is always first
+    mean = aggregate(as_matrix(scores))
+    return sorted(indices, key=lambda i: mean[i])
+
+def build_node_sets():
+    """
+    Creates the Primitive Set and Terminal Set of the run
+    Also used as the initializer of worker processes so the registries match
+
+    Returns:
+        PrimitiveSet and TerminalSet
+    """
     # Create Primitive Set
     primitive_set = PrimitiveSet()
-    
+
     # Add each primitive
-    primitive_set.add_primitive(np.add, "x", "add_x_float", ["x", "float"], "operators")
-    primitive_set.add_primitive(np.add, "x", "add_x_x", ["x", "x"], "operators")
+    primitive_set.add_primitive(np.add, "x", "add_x_float", ["x", "float"], "operators", interval=interval_add)
+    primitive_set.add_primitive(np.add, "x", "add_x_x", ["x", "x"], "operators", interval=interval_add)
 
-    primitive_set.add_primitive(np.subtract, "x", "sub_x_float", ["x", "float"], "operators")
-    primitive_set.add_primitive(np.subtract, "x", "sub_x_x", ["x", "x"], "operators")
+    primitive_set.add_primitive(np.subtract, "x", "sub_x_float", ["x", "float"], "operators", interval=interval_sub)
+    primitive_set.add_primitive(np.subtract, "x", "sub_x_x", ["x", "x"], "operators", interval=interval_sub)
 
-    primitive_set.add_primitive(np.multiply, "x", "mult_x_float", ["x", "float"], "operators")
-    primitive_set.add_primitive(np.multiply, "x", "mult_x_x", ["x", "x"], "operators")
+    primitive_set.add_primitive(np.multiply, "x", "mult_x_float", ["x", "float"], "operators", interval=interval_mult)
+    primitive_set.add_primitive(np.multiply, "x", "mult_x_x", ["x", "x"], "operators", interval=interval_mult)
 
-    primitive_set.add_primitive(np.divide, "x", "div_x_float", ["x", "float"], "operators")
-    primitive_set.add_primitive(np.divide, "x", "div_x_x", ["x", "x"], "operators")
+    primitive_set.add_primitive(np.divide, "x", "div_x_float", ["x", "float"], "operators", interval=interval_div)
+    primitive_set.add_primitive(np.divide, "x", "div_x_x", ["x", "x"], "operators", interval=interval_div)
 
-    primitive_set.add_primitive(np.add, "float", "add_float_float", ["float", "float"], "operators")
-    primitive_set.add_primitive(np.subtract, "float", "sub_float_float", ["float", "float"], "operators")
-    primitive_set.add_primitive(np.multiply, "float", "mult_float_float", ["float", "float"], "operators")
-    primitive_set.add_primitive(np.divide, "float", "div_float_float", ["float", "float"], "operators")
+    primitive_set.add_primitive(np.add, "float", "add_float_float", ["float", "float"], "operators", interval=interval_add)
+    primitive_set.add_primitive(np.subtract, "float", "sub_float_float", ["float", "float"], "operators", interval=interval_sub)
+    primitive_set.add_primitive(np.multiply, "float", "mult_float_float", ["float", "float"], "operators", interval=interval_mult)
+    primitive_set.add_primitive(np.divide, "float", "div_float_float", ["float", "float"], "operators", interval=interval_div)
 
-    primitive_set.add_primitive(np.sin, "x", "sin_x", ["x"], "operators")
-    primitive_set.add_primitive(np.sin, "float", "sin_float", ["float"], "operators")
+    primitive_set.add_primitive(np.sin, "x", "sin_x", ["x"], "operators", interval=interval_sin)
+    primitive_set.add_primitive(np.sin, "float", "sin_float", ["float"], "operators", interval=interval_sin)
 
-    primitive_set.add_primitive(np.cos, "x", "cos_x", ["x"], "operators")
-    primitive_set.add_primitive(np.cos, "float", "cos_float", ["float"], "operators")
+    primitive_set.add_primitive(np.cos, "x", "cos_x", ["x"], "operators", interval=interval_cos)
+    primitive_set.add_primitive(np.cos, "float", "cos_float", ["float"], "operators", interval=interval_cos)
 
-    primitive_set.add_primitive(np.tan, "x", "tan_x", ["x"], "operators")
-    primitive_set.add_primitive(np.tan, "float", "tan_float", ["float"], "operators")
+    primitive_set.add_primitive(np.tan, "x", "tan_x", ["x"], "operators", interval=interval_tan)
+    primitive_set.add_primitive(np.tan, "float", "tan_float", ["float"], "operators", interval=interval_tan)
 
-    primitive_set.add_primitive(np.log, "x", "log_x", ["x"], "operators")
-    primitive_set.add_primitive(np.log, "float", "log_float", ["float"], "operators")
+    primitive_set.add_primitive(np.log, "x", "log_x", ["x"], "operators", interval=interval_log)
+    primitive_set.add_primitive(np.log, "float", "log_float", ["float"], "operators", interval=interval_log)
 
-    primitive_set.add_primitive(np.sqrt, "x", "sqrt_x", ["x"], "operators")
-    primitive_set.add_primitive(np.sqrt, "float", "sqrt_float", ["float"], "operators")
+    primitive_set.add_primitive(np.sqrt, "x", "sqrt_x", ["x"], "operators", interval=interval_sqrt)
+    primitive_set.add_primitive(np.sqrt, "float", "sqrt_float", ["float"], "operators", interval=interval_sqrt)
 
-    primitive_set.add_primitive(np.exp, "x", "exp_x", ["x"], "operators")
-    primitive_set.add_primitive(np.exp, "float", "exp_float", ["float"], "operators")
+    primitive_set.add_primitive(np.exp, "x", "exp_x", ["x"], "operators", interval=interval_exp)
+    primitive_set.add_primitive(np.exp, "float", "exp_float", ["float"], "operators", interval=interval_exp)
 
     # Create Terminal Set
     terminal_set = TerminalSet()
@@ -140,6 +380,12 @@ if __name__ == '__main__':
     terminal_set.add_terminal("float", "pass_3", lambda: 3.0, True)
     terminal_set.add_terminal("x", "pass_x", lambda: "x", True)
 
+    return primitive_set, terminal_set
+
+if __name__ == '__main__':
+    # Create the Primitive Set and Terminal Set
+    primitive_set, terminal_set = build_node_sets()
+
     # Combine function_pointers of primitive_set and terminal_sets
     function_pointers = primitive_set.function_pointers
     function_pointers.update(terminal_set.function_pointers)
@@ -162,66 +408,219 @@ if __name__ == '__main__':
         y.append(polynomial2(x[-1]))
     x = np.array(x)
     y = np.array(y)
-
-    # Create a pool of processes
-    pool = multiprocess.Pool(processes=POOL_SIZE)
+    if TARGETS is not None:
+        y = np.column_stack([globals()[target](x) for target in TARGETS])
+
+    # Known range of x used to pre-screen offspring
+    x_interval = (float(np.min(x)), float(np.max(x)))
+    pset_by_name = primitive_set.struct_by_name()
+
+    # Per-primitive timings used to estimate the cost of each tree
+    primitive_costs = measure_primitive_costs(primitive_set, x) if MEASURE_COSTS else None
+
+    # Tournament and lexicase selection keep the error of every case
+    case_errors = SELECTION in ["tournament", "lexicase"]
+    if case_errors and (MODE != "generational" or PARALLEL_VARIATION):
+        raise ValueError("Selection: {} Is only supported in generational mode without PARALLEL_VARIATION".format(SELECTION))
+    # Workers only return their offspring with the lowest error so nsga2 would never see small trees with higher error
+    if SELECTION == "nsga2" and PARALLEL_VARIATION:
+        raise ValueError("Selection: nsga2 Is not supported with PARALLEL_VARIATION")
+    if TARGETS is not None and (MODE != "generational" or PARALLEL_VARIATION):
+        raise ValueError("TARGETS Are only supported in generational mode without PARALLEL_VARIATION")
+    if GENEALOGY_PATH is not None and (MODE != "generational" or PARALLEL_VARIATION):
+        raise ValueError("GENEALOGY_PATH Is only supported in generational mode without PARALLEL_VARIATION")
+    fitness = evaluate_cases if case_errors else evaluate
+    invalid_score = np.full(len(y), np.inf) if case_errors else np.inf
+
+    # Every individual gets one mean squared error per target
+    if TARGETS is not None:
+        fitness = evaluate_targets
+        invalid_score = np.full(y.shape[1], np.inf)
+
+    # Non-dominated individuals seen during the run
+    archive = ParetoArchive()
+
+    # Pregenerated subtrees for insert mutations
+    # Islands and PARALLEL_VARIATION workers still generate every inserted subtree
+    bank = SubtreeBank(primitive_set, terminal_set, capacity=SUBTREE_BANK_SIZE, x=x, function_pointers=function_pointers, output_types=["x"]) if SUBTREE_BANK else None
+
+    # Create the executor used for every evaluation of the run
+    options = {"addresses": REMOTE_WORKERS} if EXECUTOR == "remote" else {}
+    executor = make_executor(EXECUTOR, POOL_SIZE, initializer=build_node_sets, **options)
+
+    # Reuse scores of trees with the same outputs on a fixed probe set
+    # Scores of earlier runs are only reused for the same dataset and fitness function
+    disk = DiskFitnessCache(DISK_CACHE_PATH, dataset_fingerprint(x, y, salt=fitness.__name__), DISK_CACHE_SIZE) if DISK_CACHE_PATH is not None else None
+    memo = FitnessMemo(function_pointers, probe_points(*x_interval), disk)
+
+    # Every individual of the initial population is logged as a full tree
+    genealogy = GenealogyWriter(GENEALOGY_PATH) if GENEALOGY_PATH is not None else None
+    if genealogy is not None:
+        ids = [genealogy.add_root(tree, 0) for tree, score in population]
 
     # Evaluate the initial population
-    scores = pool.starmap_async(evaluate, [(function_pointers, individual, x, y) for individual in population]).get()
-    pool.terminate()
+    fingerprints, to_evaluate = memo.deduplicate(population)
+    new_scores = executor.starmap(fitness, [(None, population[i], x, y) for i in to_evaluate])
+    scores = memo.fill_scores(fingerprints, to_evaluate, new_scores)
 
-    # Sort by score and take the top 100
-    sorted_scores = np.argsort(scores)[:100]
+    # Select 100 individuals sorted by score
+    sorted_scores = select(population, scores, 100, primitive_costs)
 
     # Select the top 100 individuals as an elite pool
     population = [(population[i][0], scores[i]) for i in sorted_scores]
 
-    for gen in range(1, NGEN + 1):
-        print("Starting Gen:", gen)
-
-        # Create a pool of processes
-        pool = multiprocess.Pool(processes=POOL_SIZE)
-
-        # Create list for storing offspring
-        offspring = []
-
-        # Mutate elite pool
-        for individual in population:
-            offspring += mutate_pop(individual, MUTPB, primitive_set, terminal_set)
-
-        # Crossover elite pool
-        for individual_1 in population:
-            if random.random() < CXPB:
-                offspring += crossover_pop(individual_1, random.choice(population), CXPB)
-
-        # # Mutate elite pool
-        # new_individuals = pool.starmap_async(mutate_pop, [(individual, MUTPB, primitive_set, terminal_set) for individual in population]).get()
-        # for i in new_individuals:
-        #     offspring += i
-
-        # # Crossover elite pool
-        # new_individuals = pool.starmap_async(crossover_pop, [(individual, CXPB, primitive_set, terminal_set) for individual in population]).get()
-        # for i in new_individuals:
-        #     offspring += i
-
-        print("Number of offspring:", len(offspring))
-
-        # Evaluate the offspring
-        scores = pool.starmap_async(evaluate, [(function_pointers, individual, x, y) for individual in offspring]).get()
-        pool.terminate()
-
-        # Combine offspring scores with elite pool scores
-        scores = scores + [i[1] for i in population]
-
-        # Combine elite pool and offspring
-        population = offspring + population
-
-        # Sort by score and take the top 100
-        sorted_scores = np.argsort(scores)[:100]
-
-        # Select the top 100 individuals as an elite pool
-        population = [(population[i][0], scores[i]) for i in sorted_scores]
-
-        print("Best Score:", population[0][1])
-
-    print("Best individual:", str(population[0][0]), population[0][1])
+    # Ids of the elite pool in the genealogy log
+    if genealogy is not None:
+        ids = [ids[i] for i in sorted_scores]
+        genealogy.retain(ids)
+
+    if MODE == "steady_state":
+        population = steady_state(population, executor, primitive_set, terminal_set, memo, pset_by_name, x_interval, x, y, bank)
+    elif MODE == "islands":
+        # Each island evolves part of the elite pool in its own process
+        config = {"seed": 101, "elite_size": 100, "ngen": NGEN, "interval": MIGRATION_INTERVAL, "migrants": MIGRANTS, "topology": TOPOLOGY}
+        population = run_islands(population, POOL_SIZE, config, build_node_sets, partial(vary, mutpb=MUTPB, cxpb=CXPB, max_size=MAX_SIZE, max_depth=MAX_DEPTH), evaluate, x, y)
+    else:
+        # Wall time per phase and other statistics of every generation
+        metrics = MetricsRecorder([make_sink(METRICS_PATH)] if METRICS_PATH is not None else [])
+        profiler = Profiler(PROFILE, PROFILE_GENERATIONS)
+
+        # Same hash functions every generation so the statistics are comparable
+        hasher = MinHasher() if DIVERSITY else None
+
+        for gen in range(1, NGEN + 1):
+            print("Starting Gen:", gen)
+            metrics.start_generation(gen)
+            profiler.start(gen)
+            compile_hits, compile_misses = COMPILE_STATS["hits"], COMPILE_STATS["misses"]
+
+            if PARALLEL_VARIATION:
+                # Workers create and evaluate the offspring of part of the elite pool
+                # Each task gets an independent seed so the run is reproducible for a fixed number of workers
+                seeds = [int(i.generate_state(1)[0]) for i in np.random.SeedSequence(random.getrandbits(64)).spawn(executor.processes)]
+                parents = [list(range(len(population)))[i::executor.processes] for i in range(executor.processes)]
+                with metrics.phase("parallel_variation"):
+                    results = executor.starmap(vary_and_evaluate, [(population, parents[i], seeds[i], MUTPB, CXPB, primitive_set, terminal_set, x, y, len(population), MAX_SIZE, MAX_DEPTH) for i in range(executor.processes)])
+
+                # Only the best offspring of each task are sent back
+                offspring = [individual for survivors, created in results for individual in survivors]
+                scores = [individual[1] for individual in offspring]
+                print("Number of offspring:", sum(created for survivors, created in results))
+                metrics.record(evaluations=sum(created for survivors, created in results))
+                evaluation_seconds = metrics.current["parallel_variation_seconds"]
+            else:
+                # Mutate and crossover elite pool
+                with metrics.phase("variation"):
+                    if bank is not None:
+                        bank.refill()
+                    lineage = [] if genealogy is not None else None
+                    offspring = vary(population, primitive_set, terminal_set, MUTPB, CXPB, MAX_SIZE, MAX_DEPTH, bank, lineage)
+
+                if genealogy is not None:
+                    with metrics.phase("genealogy"):
+                        ids = [genealogy.add_child(offspring[i][0], gen, operator, [ids[p] for p in parents], [population[p][0] for p in parents]) for i, (operator, parents) in enumerate(lineage)] + ids
+
+                print("Number of offspring:", len(offspring))
+
+                # Flag offspring which are guaranteed to produce NaN or inf
+                with metrics.phase("screening"):
+                    invalid = screen_population(offspring, pset_by_name, x_interval)
+                print("Number of invalid offspring:", sum(invalid))
+
+                # Skip offspring which behave the same as an already evaluated tree
+                valid = [individual for individual, flag in zip(offspring, invalid) if not flag]
+                with metrics.phase("deduplication"):
+                    fingerprints, to_evaluate = memo.deduplicate(valid)
+                print("Evaluations avoided:", memo.avoided)
+
+                # Evaluate the remaining offspring
+                with metrics.phase("evaluation"):
+                    if BALANCE:
+                        costs = [estimate_cost(valid[i][0], primitive_costs) for i in to_evaluate]
+                        new_scores, load = balanced_starmap(executor, fitness, [(None, valid[i], x, y) for i in to_evaluate], costs)
+                    else:
+                        new_scores = executor.starmap(fitness, [(None, valid[i], x, y) for i in to_evaluate])
+                if BALANCE:
+                    print("Worker busy/idle seconds:", ", ".join("{}: {:.4f}/{:.4f}".format(worker, load["busy"][worker], load["idle"][worker]) for worker in sorted(load["busy"])))
+                    if load["unused"] > 0:
+                        print("Unused workers:", load["unused"])
+
+                    # Time outside the workers, mostly sending the tasks and receiving the scores
+                    metrics.record(pool_utilization=utilization(load, executor.processes), dispatch_seconds=load["wall"] - max(load["busy"].values(), default=0.0))
+
+                metrics.record(evaluations=len(to_evaluate), invalid=sum(invalid), fingerprint_hit_rate=memo.avoided / len(valid) if len(valid) > 0 else None)
+                evaluation_seconds = metrics.current["evaluation_seconds"]
+
+                # Invalid offspring get the worst possible score without being evaluated
+                valid_scores = iter(memo.fill_scores(fingerprints, to_evaluate, new_scores))
+                scores = [invalid_score if flag else next(valid_scores) for flag in invalid]
+
+            # Combine offspring scores with elite pool scores
+            scores = scores + [i[1] for i in population]
+
+            # Combine elite pool and offspring
+            population = offspring + population
+
+            if hasher is not None:
+                with metrics.phase("diversity"):
+                    metrics.record(**diversity_stats([i[0] for i in population], hasher))
+
+            # Select 100 individuals sorted by score
+            with metrics.phase("selection"):
+                sorted_scores = select(population, scores, 100, primitive_costs)
+
+            # Select the top 100 individuals as an elite pool
+            population = [(population[i][0], scores[i]) for i in sorted_scores]
+
+            print("Best Score:", np.mean(population[0][1]))
+
+            # Write the offspring of this generation so the log can be read during the run
+            if genealogy is not None:
+                ids = [ids[i] for i in sorted_scores]
+                genealogy.retain(ids)
+                genealogy.flush()
+
+            # Keep the best trade-offs between the objectives across generations
+            archive.update(population, objectives(population, [i[1] for i in population], primitive_costs))
+            print("Pareto archive size:", len(archive.members))
+
+            # Compiles in this process, such as fingerprinting, workers keep their own cache
+            hits = COMPILE_STATS["hits"] - compile_hits
+            misses = COMPILE_STATS["misses"] - compile_misses
+            metrics.record(evaluations_per_second=metrics.current["evaluations"] / evaluation_seconds if evaluation_seconds > 0 else None,
+                           compile_hit_rate=hits / (hits + misses) if hits + misses > 0 else None,
+                           best_score=float(np.mean(population[0][1])), offspring=len(offspring), **tree_stats(offspring))
+
+            path = profiler.stop(gen)
+            if path is not None:
+                print("Profile written to:", path)
+            metrics.end_generation()
+
+        metrics.close()
+
+    executor.close()
+    if genealogy is not None:
+        genealogy.close()
+    if disk is not None:
+        disk.close()
+        print("Disk cache hits:", disk.hits)
+
+    print("Best individual:", str(population[0][0]), np.mean(population[0][1]))
+
+    if bank is not None:
+        print("Subtree bank draws: {} generated: {} rejected: {}".format(bank.draws, bank.generated, bank.rejected))
+
+    if EXPORT_PATH is not None:
+        export_tree(population[0][0], EXPORT_PATH, function_pointers)
+        print("Best individual exported to:", EXPORT_PATH)
+
+    if TARGETS is not None:
+        errors = as_matrix([i[1] for i in population])
+        for i, target in enumerate(TARGETS):
+            best = np.argmin(errors[:, i])
+            print("Best individual for {}:".format(target), str(population[best][0]), errors[best, i])
+
+    archive.update(population, objectives(population, [i[1] for i in population], primitive_costs))
+    print("Pareto archive ({}):".format(", ".join(OBJECTIVES)))
+    for tree, values in archive.members:
+        print(values, str(tree))
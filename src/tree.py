@@ -5,9 +5,40 @@ Tree gets compiled top down
 
 TODO: Make node_id list recursive
 """
+from node_set import PRIMITIVE_REGISTRY, TERMINAL_REGISTRY
+from copy import copy, deepcopy
+from collections import OrderedDict
+from functools import partial
+import numpy as np
 import random
 import ast
 
+# Deepest tree compiled as a single nested expression
+# The Python compiler fails on expressions nested a few hundred levels deep
+MAX_EXPRESSION_DEPTH = 100
+
+# Deepest subtree which memoizes its own string
+# Deeper subtrees only memoize the string of the root they were rendered from
+# Which bounds the memory of the cache on very deep trees
+MAX_CACHED_STRING_DEPTH = 32
+
+# Maximum number of compiled tree structures kept in COMPILED_TREES
+COMPILE_CACHE_SIZE = 10000
+
+# Deepest subtree which generate creates with recursion
+# Deeper trees use an explicit stack for their top levels
+MAX_RECURSIVE_DEPTH = 64
+
+# Compiled functions by source code, least recently used first
+# The source only depends on the structure of a tree so trees which differ only in constants share a function
+COMPILED_TREES = OrderedDict()
+
+# Number of compile_source calls which reused or compiled a function in this process
+COMPILE_STATS = {"hits": 0, "misses": 0}
+
+# Attributes which only hold strings (or None) so a shallow copy is a full copy
+SHALLOW_COPY = ("tree_ids", "id_outputs", "input_ids", "input_types")
+
 class Node():
     def __init__(self, name, args, node_id, tree_ids, input_ids, output_type, input_types):
         
@@ -42,10 +73,19 @@ class Node():
         # Used for evolutionary operators
         self.input_ids = input_ids
 
+        # Number of nodes and number of levels of the subtree under this node
+        # Children are always created first so their values are already cached
+        # Kept up to date by apply_at_node along the path of every edit
+        self.update_size_depth()
+
+        # Memoized LISP string of the subtree or None if it must be rendered again
+        # Cleared by apply_at_node on every ancestor of an edit
+        self.cached_string = None
+
     def get_func(self, func_pointers):
         """
-        Recursively converts the tree into a string of function calls
-        Then wraps those function calls into a single function call
+        Compiles the tree and binds its current constants
+        The result only takes the input, x
 
         This function assumes a single input, x
         Which can be used in multiple places
@@ -56,7 +96,119 @@ class Node():
         Returns:
             Callable function of the tree
         """
-        return eval("lambda x: " + self.__str__(), func_pointers, {})
+        source, terminals = self.to_source()
+        return partial(compile_source(source, func_pointers), c=np.array([i.value for i in terminals], dtype=np.float64))
+
+    def get_compiled(self, func_pointers):
+        """
+        Compiles the tree into a function of the input and the constant vector
+        Trees with the same structure share one compiled function
+        So changing constants never requires compiling again
+
+        Args:
+            pset: dictionary where (key, value) is (string, function)
+
+        Returns:
+            Callable function f(x, c) where c is a vector like get_constants()
+        """
+        return compile_source(self.to_source()[0], func_pointers)
+
+    def get_constants(self):
+        """
+        Slot i of the vector is the i-th constant TerminalNode in depth first order
+
+        Returns:
+            Numpy float64 array of every constant in the tree
+        """
+        return np.array([node.value for node in self.preorder() if is_constant(node)], dtype=np.float64)
+
+    def set_constants(self, constants):
+        """
+        Writes a constant vector back into the TerminalNodes of the tree
+
+        Args:
+            constants: vector with one value per slot of get_constants()
+        """
+        nodes = self.preorder()
+        terminals = [node for node in nodes if is_constant(node)]
+        if len(terminals) != len(constants):
+            raise ValueError("Expected {} constants but got {}".format(len(terminals), len(constants)))
+
+        for node, value in zip(terminals, constants):
+            node.value = float(value)
+
+        # Every string which contains a constant is out of date
+        for node in nodes:
+            node.cached_string = None
+
+    def to_source(self):
+        """
+        Converts the tree into the source code of tree_func(x, c)
+        Constant terminals read their slot of c and "x" terminals read the input
+        So the source only depends on the structure of the tree
+
+        Trees deeper than MAX_EXPRESSION_DEPTH are too nested for the Python compiler
+        So they are written as one assignment per primitive instead of a single expression
+
+        Returns:
+            String of the source code and list of constant TerminalNodes in slot order
+        """
+        nodes = self.preorder()
+
+        # Expression of every terminal
+        terminals = []
+        expressions = {}
+        for node in nodes:
+            if is_constant(node):
+                expressions[id(node)] = "c[{}]".format(len(terminals))
+                terminals.append(node)
+            elif isinstance(node, TerminalNode):
+                expressions[id(node)] = str(node.value)
+
+        lines = ["def tree_func(x, c):"]
+        if self.depth() <= MAX_EXPRESSION_DEPTH:
+            # Same traversal as __str__ with terminals replaced by their expressions
+            parts = []
+            stack = [self]
+            while stack:
+                node = stack.pop()
+                if isinstance(node, str):
+                    parts.append(node)
+                elif isinstance(node, TerminalNode):
+                    parts.append(expressions[id(node)])
+                else:
+                    parts.append(node.name + "(")
+                    stack.append(")")
+                    for i in range(len(node.args) - 1, -1, -1):
+                        stack.append(node.args[i])
+                        if i > 0:
+                            stack.append(", ")
+            lines.append("    return " + "".join(parts))
+        else:
+            # Children are assigned before their parents so nothing is nested
+            for node in reversed(nodes):
+                if not isinstance(node, TerminalNode):
+                    lines.append("    v{} = {}({})".format(len(lines), node.name, ", ".join([expressions.pop(id(i)) for i in node.args])))
+                    expressions[id(node)] = "v{}".format(len(lines) - 1)
+            lines.append("    return " + expressions[id(self)])
+
+        return "\n".join(lines), terminals
+
+    def preorder(self):
+        """
+        Lists every node of the tree without recursion
+        Parents come before their children and children are in order
+
+        Returns:
+            List of every Node in the tree
+        """
+        nodes = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            nodes.append(node)
+            stack += reversed(node.args)
+        return nodes
 
     def get_tree_ids(self):
         """
@@ -107,45 +259,72 @@ class Node():
             for i in self.args:
                 self.input_ids += i.get_input_ids()
 
+    def update_size_depth(self):
+        """
+        Updates the cached size and depth from the cached values of every child
+        """
+        self.tree_size = 1
+        self.tree_depth = 0
+        for i in self.args:
+            self.tree_size += i.tree_size
+            self.tree_depth = max(self.tree_depth, i.tree_depth)
+        self.tree_depth += 1
+
     def regenerate_node_ids(self, node_id, position):
         """
-        Recursively updates all of the node ids of the tree
+        Updates all of the node ids of the tree
         Starting from the given node_id
 
         Args:
             node_id: new starting node_id of the tree
             position: string corresponding to the position of the node under the root
         """
+        # Parents get their ids before their children
         self.node_id = node_id + position
-        self.tree_ids = [self.node_id]
-        self.id_outputs = {self.node_id:self.output_type}
+        nodes = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            nodes.append(node)
+            for i, child in enumerate(node.args):
+                child.node_id = node.node_id + str(i)
+            stack += node.args
+
+        # Then the id lists are combined from the bottom up
+        for node in reversed(nodes):
+            tree_ids = [node.node_id]
+            id_outputs = {node.node_id:node.output_type}
+
+            # If terminal with output_type x
+            if len(node.args) == 0 and node.output_type == "x":
+                input_ids = [node.node_id]
+            else:
+                input_ids = []
 
-        # If terminal with output_type x
-        if len(self.args) == 0 and self.output_type == "x":
-            self.input_ids = [self.node_id]
-        else:
-            self.input_ids = []
+                for child in node.args:
+                    tree_ids += child.tree_ids
+                    input_ids += child.input_ids
+                    id_outputs.update(child.id_outputs)
 
-            for i, node in enumerate(self.args):
-                i_ids, t_ids, id_outputs = node.regenerate_node_ids(self.node_id, str(i))
-                self.tree_ids += t_ids
-                self.input_ids += i_ids
-                self.id_outputs.update(id_outputs)
+            node.tree_ids = tree_ids
+            node.id_outputs = id_outputs
+            node.input_ids = input_ids
 
         return self.input_ids, self.tree_ids, self.id_outputs
 
     def size(self):
         """
-        Recursively calculate the size of the tree
-
         Returns:
             Number of nodes in the tree
         """
-        # Size starts at 1 to count this node
-        size = 1
-        for i in self.args:
-            size += i.size()
-        return size
+        return self.tree_size
+
+    def depth(self):
+        """
+        Returns:
+            Number of levels in the tree, a single TerminalNode has depth 1
+        """
+        return self.tree_depth
 
     def set_name(self, name):
         """
@@ -156,27 +335,91 @@ class Node():
             name: string name of the primitive
         """
         self.name = name
+        self.cached_string = None
+
+    def __reduce__(self):
+        """
+        Pickles the tree as its LISP string and node id
+        Primitives and terminals are looked up by name in the registry when unpickled
+        """
+        return (rebuild_tree, (str(self), self.node_id))
+
+    def __deepcopy__(self, memo):
+        """
+        Copies every attribute of every node of the tree without recursion
+        Keeps deepcopy independent of the compact pickle format
+        """
+        nodes = self.preorder()
+
+        # Children are copied before their parents
+        for node in reversed(nodes):
+            new_node = node.__class__.__new__(node.__class__)
+            for key, value in node.__dict__.items():
+                if key == "args":
+                    value = [memo[id(i)] for i in value]
+                elif key in SHALLOW_COPY:
+                    value = copy(value)
+                else:
+                    value = deepcopy(value, memo)
+                setattr(new_node, key, value)
+            memo[id(node)] = new_node
+
+        return memo[id(self)]
 
     def __str__(self):
         """
-        Recursively converts the tree into a string of function calls
+        Converts the tree into a string of function calls
         Based on LISP https://en.wikipedia.org/wiki/Lisp_(programming_language)
 
         Returns:
             LISP string representation of the tree
         """
-        return self.name + "(" + "".join([str(i) + ", " for i in self.args])[:-2] + ")"
+        if self.cached_string is not None:
+            return self.cached_string
+
+        # Strings written so far
+        parts = []
+
+        # Stack of separators, nodes and (node, index of its first part) marking the end of a node
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, str):
+                parts.append(node)
+            elif isinstance(node, tuple):
+                # Memoize the finished node and replace its parts with the single string
+                node, start = node
+                node.cached_string = "".join(parts[start:])
+                del parts[start:]
+                parts.append(node.cached_string)
+            elif node.cached_string is not None:
+                # Subtrees which were not edited are not rendered again
+                parts.append(node.cached_string)
+            elif isinstance(node, TerminalNode):
+                parts.append(str(node))
+            else:
+                if node.tree_depth <= MAX_CACHED_STRING_DEPTH:
+                    stack.append((node, len(parts)))
+                parts.append(node.name + "(")
+                stack.append(")")
+                for i in range(len(node.args) - 1, -1, -1):
+                    stack.append(node.args[i])
+                    if i > 0:
+                        stack.append(", ")
+
+        self.cached_string = "".join(parts)
+        return self.cached_string
 
 class TerminalNode(Node):
     def __init__(self, name, args, node_id, tree_ids, input_ids, output_type, generator, static, input_types=None, value=None):
         super().__init__(name, args, node_id, tree_ids, input_ids, output_type, input_types)
 
-        # String of the terminal value
+        # Value of the terminal
         # This should be a python primitive (float, int, str, list, etc ...)
-        # We store this as a string in memory to reduce memory usage
-        # The value can always be cast into its original type
+        # Floats are constants which fill a slot of the tree's constant vector
+        # Other values are written into the compiled source as they are, such as the input "x"
         if value is None:
-            self.value = str(generator())
+            self.value = generator()
         else:
             self.value = value
 
@@ -192,7 +435,8 @@ class TerminalNode(Node):
 
         This may generate the same value as the current one
         """
-        self.value = str(self.generator())
+        self.value = self.generator()
+        self.cached_string = None
 
     def mutate_generator(self, generator):
         """
@@ -205,19 +449,70 @@ class TerminalNode(Node):
         # Save function reference for regenerating terminal value
         self.generator = generator
 
-        # String of the terminal value
-        self.value = str(generator())
+        # Value of the terminal
+        self.value = generator()
+        self.cached_string = None
 
     def __str__(self):
         """
         Returns:
             string representation of terminal value
         """
-        return "{}({})".format(self.name, self.value)
+        if self.cached_string is None:
+            self.cached_string = "{}({})".format(self.name, self.value)
+        return self.cached_string
+
+def is_constant(node):
+    """
+    Args:
+        node: Node
+
+    Returns:
+        True if the node is a TerminalNode holding a float constant
+    """
+    return isinstance(node, TerminalNode) and isinstance(node.value, float)
+
+def compile_source(source, func_pointers):
+    """
+    Compiles the source code of a tree or reuses the function compiled for the same source
+
+    Primitive names are assumed to refer to the same function every time in a process
+    Which is how the registries in node_set.py work
+
+    Args:
+        source: string returned by Node.to_source()
+        func_pointers: dictionary where (key, value) is (string, function)
+
+    Returns:
+        Callable function tree_func(x, c)
+    """
+    # Popping and inserting again moves the source to the end without a lock across threads
+    func = COMPILED_TREES.pop(source, None)
+    if func is None:
+        COMPILE_STATS["misses"] += 1
+        namespace = {}
+        exec(source, func_pointers, namespace)
+        func = namespace["tree_func"]
+    else:
+        COMPILE_STATS["hits"] += 1
+    COMPILED_TREES[source] = func
+
+    # Forget the least recently used structures
+    while len(COMPILED_TREES) > COMPILE_CACHE_SIZE:
+        try:
+            COMPILED_TREES.popitem(last=False)
+        except KeyError:
+            break
+
+    return func
 
 def generate(primitive_set, terminal_set, depth, output_types, node_id):
     """
     Randomly generate a single tree
+    Nodes are chosen in the same order as a recursive depth first generation
+
+    Subtrees up to MAX_RECURSIVE_DEPTH are generated by generate_recursive which is faster
+    Deeper levels use an explicit stack so the recursion depth stays bounded
 
     Args:
         primitive_set: dictionary where (key, value) is (output_type, [{"name", "input_types", "group"}, ...])
@@ -226,17 +521,62 @@ def generate(primitive_set, terminal_set, depth, output_types, node_id):
         output_types:  list of primitive types to generate
         node_id:       string id of the node
 
+    Returns:
+        Node containing full tree
+    """
+    if depth <= MAX_RECURSIVE_DEPTH:
+        return generate_recursive(primitive_set, terminal_set, depth, output_types, node_id)
+
+    # Returned nodes
+    nodes = [None] * len(output_types)
+
+    # Stack of primitives to choose
+    # Each item is (node id, output_type, depth, children list of the parent, position in the parent)
+    stack = [(node_id + str(i), output_types[i], depth, nodes, i) for i in range(len(output_types) - 1, -1, -1)]
+
+    # Chosen primitives above MAX_RECURSIVE_DEPTH in depth first order
+    # Each item is (node id, output_type, primitive, children, children list of the parent, position in the parent)
+    chosen = []
+
+    while stack:
+        curr_node_id, output_type, curr_depth, siblings, position = stack.pop()
+
+        # Select a random primitive with the correct output type
+        primitive = random.choice(primitive_set.node_set[output_type])
+        input_types = primitive["input_types"]
+
+        if curr_depth - 1 <= MAX_RECURSIVE_DEPTH:
+            # Shallow children are generated right away so the Node can be created
+            children = generate_recursive(primitive_set, terminal_set, curr_depth - 1, input_types, curr_node_id)
+            siblings[position] = make_node(curr_node_id, output_type, primitive, children)
+
+        else:
+            # Children are chosen next, first child first
+            children = [None] * len(input_types)
+            for i in range(len(input_types) - 1, -1, -1):
+                stack.append((curr_node_id + str(i), input_types[i], curr_depth - 1, children, i))
+
+            chosen.append((curr_node_id, output_type, primitive, children, siblings, position))
+
+    # Create the other Nodes bottom up so every child exists before its parent
+    for curr_node_id, output_type, primitive, children, siblings, position in reversed(chosen):
+        siblings[position] = make_node(curr_node_id, output_type, primitive, children)
+
+    return nodes
+
+def generate_recursive(primitive_set, terminal_set, depth, output_types, node_id):
+    """
+    Randomly generate a single tree with recursion, see generate
+
     Returns:
         Node containing full tree
     """
     # List of child nodes
     nodes = []
-    # Use to differentiate ids
-    id_counter = 0
 
     # Leaf node
     if depth == 1:
-        for output_type in output_types:
+        for id_counter, output_type in enumerate(output_types):
             # Select a random primitive with the correct output type
             primitive = random.choice(primitive_set.node_set[output_type])
 
@@ -252,8 +592,7 @@ def generate(primitive_set, terminal_set, depth, output_types, node_id):
 
             # Set the leaf nodes to be Terminal Nodes
             term_args = []
-            id_counter_term = 0
-            for input_type in primitive["input_types"]:
+            for id_counter_term, input_type in enumerate(primitive["input_types"]):
                 # Choose a random terminal with the correct output type
                 terminal = random.choice(terminal_set.node_set[input_type])
 
@@ -271,20 +610,15 @@ def generate(primitive_set, terminal_set, depth, output_types, node_id):
                 node_ids[term_node_id] = input_type
                 # Add terminal input_ids to the parent's input_ids
                 input_ids += input_ids_temp
-                # Increment terminal id counter so each terminal will have a different id
-                id_counter_term += 1
 
             # Create the Node and add it to the list of children
             nodes.append(Node(primitive["name"], term_args, curr_node_id, 
                               node_ids, input_ids, output_type, primitive["input_types"]))
 
-            # Increment id counter so each child will have a different id
-            id_counter += 1
-        
         return nodes
 
     # All other nodes
-    for output_type in output_types:
+    for id_counter, output_type in enumerate(output_types):
         # Select a random primitive with the correct output type
         primitive = random.choice(primitive_set.node_set[output_type])
 
@@ -293,26 +627,35 @@ def generate(primitive_set, terminal_set, depth, output_types, node_id):
 
         # Generate children nodes
         # One for each input type
-        p_nodes = generate(primitive_set, terminal_set, depth-1, primitive["input_types"], curr_node_id)
+        p_nodes = generate_recursive(primitive_set, terminal_set, depth-1, primitive["input_types"], curr_node_id)
 
-        # Create full list of ids by combining the id lists of the children
-        tree_ids = {curr_node_id:output_type}
-        for node in p_nodes:
-            tree_ids.update(node.get_id_outputs())
-        
-        # Combine input_ids of children
-        input_ids = []
-        for node in p_nodes:
-            input_ids += node.get_input_ids()
-        
         # Create the Node and add it to the list of children
-        nodes.append(Node(primitive["name"], p_nodes, curr_node_id, tree_ids, input_ids, output_type, primitive["input_types"]))
-
-        # Increment id counter so each child will have a different id
-        id_counter += 1
+        nodes.append(make_node(curr_node_id, output_type, primitive, p_nodes))
 
     return nodes
 
+def make_node(node_id, output_type, primitive, children):
+    """
+    Creates a Node from a primitive and its finished children
+
+    Args:
+        node_id: string id of the node
+        output_type: output type of the node
+        primitive: dictionary {"name", "input_types", "group"}
+        children: list of child nodes
+
+    Returns:
+        Node
+    """
+    # Create full list of ids by combining the id lists of the children
+    tree_ids = {node_id:output_type}
+    input_ids = []
+    for node in children:
+        tree_ids.update(node.id_outputs)
+        input_ids += node.input_ids
+
+    return Node(primitive["name"], children, node_id, tree_ids, input_ids, output_type, primitive["input_types"])
+
 def generate_tree(primitive_set, terminal_set, depth=1):
     """
     Randomly generate a single tree
@@ -334,8 +677,9 @@ def generate_tree(primitive_set, terminal_set, depth=1):
 
 def apply_at_node(modifier, primitive_set, terminal_set, tree, node_id):
     """
-    Recurse through the tree until the node is found
+    Walk down the tree until the node is found
     Then apply an operation to the node
+    And update every node on the path back to the root
 
     Args:
         modifier: callable function that modifies a Node
@@ -347,34 +691,65 @@ def apply_at_node(modifier, primitive_set, terminal_set, tree, node_id):
     Returns:
         Node containing full tree
     """
-    # We have reached the correct node if the string is empty
-    if node_id == "":
-        # Apply the modification
-        tree = modifier(primitive_set, terminal_set, tree)
+    # Nodes from the root to the parent of the modified node
+    path = []
+    node = tree
+    for index in node_id:
+        path.append(node)
+        # This gets casted to an integer so it can be used as an index
+        node = node.args[int(index)]
 
-        # Return the modified tree node
-        return tree
+    # Apply the modification
+    node = modifier(primitive_set, terminal_set, node)
 
-    # This gets casted to an integer so it can be used as an index
-    node_index = int(node_id[0])
-    # The next node is the correct node if the length of the node_id is 1
-    if len(node_id) == 1:
-        next_id = ""
-    else:
-        next_id = node_id[1:]
+    # We have reached the correct node if the string is empty
+    if len(path) == 0:
+        # Return the modified tree node
+        return node
 
-    # Set the correct child to be the result of the recursion
-    tree.args[node_index] = apply_at_node(modifier, primitive_set, terminal_set, tree.args[node_index], next_id)
+    # Set the correct child to be the modified node
+    path[-1].args[int(node_id[-1])] = node
 
-    # Update the tree_ids and input_ids of the tree
-    tree.update_tree_ids()
-    tree.update_input_ids()
+    # Update the tree_ids, input_ids, size and depth of every node on the path
+    # And clear their strings since only ancestors of the edit change
+    for parent in reversed(path):
+        parent.update_tree_ids()
+        parent.update_input_ids()
+        parent.update_size_depth()
+        parent.cached_string = None
 
     return tree
 
+def within_limits(tree, node_id, old_subtree, new_subtree, max_size=None, max_depth=None):
+    """
+    Checks whether replacing a subtree keeps the tree within the size and depth limits
+    Only uses cached sizes and depths so nothing is traversed
+
+    Assumes the rest of the tree is already within the depth limit
+
+    Args:
+        tree: Node containing full tree
+        node_id: string id of the replaced node without the root id
+        old_subtree: Node currently at node_id
+        new_subtree: Node replacing old_subtree
+        max_size: maximum number of nodes or None for no limit
+        max_depth: maximum number of levels or None for no limit
+
+    Returns:
+        True if the new tree is within the limits
+    """
+    if max_size is not None and tree.size() - old_subtree.size() + new_subtree.size() > max_size:
+        return False
+
+    # The replaced node is len(node_id) levels below the root
+    if max_depth is not None and len(node_id) + new_subtree.depth() > max_depth:
+        return False
+
+    return True
+
 def find_subtree(tree, node_id):
     """
-    Recurse through the tree until the node is found
+    Walk down the tree until the node is found
     Then return the node
 
     Args:
@@ -384,21 +759,12 @@ def find_subtree(tree, node_id):
     Returns:
         Node containing full tree
     """
-    # We have reached the correct node if the string is empty
-    if node_id == "":
-        # Return the tree node
-        return tree
-
-    # This gets casted to an integer so it can be used as an index
-    node_index = int(node_id[0])
-    # The next node is the correct node if the length of the node_id is 1
-    if len(node_id) == 1:
-        next_id = ""
-    else:
-        next_id = node_id[1:]
+    for index in node_id:
+        # This gets casted to an integer so it can be used as an index
+        tree = tree.args[int(index)]
 
-    # Return the recursive call
-    return find_subtree(tree.args[node_index], next_id)
+    # We have reached the correct node when every index is used
+    return tree
 
 def parse_tree(line, pset, tset):
     """
@@ -547,6 +913,26 @@ def parse_tree(line, pset, tset):
     # Return the root node
     return node_stack.pop()
 
+def rebuild_tree(line, node_id):
+    """
+    Rebuilds a tree from its LISP string using the registries
+    Used when unpickling a tree
+
+    Args:
+        line (string): string of the tree
+        node_id: string id of the root node
+
+    Returns:
+        Node containing full tree
+    """
+    tree = parse_tree(line, PRIMITIVE_REGISTRY, TERMINAL_REGISTRY)
+
+    # parse_tree always starts at "0" so restore the original ids of subtrees
+    if node_id != tree.node_id:
+        tree.regenerate_node_ids(node_id[:-1], node_id[-1:])
+
+    return tree
+
 def check_tree_ids(tree):
     """
     Checks to make sure every node id is correct in a tree
@@ -558,7 +944,7 @@ def check_tree_ids(tree):
     Returns:
         Node containing full tree
     """
-    for i, node in enumerate(tree.args):
-        if node.node_id != tree.node_id + str(i):
-            import pdb; pdb.set_trace()
-        check_tree_ids(node)
\ No newline at end of file
+    for parent in tree.preorder():
+        for i, node in enumerate(parent.args):
+            if node.node_id != parent.node_id + str(i):
+                import pdb; pdb.set_trace()
\ No newline at end of file
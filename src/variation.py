@@ -0,0 +1,137 @@
+"""
+This file contains functions which create offspring from an elite pool
+
+Each individual is a tuple (tree, score)
+"""
+from mutation import mutate, mutate_replace, mutate_insert, mutate_insert_bank, mutate_shrink
+from crossover import one_point_crossover
+from interval import screen_population
+from node_set import PRIMITIVE_REGISTRY
+from fitness import evaluate
+from copy import deepcopy
+from functools import partial
+import numpy as np
+import random
+
+def mutate_pop(individual, mutpb, primitive_set, terminal_set, max_size=None, max_depth=None, bank=None, operators=None):
+    offspring = []
+
+    # Name of the operator of every offspring in order
+    if operators is None:
+        operators = []
+
+    # Inserted subtrees come from the bank when there is one
+    insert = mutate_insert if bank is None else partial(mutate_insert_bank, bank)
+
+    # Replace
+    if random.random() < mutpb:
+        offspring.append((mutate(mutate_replace, primitive_set, terminal_set, deepcopy(individual[0])), None))
+        operators.append("replace")
+
+    # Insert
+    if random.random() < mutpb:
+        offspring.append(( mutate(insert, primitive_set, terminal_set, deepcopy(individual[0]), use_input_ids=True, max_size=max_size, max_depth=max_depth), None))
+        operators.append("insert")
+
+    # Shrink
+    if random.random() < mutpb:
+        offspring.append((mutate(mutate_shrink, primitive_set, terminal_set, deepcopy(individual[0])), None))
+        operators.append("shrink")
+
+    return offspring
+
+def crossover_pop(individual_1, individual_2, cxpb, primitive_set, terminal_set, max_size=None, max_depth=None):
+    offspring = []
+
+    # One-point crossover
+    new_tree, new_tree_2 = one_point_crossover(primitive_set, terminal_set, deepcopy(individual_1[0]), deepcopy(individual_2[0]), max_size=max_size, max_depth=max_depth)
+
+    # Add both trees to the offspring
+    offspring += [(new_tree, None), (new_tree_2, None)]
+
+    return offspring
+
+def vary(population, primitive_set, terminal_set, mutpb, cxpb, max_size=None, max_depth=None, bank=None, lineage=None):
+    """
+    Creates offspring from the elite pool with mutation and crossover
+
+    Args:
+        population: list of individuals where each individual is a tuple (tree, score)
+        primitive_set: PrimitiveSet
+        terminal_set: TerminalSet
+        mutpb: probability of each mutation operator
+        cxpb: probability of crossover
+        max_size: maximum number of nodes of an offspring or None for no limit
+        max_depth: maximum number of levels of an offspring or None for no limit
+        bank: optional SubtreeBank used by insert mutations
+        lineage: optional list receiving a tuple (operator, parent indices) for every offspring
+                 The first parent is the individual the offspring was copied from
+
+    Returns:
+        List of offspring where each individual is a tuple (tree, None)
+    """
+    # Create list for storing offspring
+    offspring = []
+
+    # Mutate elite pool
+    for i, individual in enumerate(population):
+        operators = []
+        offspring += mutate_pop(individual, mutpb, primitive_set, terminal_set, max_size, max_depth, bank, operators)
+        if lineage is not None:
+            lineage += [(operator, [i]) for operator in operators]
+
+    # Crossover elite pool
+    for i, individual_1 in enumerate(population):
+        if random.random() < cxpb:
+            # Same draw as random.choice(population) which also keeps the index of the partner
+            j = random.randrange(len(population))
+            offspring += crossover_pop(individual_1, population[j], cxpb, primitive_set, terminal_set, max_size, max_depth)
+            # The first child is the partner with a subtree of individual_1
+            if lineage is not None:
+                lineage += [("crossover", [j, i]), ("crossover", [i, j])]
+
+    return offspring
+
+def vary_and_evaluate(population, parents, seed, mutpb, cxpb, primitive_set, terminal_set, x, y, survivors, max_size=None, max_depth=None):
+    """
+    Creates offspring of some parents, evaluates them and keeps the best
+    Runs as a single task inside a worker so only the survivors cross process boundaries
+
+    Every task gets its own seed so results do not depend on which worker runs it
+    Tasks share the random module of their process so only serial and process executors are reproducible
+
+    Args:
+        population: elite pool where each individual is a tuple (tree, score)
+        parents: list of indices of the parents this task varies
+        seed: seed of the random stream of this task
+        mutpb: probability of each mutation operator
+        cxpb: probability of crossover
+        primitive_set: PrimitiveSet
+        terminal_set: TerminalSet
+        x: numpy array of inputs
+        y: numpy array of targets
+        survivors: number of offspring returned
+        max_size: maximum number of nodes of an offspring or None for no limit
+        max_depth: maximum number of levels of an offspring or None for no limit
+
+    Returns:
+        List of the best offspring with their scores and the number of offspring created
+    """
+    random.seed(seed)
+
+    # Same offspring as vary() but only for the parents of this task
+    offspring = []
+    for i in parents:
+        offspring += mutate_pop(population[i], mutpb, primitive_set, terminal_set, max_size, max_depth)
+    for i in parents:
+        if random.random() < cxpb:
+            offspring += crossover_pop(population[i], random.choice(population), cxpb, primitive_set, terminal_set, max_size, max_depth)
+
+    # Offspring which are guaranteed to produce NaN or inf are not evaluated
+    invalid = screen_population(offspring, PRIMITIVE_REGISTRY, (float(np.min(x)), float(np.max(x))))
+    scores = [np.inf if flag else evaluate(None, individual, x, y) for individual, flag in zip(offspring, invalid)]
+
+    # The global elite pool only keeps the best survivors of all tasks
+    # So the best survivors of each task are enough to select it
+    sorted_scores = np.argsort(scores)[:survivors]
+    return [(offspring[i][0], scores[i]) for i in sorted_scores], len(offspring)
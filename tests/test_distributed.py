@@ -0,0 +1,47 @@
+import os
+import sys
+import math
+import threading
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from executors import make_executor
+
+@pytest.fixture(scope="module")
+def executor():
+    executor = make_executor("remote", 1)
+    yield executor
+    executor.close()
+
+def test_error_fails_only_its_task(executor):
+    results = {}
+    errors = []
+    done = threading.Semaphore(0)
+
+    def on_result(i):
+        def callback(result):
+            results[i] = result
+            done.release()
+        return callback
+
+    def on_error(e):
+        errors.append(e)
+        done.release()
+
+    for i, value in enumerate([4.0, -1.0, 9.0]):
+        executor.submit(math.sqrt, (value,), on_result(i), on_error)
+    for i in range(3):
+        done.acquire()
+
+    assert results == {0: 2.0, 2: 3.0}
+    assert len(errors) == 1 and "math domain error" in str(errors[0])
+
+def test_new_arrays_are_always_sent(executor):
+    # Freed arrays often leave their id to the next array
+    for i in range(50):
+        x = np.full(100, float(i))
+        assert executor.starmap(np.sum, [(x,)]) == [100.0 * i]
+        del x
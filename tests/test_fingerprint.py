@@ -0,0 +1,26 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from symbolic_regression import build_node_sets
+from tree import PRIMITIVE_REGISTRY, TERMINAL_REGISTRY, parse_tree
+from node_set import registered_function_pointers
+from fingerprint import FitnessMemo, probe_points
+
+def test_memo_forgets_least_recently_used_scores():
+    build_node_sets()
+    memo = FitnessMemo(registered_function_pointers(), probe_points(-5, 5), max_entries=2)
+    trees = [(parse_tree(line, PRIMITIVE_REGISTRY, TERMINAL_REGISTRY), None) for line in ["pass_x(x)", "sin_x(pass_x(x))", "cos_x(pass_x(x))"]]
+
+    fingerprints, to_evaluate = memo.deduplicate(trees[:2])
+    assert memo.fill_scores(fingerprints, to_evaluate, [1.0, 2.0]) == [1.0, 2.0]
+
+    # Using the first tree again makes the second one the least recently used
+    fingerprints, to_evaluate = memo.deduplicate(trees[::2])
+    assert to_evaluate == [1]
+    assert memo.fill_scores(fingerprints, to_evaluate, [3.0]) == [1.0, 3.0]
+
+    fingerprints, to_evaluate = memo.deduplicate(trees)
+    assert to_evaluate == [1]
+    assert len(memo.scores) == 2
@@ -0,0 +1,47 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from symbolic_regression import build_node_sets
+from tree import PRIMITIVE_REGISTRY, TERMINAL_REGISTRY, parse_tree
+from interval import screen_population
+from fitness import evaluate
+
+@pytest.fixture(scope="module")
+def pset_by_name():
+    primitive_set, terminal_set = build_node_sets()
+    return primitive_set.struct_by_name()
+
+def data():
+    x = np.linspace(-5, 5, 20)
+    return x, x ** 2
+
+# Infinite values inside these trees still give a finite output
+@pytest.mark.parametrize("line", [
+    "div_x_float(pass_x(x), exp_float(exp_float(exp_float(pass_2(2.0)))))",
+    "exp_x(sub_x_float(pass_x(x), exp_float(exp_float(exp_float(pass_2(2.0))))))",
+    "div_x_x(pass_x(x), div_x_float(pass_x(x), sub_float_float(pass_1(1.0), pass_1(1.0))))",
+])
+def test_infinite_subtree_is_not_screened(pset_by_name, line):
+    x, y = data()
+    individual = (parse_tree(line, PRIMITIVE_REGISTRY, TERMINAL_REGISTRY), None)
+
+    with np.errstate(all="ignore"):
+        assert np.isfinite(evaluate(None, individual, x, y))
+    assert screen_population([individual], pset_by_name, (float(np.min(x)), float(np.max(x)))) == [False]
+
+@pytest.mark.parametrize("line", [
+    "exp_float(exp_float(exp_float(pass_2(2.0))))",
+    "div_float_float(pass_1(1.0), sub_float_float(pass_1(1.0), pass_1(1.0)))",
+    "log_float(sub_float_float(pass_1(1.0), pass_2(2.0)))",
+    "add_x_float(pass_x(x), sub_float_float(exp_float(exp_float(exp_float(pass_2(2.0)))), exp_float(exp_float(exp_float(pass_2(2.0))))))",
+])
+def test_invalid_tree_is_screened(pset_by_name, line):
+    x, y = data()
+    individual = (parse_tree(line, PRIMITIVE_REGISTRY, TERMINAL_REGISTRY), None)
+
+    assert screen_population([individual], pset_by_name, (float(np.min(x)), float(np.max(x)))) == [True]
@@ -0,0 +1,37 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from symbolic_regression import build_node_sets
+from tree import PRIMITIVE_REGISTRY, TERMINAL_REGISTRY, parse_tree
+from fitness import evaluate
+from islands import run_islands
+
+CONFIG = {"seed": 1, "elite_size": 4, "ngen": 1000, "interval": 1, "migrants": 1, "topology": "ring"}
+
+def raising_vary(population, primitive_set, terminal_set):
+    # Only the island which got the individual with score 0 fails
+    if any(score == 0.0 for tree, score in population):
+        raise ValueError("vary failed")
+    return []
+
+def exiting_vary(population, primitive_set, terminal_set):
+    if any(score == 0.0 for tree, score in population):
+        os._exit(1)
+    return []
+
+def make_population():
+    build_node_sets()
+    tree = parse_tree("mult_x_x(pass_x(x), pass_x(x))", PRIMITIVE_REGISTRY, TERMINAL_REGISTRY)
+    return [(tree, float(i)) for i in range(8)]
+
+@pytest.mark.parametrize("vary, message", [(raising_vary, "vary failed"), (exiting_vary, "exited with code 1")])
+def test_failed_island_stops_every_island(vary, message):
+    x = np.linspace(-5, 5, 20)
+
+    with pytest.raises(RuntimeError, match=message):
+        run_islands(make_population(), 4, CONFIG, build_node_sets, vary, evaluate, x, x ** 2, start_method="fork")
@@ -0,0 +1,36 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import symbolic_regression
+from symbolic_regression import build_node_sets, steady_state
+from tree import PRIMITIVE_REGISTRY, TERMINAL_REGISTRY, parse_tree
+from node_set import registered_function_pointers
+from fingerprint import FitnessMemo, probe_points
+from executors import make_executor
+
+def test_steady_state_stops_when_every_offspring_is_a_duplicate(monkeypatch):
+    primitive_set, terminal_set = build_node_sets()
+    x = np.linspace(-5, 5, 20)
+    y = x ** 2
+    x_interval = (float(np.min(x)), float(np.max(x)))
+
+    # Every offspring is a copy of its first parent so its score is always known
+    monkeypatch.setattr(symbolic_regression, "STEADY_STATE_EVALS", 10)
+    monkeypatch.setattr(symbolic_regression, "crossover_pop", lambda individual_1, individual_2, *args: [individual_1, individual_2])
+    monkeypatch.setattr(symbolic_regression, "mutate_pop", lambda individual, *args: [individual])
+
+    memo = FitnessMemo(registered_function_pointers(), probe_points(*x_interval))
+    population = [(parse_tree("mult_x_x(pass_x(x), pass_x(x))", PRIMITIVE_REGISTRY, TERMINAL_REGISTRY), 0.0) for i in range(8)]
+    fingerprints, to_evaluate = memo.deduplicate(population)
+    memo.fill_scores(fingerprints, to_evaluate, [0.0])
+
+    executor = make_executor("serial", 1)
+    population = steady_state(population, executor, primitive_set, terminal_set, memo, primitive_set.struct_by_name(), x_interval, x, y)
+    executor.close()
+
+    assert len(population) == 8
+    assert all(score == 0.0 for tree, score in population)